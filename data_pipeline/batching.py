@@ -0,0 +1,104 @@
+"""
+Request packing for Swiss Travel RAG embeddings
+Groups inputs into API requests by token budget instead of a fixed count
+"""
+from typing import TYPE_CHECKING, List, Optional, Sequence
+from config import (
+    BATCH_SIZE,
+    EMBEDDING_MAX_TOKENS_PER_INPUT,
+    EMBEDDING_MAX_TOKENS_PER_REQUEST,
+)
+
+if TYPE_CHECKING:
+    import tiktoken
+
+
+def truncate_to_tokens(text: str, encoding: "tiktoken.Encoding", max_tokens: int) -> str:
+    """Cut text down to its first max_tokens tokens"""
+
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def pack_batches(token_counts: Sequence[int],
+                 max_tokens_per_request: int = EMBEDDING_MAX_TOKENS_PER_REQUEST,
+                 max_items: int = BATCH_SIZE) -> List[List[int]]:
+    """
+    Pack inputs into requests without exceeding the token or item caps
+
+    Inputs keep their original order; a request is closed as soon as the
+    next input would overflow either cap.
+
+    Args:
+        token_counts: Token count of each input (already capped per input)
+        max_tokens_per_request: Token budget of a single request
+        max_items: Maximum number of inputs in a single request
+
+    Returns:
+        List of batches, each a list of input indices
+    """
+
+    batches = []
+    current: List[int] = []
+    current_tokens = 0
+
+    for index, count in enumerate(token_counts):
+        if current and (current_tokens + count > max_tokens_per_request or len(current) >= max_items):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+
+        current.append(index)
+        current_tokens += count
+
+    if current:
+        batches.append(current)
+
+    return batches
+
+
+def fixed_batches(item_count: int, batch_size: int) -> List[List[int]]:
+    """Count-based batching, as used before token packing"""
+    return [list(range(i, min(i + batch_size, item_count)))
+            for i in range(0, item_count, batch_size)]
+
+
+def prepare_inputs(texts: List[str], token_counts: Optional[List[Optional[int]]], encoding: "tiktoken.Encoding",
+                   max_tokens_per_input: int = EMBEDDING_MAX_TOKENS_PER_INPUT):
+    """
+    Apply the per-input cap, truncating inputs that are too long to embed
+
+    Args:
+        texts: Input texts
+        token_counts: Known token counts, or None (missing counts are computed here)
+        encoding: Tokenizer of the embedding model
+        max_tokens_per_input: Model context limit for a single input
+
+    Returns:
+        (texts, token_counts) with oversized inputs truncated
+    """
+
+    texts = list(texts)
+    if token_counts is None:
+        token_counts = [None] * len(texts)
+    counts = []
+    truncated = 0
+
+    for i, text in enumerate(texts):
+        count = token_counts[i]
+        if count is None:
+            count = len(encoding.encode(text))
+
+        if count > max_tokens_per_input:
+            texts[i] = truncate_to_tokens(text, encoding, max_tokens_per_input)
+            count = max_tokens_per_input
+            truncated += 1
+
+        counts.append(count)
+
+    if truncated:
+        print(f"Truncated {truncated} inputs to {max_tokens_per_input} tokens")
+
+    return texts, counts
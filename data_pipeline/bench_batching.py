@@ -0,0 +1,90 @@
+"""
+Benchmark: fixed-count vs token-budget embedding batching
+Compares request count and wall time for the markdown corpus
+"""
+import argparse
+import time
+from pathlib import Path
+from chunking import TextChunker
+from markdown_parser import MarkdownParser
+from batching import fixed_batches, pack_batches
+from config import RATE_LIMIT_RPM
+
+
+def load_corpus_chunks(markdown_dir: Path, repeat: int = 1):
+    """Parse and chunk every markdown file, optionally repeating the corpus"""
+
+    parser = MarkdownParser()
+    chunker = TextChunker()
+    chunks = []
+
+    for file_path in sorted(markdown_dir.glob("*.md")):
+        parsed = parser.parse_file(file_path)
+        if parsed['sections']:
+            chunks.extend(chunker.chunk_sections(parsed['sections'], parsed['metadata']))
+        else:
+            chunks.extend(chunker.chunk_text(parsed['full_content'], parsed['metadata']))
+
+    return chunks * repeat
+
+
+def simulate(batches, token_counts, overhead_ms: float, ms_per_1k_tokens: float, sleep_between: float):
+    """Serial wall time of a batch plan under a simple latency model"""
+
+    request_time = sum(
+        overhead_ms / 1000 + sum(token_counts[i] for i in batch) / 1000 * ms_per_1k_tokens / 1000
+        for batch in batches
+    )
+    return request_time + sleep_between * max(0, len(batches) - 1)
+
+
+def run_live(chunks, batches):
+    """Time real API calls for a batch plan (costs money, bypasses the cache)"""
+
+    from openai import OpenAI
+    from config import OPENAI_API_KEY, EMBEDDING_MODEL
+
+    client = OpenAI(api_key=OPENAI_API_KEY)
+    start = time.perf_counter()
+    for batch in batches:
+        client.embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=[chunks[i]['content'].replace("\n", " ") for i in batch]
+        )
+    return time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--markdown-dir", default="markdown_files")
+    arg_parser.add_argument("--repeat", type=int, default=20, help="replicate the corpus N times")
+    arg_parser.add_argument("--fixed-batch-size", type=int, default=100, help="previous BATCH_SIZE")
+    arg_parser.add_argument("--overhead-ms", type=float, default=300, help="simulated per-request latency")
+    arg_parser.add_argument("--ms-per-1k-tokens", type=float, default=5, help="simulated per-token cost")
+    arg_parser.add_argument("--live", action="store_true", help="also time real API calls")
+    args = arg_parser.parse_args()
+
+    chunks = load_corpus_chunks(Path(args.markdown_dir), args.repeat)
+    token_counts = [chunk['token_count'] for chunk in chunks]
+    print(f"Corpus: {len(chunks)} chunks, {sum(token_counts)} tokens")
+
+    plans = {
+        f"fixed ({args.fixed_batch_size}/request)": (fixed_batches(len(chunks), args.fixed_batch_size),
+                                                     60 / RATE_LIMIT_RPM),
+        "token-packed": (pack_batches(token_counts), 0.0),
+    }
+
+    print(f"\n{'plan':<28}{'requests':>10}{'max tokens/req':>16}{'sim wall (s)':>14}")
+    print("-" * 68)
+
+    for name, (batches, sleep_between) in plans.items():
+        max_tokens = max(sum(token_counts[i] for i in batch) for batch in batches)
+        wall = simulate(batches, token_counts, args.overhead_ms, args.ms_per_1k_tokens, sleep_between)
+        print(f"{name:<28}{len(batches):>10}{max_tokens:>16}{wall:>14.2f}")
+
+        if args.live:
+            print(f"{'':<28}live wall time: {run_live(chunks, batches):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Microbenchmark: langchain splitter vs single-pass token-offset chunker
+Times both engines on long Korean travel guides and checks chunk agreement
+"""
+import argparse
+import time
+from pathlib import Path
+from chunking import TextChunker
+from markdown_parser import MarkdownParser
+
+
+def load_long_sections(markdown_dir: Path, top: int, repeat: int):
+    """Longest guides as single sections, each repeated to simulate long exports"""
+
+    parser = MarkdownParser()
+    texts = []
+    for file_path in markdown_dir.glob("*.md"):
+        content = parser.parse_file(file_path)['full_content']
+        texts.append((file_path.name, content))
+
+    texts.sort(key=lambda item: len(item[1]), reverse=True)
+    return [(name, "\n\n".join([content] * repeat)) for name, content in texts[:top]]
+
+
+def time_engine(chunker: TextChunker, texts, rounds: int):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        results = [chunker.split_text(text) for _, text in texts]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--markdown-dir", default="markdown_files")
+    arg_parser.add_argument("--top", type=int, default=5, help="number of longest guides")
+    arg_parser.add_argument("--repeat", type=int, default=4, help="repeat each guide N times")
+    arg_parser.add_argument("--rounds", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    texts = load_long_sections(Path(args.markdown_dir), args.top, args.repeat)
+    chars = sum(len(text) for _, text in texts)
+    print(f"Input: {len(texts)} sections, {chars} characters")
+
+    langchain_time, langchain_chunks = time_engine(TextChunker(engine="langchain"), texts, args.rounds)
+    token_time, token_chunks = time_engine(TextChunker(engine="token"), texts, args.rounds)
+
+    print(f"\n{'engine':<12}{'seconds':>10}{'chunks':>10}")
+    print("-" * 32)
+    print(f"{'langchain':<12}{langchain_time:>10.3f}{sum(map(len, langchain_chunks)):>10}")
+    print(f"{'token':<12}{token_time:>10.3f}{sum(map(len, token_chunks)):>10}")
+    print(f"\nSpeedup: {langchain_time / token_time:.1f}x")
+
+    # Agreement: identical chunk text and token count deviation
+    same_text = 0
+    total = 0
+    max_token_diff = 0
+    for (name, _), old, new in zip(texts, langchain_chunks, token_chunks):
+        if len(old) != len(new):
+            print(f"  {name}: {len(old)} vs {len(new)} chunks")
+        for (old_text, old_count), (new_text, new_count) in zip(old, new):
+            total += 1
+            same_text += old_text.strip() == new_text.strip()
+            max_token_diff = max(max_token_diff, abs(old_count - new_count))
+
+    print(f"Identical chunks: {same_text}/{total}, max token_count difference: {max_token_diff}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: compact embedding storage (halfvec / int8 / bit, truncated dimensions)
+Reports bytes per vector, projected index size and recall@k of coarse search with and without full-precision rerank
+"""
+import argparse
+import json
+from pathlib import Path
+import numpy as np
+from compact_storage import INDEX_TYPES, bytes_per_vector, quantize, coarse_scores, search_with_rerank, truncate
+from config import EMBEDDING_DIMENSION
+
+
+def synthetic_embeddings(count: int, dimension: int, clusters: int = 64, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors (real embeddings cluster by topic, uniform noise does not)"""
+
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension), dtype=np.float32)
+    matrix = centers[rng.integers(0, clusters, count)] + 0.8 * rng.standard_normal((count, dimension), dtype=np.float32)
+    return truncate(matrix, dimension)
+
+
+def make_queries(embeddings: np.ndarray, count: int, noise: float, seed: int = 1) -> np.ndarray:
+    """Perturbed copies of stored rows, standing in for paraphrased questions"""
+
+    rng = np.random.default_rng(seed)
+    rows = embeddings[rng.choice(len(embeddings), min(count, len(embeddings)), replace=False)]
+    return truncate(rows + noise * rng.standard_normal(rows.shape, dtype=np.float32) / np.sqrt(rows.shape[1]),
+                    rows.shape[1])
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    return len(set(found.tolist()) & set(truth.tolist())) / len(truth)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--local", help="use embeddings of an exported LocalVectorIndex")
+    arg_parser.add_argument("--rows", type=int, default=20000, help="synthetic rows (without --local)")
+    arg_parser.add_argument("--queries", type=int, default=200)
+    arg_parser.add_argument("--noise", type=float, default=0.5, help="query perturbation (relative norm)")
+    arg_parser.add_argument("--k", type=int, default=5)
+    arg_parser.add_argument("--candidates", type=int, default=100, help="coarse candidates reranked")
+    arg_parser.add_argument("--types", default=",".join(INDEX_TYPES))
+    arg_parser.add_argument("--dimensions", default="1536,768,512,256")
+    arg_parser.add_argument("--project-rows", type=int, default=100000,
+                            help="row count for the projected index size")
+    arg_parser.add_argument("--out", default=".cache/bench_compact.json")
+    args = arg_parser.parse_args()
+
+    if args.local:
+        embeddings = truncate(np.load(Path(args.local) / 'embeddings.npy'), EMBEDDING_DIMENSION)
+        source = f"local:{args.local}"
+    else:
+        embeddings = synthetic_embeddings(args.rows, EMBEDDING_DIMENSION)
+        source = "synthetic"
+
+    queries = make_queries(embeddings, args.queries, args.noise)
+    truth = [np.argsort(-(embeddings @ query))[:args.k] for query in queries]
+
+    print(f"{len(embeddings)} rows ({source}), {len(queries)} queries, k={args.k}, "
+          f"rerank top {args.candidates}")
+    print(f"\n{'index':<9}{'dims':>6}{'bytes/vec':>11}{'MB @' + str(args.project_rows):>13}"
+          f"{'recall coarse':>15}{'recall rerank':>15}")
+    print("-" * 69)
+
+    results = []
+    for index_type in args.types.split(','):
+        for dimensions in [int(d) for d in args.dimensions.split(',')]:
+            compact = quantize(embeddings, index_type, dimensions)
+
+            coarse_recall = []
+            rerank_recall = []
+            for query, expected in zip(queries, truth):
+                scores = coarse_scores(compact, query, index_type)
+                coarse_recall.append(recall(np.argsort(-scores)[:args.k], expected))
+                found, _ = search_with_rerank(embeddings, compact, query, index_type, args.k, args.candidates)
+                rerank_recall.append(recall(found, expected))
+
+            result = {
+                'index': index_type,
+                'dimensions': dimensions,
+                'bytes_per_vector': bytes_per_vector(index_type, dimensions),
+                'projected_index_mb': bytes_per_vector(index_type, dimensions) * args.project_rows / 1e6,
+                'saved_vs_full': 1 - bytes_per_vector(index_type, dimensions) / bytes_per_vector('vector'),
+                'recall_coarse': float(np.mean(coarse_recall)),
+                'recall_rerank': float(np.mean(rerank_recall)),
+            }
+            results.append(result)
+            print(f"{index_type:<9}{dimensions:>6}{result['bytes_per_vector']:>11.0f}"
+                  f"{result['projected_index_mb']:>13.1f}{result['recall_coarse']:>15.3f}"
+                  f"{result['recall_rerank']:>15.3f}")
+
+    print("\nVector payload only; HNSW adds the neighbor graph on top. With a compact index")
+    print("the full embedding column is still stored for the rerank step.")
+
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump({'source': source, 'rows': len(embeddings), 'queries': len(queries), 'k': args.k,
+                   'candidates': args.candidates, 'results': results}, f, indent=2)
+    print(f"Report written to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
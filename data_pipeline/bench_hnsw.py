@@ -0,0 +1,176 @@
+"""
+Benchmark: HNSW index build strategies and ef_search
+Loads the same vectors into a table that keeps its HNSW index during the inserts and into one that builds it afterwards,
+then reports load/index time and recall@k against exact search for a range of ef_search values
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+from bench_compact import synthetic_embeddings, make_queries, recall
+from compact_storage import index_build_settings_sql, truncate
+from config import (
+    EMBEDDING_DIMENSION, HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_MAINTENANCE_WORK_MEM, HNSW_BUILD_WORKERS,
+)
+from embedding_store import vector_literal
+
+TABLES = ("bench_hnsw_incremental", "bench_hnsw_bulk")
+
+# Candidate search against one of the bench tables; ef_search is transaction-local like in match_travel_content
+MATCH_FUNCTION_SQL = """
+create or replace function bench_hnsw_match (
+  table_name text,
+  query_embedding vector(%(dimension)d),
+  match_count int,
+  ef_search int
+)
+returns table (id bigint)
+language plpgsql
+as $$
+begin
+  perform set_config('hnsw.ef_search', ef_search::text, true);
+  return query execute format(
+    'select id from %%I order by embedding <=> $1 limit $2', table_name
+  ) using query_embedding, match_count;
+end;
+$$;
+"""
+
+
+def table_sql(table: str) -> str:
+    return (f"drop table if exists {table};\n"
+            f"create table {table} (id bigint primary key, embedding vector({EMBEDDING_DIMENSION}));")
+
+
+def index_sql(table: str, m: int, ef_construction: int) -> str:
+    return (f"create index on {table} using hnsw (embedding vector_cosine_ops) "
+            f"with (m = {m}, ef_construction = {ef_construction});")
+
+
+def insert_rows(client, table: str, embeddings: np.ndarray, batch_size: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, len(embeddings), batch_size):
+        values = ",".join(f"({offset + i},'{vector_literal(vector)}')"
+                          for i, vector in enumerate(embeddings[offset:offset + batch_size]))
+        client.rpc("sql", {"query": f"insert into {table} (id, embedding) values {values};"}).execute()
+    return time.perf_counter() - start
+
+
+def load_incremental(client, embeddings: np.ndarray, args) -> Dict:
+    """Index first, then insert (every row is added to the graph as it arrives)"""
+
+    table = "bench_hnsw_incremental"
+    client.rpc("sql", {"query": table_sql(table) + "\n" + index_sql(table, args.m, args.ef_construction)}).execute()
+    load_seconds = insert_rows(client, table, embeddings, args.batch_size)
+    return {'table': table, 'load_s': load_seconds, 'index_s': 0.0, 'total_s': load_seconds}
+
+
+def load_bulk(client, embeddings: np.ndarray, args) -> Dict:
+    """Insert into an unindexed table, then build the graph in one pass"""
+
+    table = "bench_hnsw_bulk"
+    client.rpc("sql", {"query": table_sql(table)}).execute()
+    load_seconds = insert_rows(client, table, embeddings, args.batch_size)
+
+    build = index_build_settings_sql(args.maintenance_work_mem, args.build_workers)
+    build += [index_sql(table, args.m, args.ef_construction), f"analyze {table};"]
+    start = time.perf_counter()
+    client.rpc("sql", {"query": "\n".join(build)}).execute()
+    index_seconds = time.perf_counter() - start
+    return {'table': table, 'load_s': load_seconds, 'index_s': index_seconds,
+            'total_s': load_seconds + index_seconds}
+
+
+def measure_recall(client, table: str, queries: np.ndarray, truth: List[np.ndarray], k: int,
+                   ef_search: int) -> Dict:
+    recalls = []
+    timings = []
+    for query, expected in zip(queries, truth):
+        params = {'table_name': table, 'query_embedding': vector_literal(query),
+                  'match_count': k, 'ef_search': ef_search}
+        start = time.perf_counter()
+        rows = client.rpc("bench_hnsw_match", params).execute().data or []
+        timings.append(time.perf_counter() - start)
+        recalls.append(recall(np.array([row['id'] for row in rows]), expected))
+    ms = np.array(timings) * 1000
+    return {'ef_search': ef_search, 'recall_at_k': float(np.mean(recalls)),
+            'p50_ms': float(np.percentile(ms, 50)), 'p95_ms': float(np.percentile(ms, 95))}
+
+
+def parse_ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(',') if v]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--local", help="use embeddings of an exported LocalVectorIndex")
+    arg_parser.add_argument("--rows", type=int, default=20000, help="synthetic rows (without --local)")
+    arg_parser.add_argument("--queries", type=int, default=100)
+    arg_parser.add_argument("--noise", type=float, default=0.5, help="query perturbation (relative norm)")
+    arg_parser.add_argument("--k", type=int, default=5)
+    arg_parser.add_argument("--m", type=int, default=HNSW_M)
+    arg_parser.add_argument("--ef-construction", type=int, default=HNSW_EF_CONSTRUCTION)
+    arg_parser.add_argument("--maintenance-work-mem", default=HNSW_MAINTENANCE_WORK_MEM)
+    arg_parser.add_argument("--build-workers", type=int, default=HNSW_BUILD_WORKERS)
+    arg_parser.add_argument("--ef-search", type=parse_ints, default=[10, 20, 40, 80, 160])
+    arg_parser.add_argument("--batch-size", type=int, default=200, help="rows per insert statement")
+    arg_parser.add_argument("--keep", action="store_true", help="keep the bench tables afterwards")
+    arg_parser.add_argument("--out", default=".cache/bench_hnsw.json")
+    args = arg_parser.parse_args()
+
+    from clients import supabase_client
+    client = supabase_client()
+
+    if args.local:
+        embeddings = truncate(np.load(Path(args.local) / 'embeddings.npy'), EMBEDDING_DIMENSION)
+        source = f"local:{args.local}"
+    else:
+        embeddings = synthetic_embeddings(args.rows, EMBEDDING_DIMENSION)
+        source = "synthetic"
+
+    queries = make_queries(embeddings, args.queries, args.noise)
+    truth = [np.argsort(-(embeddings @ query))[:args.k] for query in queries]
+
+    print(f"{len(embeddings)} rows ({source}), {len(queries)} queries, k={args.k}, "
+          f"m={args.m}, ef_construction={args.ef_construction}, maintenance_work_mem={args.maintenance_work_mem}")
+
+    client.rpc("sql", {"query": MATCH_FUNCTION_SQL % {'dimension': EMBEDDING_DIMENSION}}).execute()
+    report = {'rows': len(embeddings), 'source': source, 'queries': len(queries), 'k': args.k,
+              'm': args.m, 'ef_construction': args.ef_construction,
+              'maintenance_work_mem': args.maintenance_work_mem, 'strategies': []}
+    try:
+        for load in (load_incremental, load_bulk):
+            strategy = load(client, embeddings, args)
+            strategy['search'] = [measure_recall(client, strategy['table'], queries, truth, args.k, ef)
+                                  for ef in args.ef_search]
+            report['strategies'].append(strategy)
+    finally:
+        if not args.keep:
+            drops = [f"drop table if exists {table};" for table in TABLES]
+            drops.append("drop function if exists bench_hnsw_match(text, vector, int, int);")
+            client.rpc("sql", {"query": "\n".join(drops)}).execute()
+
+    print(f"\n{'strategy':<26}{'load s':>9}{'index s':>9}{'total s':>9}")
+    print("-" * 53)
+    for strategy in report['strategies']:
+        print(f"{strategy['table']:<26}{strategy['load_s']:>9.1f}{strategy['index_s']:>9.1f}"
+              f"{strategy['total_s']:>9.1f}")
+
+    print(f"\n{'strategy':<26}{'ef_search':>10}{'recall@k':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    print("-" * 64)
+    for strategy in report['strategies']:
+        for row in strategy['search']:
+            print(f"{strategy['table']:<26}{row['ef_search']:>10}{row['recall_at_k']:>10.3f}"
+                  f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}")
+
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Memory benchmark: List[float] embeddings vs contiguous float32 rows
+Simulates an ingest of N chunks and reports peak RSS and serialization time per representation
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+import numpy as np
+
+DIMENSION = 1536
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux (bytes on macOS)
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def make_chunks(count: int):
+    return [{'content': f"청크 {i} " + "스위스 여행 정보 " * 60, 'chunk_index': i} for i in range(count)]
+
+
+def run_lists(count: int, batch_size: int):
+    """Previous representation: every embedding is a list of Python floats until upload"""
+
+    chunks = make_chunks(count)
+    rng = np.random.default_rng(0)
+    for start in range(0, count, 1000):
+        block = rng.standard_normal((min(1000, count - start), DIMENSION), dtype=np.float32).tolist()
+        for chunk, embedding in zip(chunks[start:start + 1000], block):
+            chunk['embedding'] = embedding
+
+    start = time.perf_counter()
+    payload_bytes = 0
+    for i in range(0, count, batch_size):
+        payload_bytes += len(json.dumps([{'embedding': c['embedding']} for c in chunks[i:i + batch_size]]))
+    return time.perf_counter() - start, payload_bytes
+
+
+def run_float32(count: int, batch_size: int):
+    """New representation: rows of one float32 matrix, serialized once per upload batch"""
+
+    from embedding_store import attach_embeddings, vector_literal
+
+    chunks = make_chunks(count)
+    rng = np.random.default_rng(0)
+    embeddings = []
+    for start in range(0, count, 1000):
+        embeddings.extend(rng.standard_normal((min(1000, count - start), DIMENSION), dtype=np.float32))
+    chunks = attach_embeddings(chunks, embeddings, DIMENSION)
+    del embeddings
+
+    start = time.perf_counter()
+    payload_bytes = 0
+    for i in range(0, count, batch_size):
+        payload_bytes += len(json.dumps([{'embedding': vector_literal(c['embedding'])}
+                                         for c in chunks[i:i + batch_size]]))
+    return time.perf_counter() - start, payload_bytes
+
+
+def child(mode: str, count: int, batch_size: int):
+    runner = run_lists if mode == "lists" else run_float32
+    seconds, payload_bytes = runner(count, batch_size)
+    print(json.dumps({'mode': mode, 'peak_rss_mb': peak_rss_mb(),
+                      'serialize_seconds': seconds, 'payload_mb': payload_bytes / 1e6}))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--chunks", type=int, default=100000)
+    arg_parser.add_argument("--batch-size", type=int, default=50)
+    arg_parser.add_argument("--child", choices=["lists", "float32"], help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.child:
+        child(args.child, args.chunks, args.batch_size)
+        return
+
+    print(f"Simulated ingest: {args.chunks} chunks x {DIMENSION} dims")
+    print(f"\n{'representation':<16}{'peak RSS (MB)':>15}{'serialize (s)':>15}{'payload (MB)':>14}")
+    print("-" * 60)
+
+    # Each representation runs in a fresh process so peak RSS is not shared
+    for mode in ("lists", "float32"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", mode,
+             "--chunks", str(args.chunks), "--batch-size", str(args.batch_size)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:<16}{result['peak_rss_mb']:>15.0f}{result['serialize_seconds']:>15.2f}"
+              f"{result['payload_mb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark: whole-file MarkdownParser vs streaming single-pass section parser
+Times parsing and cleaning of a multi-megabyte export, compares peak memory and checks section agreement
+"""
+import argparse
+import re
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+import frontmatter
+from markdown_parser import MarkdownParser
+
+
+# Previous implementation, kept here as the baseline
+
+def legacy_parse_sections(content: str):
+    section_pattern = re.compile(r'^(#{1,6})\s+(.+)$', re.MULTILINE)
+    sections = []
+    current_section = {'title': '', 'level': 0, 'content': [], 'start_line': 0}
+
+    for i, line in enumerate(content.split('\n')):
+        header_match = section_pattern.match(line)
+        if header_match:
+            if current_section['content']:
+                current_section['content'] = '\n'.join(current_section['content']).strip()
+                sections.append(current_section.copy())
+            current_section = {'title': header_match.group(2).strip(), 'level': len(header_match.group(1)),
+                               'content': [], 'start_line': i}
+        else:
+            current_section['content'].append(line)
+
+    if current_section['content']:
+        current_section['content'] = '\n'.join(current_section['content']).strip()
+        sections.append(current_section)
+    return sections
+
+
+def legacy_clean_content(content: str) -> str:
+    content = re.sub(r'\n\s*\n\s*\n', '\n\n', content)
+    content = re.sub(r'!\[([^\]]*)\]\([^)]+\)', r'\1', content)
+    content = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', content)
+    content = re.sub(r'```[^\n]*\n', '', content)
+    content = re.sub(r'```', '', content)
+    content = re.sub(r' {2,}', ' ', content)
+    return content.strip()
+
+
+def legacy_parse(file_path: Path, clean: bool):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        post = frontmatter.load(f)
+    sections = legacy_parse_sections(post.content)
+    len(post.content.split())  # word count for the reading-time estimate, as chunk_file needed
+    if clean:
+        for section in sections:
+            section['content'] = legacy_clean_content(section['content'])
+    return sections
+
+
+def streaming_parse(parser: MarkdownParser, file_path: Path, clean: bool):
+    with parser.open_document(file_path, clean=clean) as document:
+        return list(document.sections())
+
+
+def streaming_consume(parser: MarkdownParser, file_path: Path, clean: bool):
+    """Consume sections one at a time (how chunk_file uses the parser)"""
+
+    count = 0
+    with parser.open_document(file_path, clean=clean) as document:
+        for _ in document.sections():
+            count += 1
+    return count
+
+
+def build_export(markdown_dir: Path, megabytes: float, out_path: Path) -> int:
+    """One large document: every guide's body concatenated until the target size"""
+
+    bodies = [frontmatter.load(str(path)).content for path in sorted(markdown_dir.glob("*.md"))]
+    target = int(megabytes * 1e6)
+    size = 0
+    with open(out_path, 'w', encoding='utf-8') as f:
+        f.write('---\ntitle: "Export"\ncategory: "benchmark"\n---\n\n')
+        while size < target:
+            for body in bodies:
+                f.write(body + '\n\n')
+                size += len(body.encode('utf-8')) + 2
+    return out_path.stat().st_size
+
+
+def best_time(function, rounds: int):
+    best = float('inf')
+    result = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def peak_memory(function) -> float:
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--markdown-dir", default="markdown_files")
+    arg_parser.add_argument("--megabytes", type=float, default=8.0, help="size of the synthetic export")
+    arg_parser.add_argument("--rounds", type=int, default=3)
+    arg_parser.add_argument("--clean", action="store_true", help="also apply clean_content to every section")
+    args = arg_parser.parse_args()
+
+    parser = MarkdownParser()
+    with tempfile.TemporaryDirectory() as tmp:
+        export = Path(tmp) / 'export.md'
+        size = build_export(Path(args.markdown_dir), args.megabytes, export)
+        print(f"Input: {size / 1e6:.1f} MB export, clean={args.clean}")
+
+        legacy_time, legacy_sections = best_time(lambda: legacy_parse(export, args.clean), args.rounds)
+        stream_time, stream_sections = best_time(lambda: streaming_parse(parser, export, args.clean),
+                                                 args.rounds)
+        consume_time, _ = best_time(lambda: streaming_consume(parser, export, args.clean), args.rounds)
+
+        legacy_peak = peak_memory(lambda: legacy_parse(export, args.clean))
+        consume_peak = peak_memory(lambda: streaming_consume(parser, export, args.clean))
+
+    print(f"\n{'parser':<22}{'seconds':>10}{'MB/s':>9}{'peak MB':>10}{'sections':>10}")
+    print("-" * 61)
+    print(f"{'legacy (whole file)':<22}{legacy_time:>10.3f}{size / 1e6 / legacy_time:>9.1f}"
+          f"{legacy_peak:>10.1f}{len(legacy_sections):>10}")
+    print(f"{'streaming (list)':<22}{stream_time:>10.3f}{size / 1e6 / stream_time:>9.1f}"
+          f"{'':>10}{len(stream_sections):>10}")
+    print(f"{'streaming (consume)':<22}{consume_time:>10.3f}{size / 1e6 / consume_time:>9.1f}"
+          f"{consume_peak:>10.1f}")
+    print(f"\nSpeedup: {legacy_time / consume_time:.1f}x, peak memory {legacy_peak / max(consume_peak, 1e-6):.0f}x lower")
+
+    # Agreement (fenced code blocks are the intended difference: '#' lines inside them are not headers)
+    same = sum(1 for old, new in zip(legacy_sections, stream_sections)
+               if (old['title'], old['level'], old['content'], old['start_line']) ==
+               (new['title'], new['level'], new['content'], new['start_line']))
+    print(f"Identical sections: {same}/{len(legacy_sections)}")
+
+
+if __name__ == "__main__":
+    main()
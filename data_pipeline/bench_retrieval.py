@@ -0,0 +1,258 @@
+"""
+Benchmark: retrieval accuracy and latency against a labeled query set
+Reports recall@k, hit rate, MRR and p50/p95/p99 latency of the embedding and search steps,
+and checks the spec targets (search < 200ms, accuracy > 85%)
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+
+SEARCH_LATENCY_TARGET_MS = 200
+ACCURACY_TARGET = 0.85
+
+
+def load_query_set(path: str) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def is_relevant(result: Dict, label: Dict) -> bool:
+    if result.get('file_name') != label['file_name']:
+        return False
+    return label.get('section_title') is None or result.get('section_title') == label['section_title']
+
+
+def score_query(results: List[Dict], labels: List[Dict]) -> Dict:
+    """Recall, hit and reciprocal rank of one query's ranked results"""
+
+    found = [any(is_relevant(result, label) for result in results) for label in labels]
+    first_rank = next(
+        (rank for rank, result in enumerate(results, 1)
+         if any(is_relevant(result, label) for label in labels)),
+        None
+    )
+    return {
+        'recall': sum(found) / len(labels),
+        'hit': first_rank is not None,
+        'reciprocal_rank': 1 / first_rank if first_rank else 0.0,
+    }
+
+
+def latency_summary(seconds: List[float]) -> Dict:
+    ms = np.array(seconds) * 1000
+    return {
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'mean_ms': float(ms.mean()),
+        'samples': len(ms),
+    }
+
+
+def embed_queries(embedder, queries: List[Dict], repeat: int, use_cache: bool):
+    embeddings = []
+    timings = []
+    for query in queries:
+        for attempt in range(repeat):
+            start = time.perf_counter()
+            embedding = embedder.generate_embedding(query['query'], use_cache=use_cache)
+            timings.append(time.perf_counter() - start)
+            if attempt == 0:
+                embeddings.append(embedding)
+    return embeddings, timings
+
+
+def run_setting(retriever, queries: List[Dict], embeddings, threshold: float, count: int, repeat: int,
+                category: str = None, filters: Dict = None) -> Dict:
+    timings = []
+    scores = []
+    full = []
+
+    for query, embedding in zip(queries, embeddings):
+        if embedding is None:
+            scores.append({'recall': 0.0, 'hit': False, 'reciprocal_rank': 0.0})
+            continue
+
+        for attempt in range(repeat):
+            start = time.perf_counter()
+            results = retriever.search_embedding(query['query'], embedding, threshold, count,
+                                                 filter_category=category, filters=filters)
+            timings.append(time.perf_counter() - start)
+            if attempt == 0:
+                scores.append(score_query(results, query['relevant']))
+                full.append(len(results) == count)
+
+    return {
+        'match_threshold': threshold,
+        'match_count': count,
+        'recall_at_k': float(np.mean([s['recall'] for s in scores])),
+        'hit_rate': float(np.mean([s['hit'] for s in scores])),
+        'mrr': float(np.mean([s['reciprocal_rank'] for s in scores])),
+        # Share of queries that got all match_count rows (filtered scans must not come back short)
+        'full_rate': float(np.mean(full)) if full else 0.0,
+        'search_latency': latency_summary(timings) if timings else None,
+    }
+
+
+def run_batch(embedder, retriever, queries: List[Dict], embeddings, threshold: float, count: int,
+              concurrency_levels: List[int], repeat: int, category: str = None, filters: Dict = None) -> Dict:
+    """Batch API throughput: one embeddings call for all queries, then concurrent searches"""
+
+    texts = [query['query'] for query in queries]
+    embed_seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        embedder.generate_query_embeddings(texts)
+        embed_seconds.append(time.perf_counter() - start)
+
+    pairs = [(text, embedding) for text, embedding in zip(texts, embeddings) if embedding is not None]
+    levels = []
+    for concurrency in concurrency_levels:
+        seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            retriever.search_embeddings([text for text, _ in pairs], [embedding for _, embedding in pairs],
+                                        threshold, count, category, filters=filters, concurrency=concurrency)
+            seconds.append(time.perf_counter() - start)
+        levels.append({'concurrency': concurrency, 'best_s': min(seconds),
+                       'queries_per_s': len(pairs) / min(seconds) if min(seconds) else 0.0})
+
+    return {'queries': len(texts), 'embed_batch_s': min(embed_seconds), 'search': levels}
+
+
+def check_targets(setting: Dict) -> Dict:
+    """Spec targets: vector search p95 < 200ms, accuracy (hit rate@k) > 85%"""
+
+    latency = setting['search_latency']['p95_ms'] if setting['search_latency'] else float('inf')
+    return {
+        'setting': {'match_threshold': setting['match_threshold'], 'match_count': setting['match_count']},
+        'search_p95_ms': latency,
+        'search_latency_ok': latency < SEARCH_LATENCY_TARGET_MS,
+        'accuracy': setting['hit_rate'],
+        'accuracy_ok': setting['hit_rate'] > ACCURACY_TARGET,
+    }
+
+
+def parse_floats(value: str) -> List[float]:
+    return [float(v) for v in value.split(',') if v]
+
+
+def parse_ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(',') if v]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--queries", default="retrieval_queries.json")
+    arg_parser.add_argument("--local", help="search an exported LocalVectorIndex instead of Supabase")
+    arg_parser.add_argument("--nprobe", type=int, help="with --local: IVF lists to probe (default exact)")
+    arg_parser.add_argument("--mode", default="vector", choices=["vector", "prefilter", "rrf"],
+                            help="retrieval mode (lexical modes use the local lexical index)")
+    arg_parser.add_argument("--thresholds", type=parse_floats, default=[0.5, 0.6, 0.7])
+    arg_parser.add_argument("--counts", type=parse_ints, default=[3, 5, 10])
+    arg_parser.add_argument("--target-threshold", type=float, default=0.7,
+                            help="setting the spec targets are checked at (the web app's)")
+    arg_parser.add_argument("--target-count", type=int, default=3)
+    arg_parser.add_argument("--repeat", type=int, default=3, help="timed runs per query and step")
+    arg_parser.add_argument("--embedding-cache", action="store_true",
+                            help="serve query embeddings from the on-disk cache")
+    arg_parser.add_argument("--category", help="filter every query to this category")
+    arg_parser.add_argument("--source-type", help="filter every query to this source_type")
+    arg_parser.add_argument("--concurrency", type=parse_ints, default=[1, 4, 8, 16],
+                            help="in-flight searches for the batch throughput runs")
+    arg_parser.add_argument("--out", default=".cache/bench_retrieval.json")
+    arg_parser.add_argument("--check", action="store_true", help="exit 1 if a spec target is missed")
+    args = arg_parser.parse_args()
+
+    from embedder import EmbeddingGenerator
+    from retriever import Retriever
+
+    query_set = load_query_set(args.queries)
+    queries = query_set['queries']
+
+    if args.local:
+        from local_index import LocalVectorIndex
+        client = LocalVectorIndex.load(args.local)
+        backend = f"local:{args.local}"
+        if args.nprobe:
+            client.build_ivf()
+            client.nprobe = args.nprobe
+            backend += f" (ivf nprobe={args.nprobe})"
+    else:
+        from supabase import create_client
+        from config import SUPABASE_URL, SUPABASE_KEY
+        client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        backend = "supabase"
+
+    embedder = EmbeddingGenerator(use_cache=args.embedding_cache)
+    embeddings, embed_timings = embed_queries(embedder, queries, args.repeat, args.embedding_cache)
+    retriever = Retriever(client=client, embedder=embedder, use_cache=False, mode=args.mode)
+
+    grid = [(t, c) for t in args.thresholds for c in args.counts]
+    target = (args.target_threshold, args.target_count)
+    if target not in grid:
+        grid.append(target)
+
+    filters = {'source_type': args.source_type} if args.source_type else None
+    settings = [run_setting(retriever, queries, embeddings, t, c, args.repeat, args.category, filters)
+                for t, c in grid]
+    batch = run_batch(embedder, retriever, queries, embeddings, *target, args.concurrency, args.repeat,
+                      args.category, filters)
+    targets = check_targets(next(s for s in settings
+                                 if (s['match_threshold'], s['match_count']) == target))
+
+    report = {
+        'query_set_version': query_set['version'],
+        'queries': len(queries),
+        'backend': backend,
+        'mode': args.mode,
+        'filters': {'category': args.category, 'source_type': args.source_type},
+        'embedding_cache': args.embedding_cache,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'embedding_latency': latency_summary(embed_timings),
+        'settings': settings,
+        'batch': batch,
+        'targets': targets,
+        'passed': targets['search_latency_ok'] and targets['accuracy_ok'],
+    }
+
+    print(f"Query set v{report['query_set_version']}: {len(queries)} queries, backend {backend}, "
+          f"mode {args.mode}")
+    print(f"Embedding latency: p50 {report['embedding_latency']['p50_ms']:.1f}ms, "
+          f"p95 {report['embedding_latency']['p95_ms']:.1f}ms, p99 {report['embedding_latency']['p99_ms']:.1f}ms")
+    print(f"\n{'threshold':>10}{'k':>5}{'recall@k':>10}{'hit@k':>8}{'MRR':>8}{'full':>7}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    print("-" * 75)
+    for s in settings:
+        latency = s['search_latency'] or {'p50_ms': 0, 'p95_ms': 0, 'p99_ms': 0}
+        print(f"{s['match_threshold']:>10.2f}{s['match_count']:>5}{s['recall_at_k']:>10.3f}{s['hit_rate']:>8.3f}"
+              f"{s['mrr']:>8.3f}{s['full_rate']:>7.0%}{latency['p50_ms']:>9.1f}{latency['p95_ms']:>9.1f}{latency['p99_ms']:>9.1f}")
+
+    print(f"\nBatch of {batch['queries']} queries: one embeddings call {batch['embed_batch_s'] * 1000:.0f}ms "
+          f"(vs. {report['embedding_latency']['mean_ms'] * batch['queries']:.0f}ms one by one)")
+    for level in batch['search']:
+        print(f"  concurrency {level['concurrency']:>3}: {level['best_s'] * 1000:>7.0f}ms, "
+              f"{level['queries_per_s']:>6.1f} queries/s")
+
+    print(f"\nTargets at threshold {target[0]}, k={target[1]}:")
+    print(f"  search p95 {targets['search_p95_ms']:.1f}ms < {SEARCH_LATENCY_TARGET_MS}ms: "
+          f"{'✅' if targets['search_latency_ok'] else '❌'}")
+    print(f"  accuracy {targets['accuracy']:.1%} > {ACCURACY_TARGET:.0%}: {'✅' if targets['accuracy_ok'] else '❌'}")
+
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nReport written to {out_path}")
+
+    if args.check and not report['passed']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
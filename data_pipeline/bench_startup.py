@@ -0,0 +1,83 @@
+"""
+Benchmark: cold-start time of the pipeline entry points
+Runs each command in a fresh interpreter under `python -X importtime` and reports wall time, import time and the heaviest imports
+"""
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+HERE = Path(__file__).resolve().parent
+
+# (label, script arguments); the plain scripts import all their dependencies at module load
+COMMANDS = [
+    ("cli --help", ["cli.py", "--help"]),
+    ("cli ingest --help", ["cli.py", "ingest", "--help"]),
+    ("cli search --help", ["cli.py", "search", "--help"]),
+    ("cli stats", ["cli.py", "stats"]),
+    ("process_markdown.py --help", ["process_markdown.py", "--help"]),
+    ("test_search.py --help", ["test_search.py", "--help"]),
+]
+
+# "import time: self [us] | cumulative | imported package" (nesting shown by indentation)
+_IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def parse_importtime(stderr: str) -> Dict:
+    """Total import time and the top-level modules by cumulative time"""
+
+    top_level = []
+    modules = 0
+    for match in _IMPORT_LINE.finditer(stderr):
+        modules += 1
+        if len(match.group(3)) == 1:
+            top_level.append((match.group(4), int(match.group(2))))
+    return {
+        'import_us': sum(us for _, us in top_level),
+        'modules': modules,
+        'heaviest': sorted(top_level, key=lambda item: -item[1]),
+    }
+
+
+def measure(argv: List[str], rounds: int) -> Dict:
+    walls = []
+    imports = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime", *argv], cwd=HERE,
+                                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, text=True)
+        walls.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+            return {'error': errors[-1] if errors else f"exit code {result.returncode}"}
+        parsed = parse_importtime(result.stderr)
+        if imports is None or parsed['import_us'] < imports['import_us']:
+            imports = parsed
+    return {'best': min(walls), 'median': statistics.median(walls), **imports}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--rounds", type=int, default=5)
+    arg_parser.add_argument("--top", type=int, default=3, help="heaviest top-level imports to show")
+    args = arg_parser.parse_args()
+
+    print(f"{'command':<28}{'best ms':>9}{'median ms':>11}{'import ms':>11}{'modules':>9}  heaviest imports")
+    print("-" * 100)
+    for label, argv in COMMANDS:
+        result = measure(argv, args.rounds)
+        if 'error' in result:
+            print(f"{label:<28}  failed: {result['error']}")
+            continue
+        heaviest = ", ".join(f"{name} {us / 1000:.0f}ms" for name, us in result['heaviest'][:args.top])
+        print(f"{label:<28}{result['best'] * 1000:>9.0f}{result['median'] * 1000:>11.0f}"
+              f"{result['import_us'] / 1000:>11.0f}{result['modules']:>9}  {heaviest}")
+
+
+if __name__ == "__main__":
+    main()
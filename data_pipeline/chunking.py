@@ -2,29 +2,59 @@
 Text chunking utilities for Swiss Travel RAG
 Implements semantic chunking with overlap
 """
-import tiktoken
-from typing import List
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from config import CHUNK_SIZE, CHUNK_OVERLAP
+from datetime import datetime, timezone
+from functools import cached_property
+from pathlib import Path
+from typing import Dict, List, Tuple
+from config import CHUNK_SIZE, CHUNK_OVERLAP, CHUNKER_ENGINE
+from metrics import current_run
+from token_chunker import TokenOffsetSplitter, DEFAULT_SEPARATORS
+from tokenizer import get_encoding
 
 class TextChunker:
-    def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+    def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP,
+                 engine: str = CHUNKER_ENGINE):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.encoding = tiktoken.encoding_for_model("text-embedding-ada-002")
+        self.engine = engine
         
-        # Initialize text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
+        if engine not in ("token", "langchain"):
+            raise ValueError(f"Unknown chunker engine: {engine}")
+    
+    # The tokenizer and splitters are built on first use, not at construction
+    
+    @cached_property
+    def encoding(self):
+        return get_encoding("text-embedding-ada-002")
+    
+    @cached_property
+    def token_splitter(self) -> TokenOffsetSplitter:
+        # Encodes each text once and cuts in token-offset space
+        return TokenOffsetSplitter(self.encoding, self.chunk_size, self.chunk_overlap, DEFAULT_SEPARATORS)
+    
+    @cached_property
+    def text_splitter(self):
+        # Re-encodes candidate substrings through length_function
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        return RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
             length_function=self._count_tokens,
-            separators=["\n\n", "\n", ". ", "! ", "? ", " ", ""]
+            separators=DEFAULT_SEPARATORS
         )
     
     def _count_tokens(self, text: str) -> int:
         """Count tokens in text using tiktoken"""
         return len(self.encoding.encode(text))
     
+    def split_text(self, text: str) -> List[Tuple[str, int]]:
+        """Split text into (chunk_text, token_count) pairs with the configured engine"""
+        
+        if self.engine == "token":
+            return self.token_splitter.split_text(text)
+        
+        return [(chunk, self._count_tokens(chunk)) for chunk in self.text_splitter.split_text(text)]
+    
     def chunk_text(self, text: str, metadata: dict = None) -> List[dict]:
         """
         Chunk text into smaller pieces with metadata
@@ -37,19 +67,19 @@ class TextChunker:
             List of chunk dictionaries with content and metadata
         """
         
-        # Split text into chunks
-        chunks = self.text_splitter.split_text(text)
+        # Split text into (chunk, token_count) pairs
+        chunks = self.split_text(text)
         
         # Prepare chunk objects with metadata
         chunk_objects = []
         total_chunks = len(chunks)
         
-        for i, chunk_content in enumerate(chunks):
+        for i, (chunk_content, token_count) in enumerate(chunks):
             chunk_obj = {
                 'content': chunk_content.strip(),
                 'chunk_index': i,
                 'total_chunks': total_chunks,
-                'token_count': self._count_tokens(chunk_content),
+                'token_count': token_count,
                 'parent_chunk_id': None  # Will be set after insertion
             }
             
@@ -76,24 +106,7 @@ class TextChunker:
         all_chunks = []
         
         for section in sections:
-            section_text = f"# {section['title']}\n\n{section['content']}"
-            
-            # Create section-specific metadata
-            section_metadata = {
-                'section_title': section['title'],
-                'section_level': section['level'],
-            }
-            
-            if metadata:
-                section_metadata.update(metadata)
-            
-            # Chunk the section
-            section_chunks = self.chunk_text(section_text, section_metadata)
-            
-            # Adjust chunk indices to be global
-            for chunk in section_chunks:
-                chunk['chunk_index'] = len(all_chunks)
-                all_chunks.append(chunk)
+            all_chunks.extend(self.chunk_section(section, metadata, len(all_chunks)))
         
         # Update total chunks count
         total_chunks = len(all_chunks)
@@ -102,7 +115,91 @@ class TextChunker:
         
         return all_chunks
     
+    def chunk_section(self, section: dict, metadata: dict = None, first_index: int = 0) -> List[dict]:
+        """
+        Chunk one section (total_chunks is set by the caller once all sections are chunked)
+        
+        Args:
+            section: Section dictionary from markdown parser
+            metadata: Document metadata
+            first_index: Document-wide index of the section's first chunk
+            
+        Returns:
+            List of chunk dictionaries
+        """
+        
+        section_text = f"# {section['title']}\n\n{section['content']}"
+        
+        # Create section-specific metadata
+        section_metadata = {
+            'section_title': section['title'],
+            'section_level': section['level'],
+        }
+        
+        if metadata:
+            section_metadata.update(metadata)
+        
+        # Chunk the section
+        section_chunks = self.chunk_text(section_text, section_metadata)
+        
+        # Adjust chunk indices to be global
+        for offset, chunk in enumerate(section_chunks):
+            chunk['chunk_index'] = first_index + offset
+        
+        return section_chunks
+    
     def validate_chunk_size(self, text: str) -> bool:
         """Validate that text fits within token limits"""
         token_count = self._count_tokens(text)
-        return token_count <= self.chunk_size * 1.2  # Allow 20% buffer
\ No newline at end of file
+        return token_count <= self.chunk_size * 1.2  # Allow 20% buffer
+
+
+def chunk_file(parser, chunker: "TextChunker", file_path: Path) -> List[Dict]:
+    """
+    Parse one markdown file and split it into chunks with document metadata
+    
+    Sections are streamed from the file and chunked as they are read, so the
+    parser never holds more than one section of a large document. A body
+    without sections (e.g. only a header) is chunked whole, as before.
+    """
+
+    metrics = current_run()
+
+    with metrics.stage('parse'):
+        document = parser.open_document(file_path)
+        metadata = document.metadata
+
+        # Source freshness from the file's modification time
+        metadata['source_updated_at'] = datetime.fromtimestamp(
+            file_path.stat().st_mtime, tz=timezone.utc
+        ).isoformat()
+
+    chunks = []
+    section_count = 0
+    sections = document.sections()
+    while True:
+        with metrics.stage('parse'):
+            section = next(sections, None)
+        if section is None:
+            break
+        section_count += 1
+        with metrics.stage('chunk'):
+            chunks.extend(chunker.chunk_section(section, metadata, len(chunks)))
+
+    if not section_count:
+        # Fallback: chunk entire content (it has no section text, so it is small)
+        with metrics.stage('parse'):
+            full_content = parser.parse_file(file_path)['full_content']
+        with metrics.stage('chunk'):
+            chunks = chunker.chunk_text(full_content, metadata)
+
+    # Reading time needs the whole document's word count, known only now
+    reading_time = parser.reading_time_for_words(document.word_count)
+    for chunk in chunks:
+        chunk['total_chunks'] = len(chunks)
+        chunk['estimated_reading_time'] = reading_time
+
+    metrics.add('parse', items=1, bytes_read=document.bytes_read)
+    metrics.add('chunk', items=len(chunks), tokens=sum(chunk['token_count'] for chunk in chunks))
+
+    return chunks
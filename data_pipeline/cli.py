@@ -0,0 +1,334 @@
+"""
+Command line interface for the Swiss Travel RAG data pipeline
+One entry point for ingest, search, setup, queue, worker, stats and bench; each subcommand imports its heavy modules only when it runs
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from config import (
+    CHUNK_WORKERS, METRICS_DIR, PROFILE_STAGE, PROFILER, BULK_LOAD,
+    SEARCH_CONCURRENCY, QUEUE_BACKEND, QUEUE_NAME, FETCH_PAGE_SIZE, HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_MAINTENANCE_WORK_MEM, HNSW_BUILD_WORKERS, HNSW_EF_SEARCH,
+    LOCAL_INDEX_PATH, SEARCH_MODE, MANIFEST_PATH, SPOOL_DIR, EMBEDDING_CACHE_PATH, TABLE_NAME,
+)
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+
+def bench_names():
+    return sorted(path.stem[len("bench_"):] for path in BENCH_DIR.glob("bench_*.py"))
+
+
+# Subcommands
+
+def run_ingest(args) -> int:
+    from metrics import start_run
+    from process_markdown import process_markdown_files
+
+    run = start_run(run_id=args.resume, profile_stage=args.profile_stage, profiler=args.profiler)
+    success = False
+    try:
+        success = process_markdown_files(incremental=args.incremental, stream=args.stream,
+                                         workers=args.workers, resume=args.resume, bulk_load=args.bulk_load)
+    finally:
+        run.finish()
+        run.print_summary()
+        print(f"📈 Run report written to {run.write_reports(args.metrics_dir)}")
+    return 0 if success else 1
+
+
+def run_search(args) -> int:
+    from retriever import Retriever
+    from test_search import test_search, test_multiple_queries
+
+    local_index = None
+    if args.local:
+        from local_index import LocalVectorIndex
+        local_index = LocalVectorIndex.load(args.local)
+        print(f"📦 Local index: {len(local_index.rows)} rows from {args.local}")
+        if args.nprobe:
+            local_index.build_ivf()
+            local_index.nprobe = args.nprobe
+            print(f"   IVF: probing {args.nprobe} lists per query")
+    retriever = Retriever(client=local_index, mode=args.mode, ef_search=args.ef_search)
+
+    filters = {'source_type': args.source_type, 'tags': args.tag, 'location': args.location,
+               'post_month': args.post_month}
+    filters = {field: value for field, value in filters.items() if value is not None}
+
+    if args.batch:
+        return run_search_batch(args, retriever, filters)
+
+    query = args.query
+    if query is None:
+        query = input("Enter search query (or press Enter for multiple tests): ").strip()
+
+    if query:
+        test_search(query, top_k=args.top_k, retriever=retriever, filter_category=args.category,
+                    filters=filters)
+    else:
+        test_multiple_queries(retriever)
+    return 0
+
+
+def run_search_batch(args, retriever, filters) -> int:
+    """Answer a file of queries (one per line) with the batch API and write them as JSONL"""
+
+    with open(args.batch, 'r', encoding='utf-8') as f:
+        queries = [line.strip() for line in f if line.strip()]
+
+    start = time.perf_counter()
+    batch_results = retriever.search_many(queries, match_count=args.top_k, filter_category=args.category,
+                                          filters=filters, concurrency=args.concurrency)
+    elapsed = time.perf_counter() - start
+
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        for query, results in zip(queries, batch_results):
+            f.write(json.dumps({'query': query, 'results': results}, ensure_ascii=False, default=str) + '\n')
+
+    failed = sum(results is None for results in batch_results)
+    print(f"✅ {len(queries)} queries in {elapsed:.1f}s ({len(queries) / max(elapsed, 1e-9):.1f}/s), "
+          f"{failed} failed, written to {out_path}")
+    return 0 if not failed else 1
+
+
+def run_queue(args) -> int:
+    from work_queue import open_queue
+
+    queue = open_queue(args.backend, args.name)
+    if args.action == "fill":
+        from ingest_worker import fill_queue
+        added = fill_queue(queue, files=args.files, posts=args.posts, category=args.category,
+                           page_size=args.page_size, reset=args.reset)
+        print(f"📥 {added} units added to queue '{args.name}'")
+    elif args.action == "retry":
+        print(f"🔁 {queue.requeue_failed()} failed or abandoned units set back to pending")
+
+    counts = queue.status()
+    print(f"📋 Queue '{args.name}' ({args.backend}): " + ", ".join(f"{counts[key]} {key}" for key in counts))
+    if counts['pending'] == counts['leased'] == 0 and counts['done']:
+        print("   Drained; rebuild the lexical index with `python local_index.py`")
+    return 0
+
+
+def run_worker(args) -> int:
+    from metrics import start_run
+    from work_queue import open_queue
+    from ingest_worker import IngestWorker
+
+    run = start_run(profile_stage=args.profile_stage, profiler=args.profiler)
+    worker = IngestWorker(open_queue(args.backend, args.name), worker_id=args.id,
+                          shard=args.shard, shards=args.shards)
+    summary = {'failed': 1}
+    try:
+        summary = worker.run(max_units=args.max_units, wait=args.wait)
+    finally:
+        run.finish()
+        run.print_summary()
+        # One report directory per worker, so workers on a host do not overwrite each other
+        print(f"📈 Run report written to {run.write_reports(Path(args.metrics_dir) / worker.worker_id)}")
+    return 0 if not summary['failed'] else 1
+
+
+def run_setup(args) -> int:
+    if args.tokenizer or args.tokenizer_file:
+        import tokenizer
+        path = tokenizer.install(args.tokenizer_file)
+        print(f"✅ Tokenizer cached at {path}")
+        return 0
+
+    if args.rebuild_index and args.print_sql:
+        from compact_storage import drop_vector_index_sql, build_vector_index_sql
+        # Run from psql or the SQL editor: each statement is top-level there, so the timeout can be lifted
+        print("begin;\nset local statement_timeout = 0;")
+        print(drop_vector_index_sql() + build_vector_index_sql(
+            m=args.m, ef_construction=args.ef_construction,
+            maintenance_work_mem=args.maintenance_work_mem, workers=args.build_workers) + "commit;")
+        return 0
+
+    if args.rebuild_index:
+        from uploader import DatabaseUploader
+        uploader = DatabaseUploader()
+        rebuilt = uploader.drop_vector_index() and uploader.build_vector_index(
+            m=args.m, ef_construction=args.ef_construction,
+            maintenance_work_mem=args.maintenance_work_mem, workers=args.build_workers)
+        return 0 if rebuilt else 1
+
+    if args.print_sql:
+        from simple_setup import simple_setup
+        return 0 if simple_setup() else 1
+
+    from setup_db import setup_database
+    setup_database()
+    return 0
+
+
+def run_stats(args) -> int:
+    """Local pipeline state: manifest, last run, unfinished runs, caches (and the table with --db)"""
+
+    manifest_path = Path(MANIFEST_PATH)
+    if manifest_path.exists():
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            entries = json.load(f).get('files', {})
+        chunks = sum(entry.get('chunk_count', 0) for entry in entries.values())
+        last = max((entry.get('ingested_at', 0) for entry in entries.values()), default=0)
+        print(f"📚 Manifest: {len(entries)} files, {chunks} chunks"
+              + (f", last ingested {time.strftime('%Y-%m-%d %H:%M', time.localtime(last))}" if last else ""))
+    else:
+        print(f"📚 Manifest: none at {manifest_path}")
+
+    unfinished = []
+    for state_path in sorted(Path(SPOOL_DIR).glob("*/state.json")):
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if 'finalize' not in state.get('stages', {}):
+            unfinished.append((state['run_id'], list(state.get('stages', {}))))
+    for run_id, stages in unfinished:
+        print(f"🧾 Unfinished run {run_id} (done: {', '.join(stages) or 'nothing'}): "
+              f"cli.py ingest --resume {run_id}")
+
+    if Path(EMBEDDING_CACHE_PATH).exists():
+        from embedding_cache import EmbeddingCache
+        cache = EmbeddingCache()
+        print(f"💾 Embedding cache: {cache.stats()['entries']} entries")
+        cache.close()
+
+    report_path = Path(args.metrics_dir) / 'run_report.json'
+    if report_path.exists():
+        from metrics import print_report
+        with open(report_path, 'r', encoding='utf-8') as f:
+            print_report(json.load(f))
+    else:
+        print(f"⏱️ No run report in {args.metrics_dir}")
+
+    if args.db:
+        from clients import supabase_client
+        response = supabase_client().table(TABLE_NAME).select("id", count="exact").limit(1).execute()
+        print(f"\n📊 Total chunks in database: {response.count or 0}")
+    return 0
+
+
+def run_bench(args) -> int:
+    import importlib
+
+    module = importlib.import_module(f"bench_{args.name}")
+    sys.argv = [f"bench_{args.name}.py", *args.args]
+    module.main()
+    return 0
+
+
+# Argument parsing (config is the only pipeline module imported up to here)
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Swiss Travel RAG data pipeline")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+
+    ingest = commands.add_parser("ingest", help="process markdown files into the vector store")
+    ingest.add_argument("--incremental", action="store_true",
+                        help="only ingest new/changed files and drop rows of changed/deleted files")
+    ingest.add_argument("--stream", action="store_true",
+                        help="overlap parsing, embedding and uploading with bounded memory")
+    ingest.add_argument("--workers", type=int, default=CHUNK_WORKERS,
+                        help="parse/chunk processes (1 = in-process, 0 = all cores)")
+    ingest.add_argument("--metrics-dir", default=METRICS_DIR,
+                        help="where to write run_report.json and metrics.prom")
+    ingest.add_argument("--profile-stage", default=PROFILE_STAGE,
+                        choices=["", "parse", "chunk", "dedup", "embed", "upload", "delete", "link", "index"],
+                        help="profile one stage (in-process parsing needs --workers 1)")
+    ingest.add_argument("--profiler", default=PROFILER, choices=["cprofile", "pyinstrument"])
+    ingest.add_argument("--resume", metavar="RUN_ID",
+                        help="continue an interrupted run from its last checkpoint")
+    ingest.add_argument("--bulk-load", action=argparse.BooleanOptionalAction, default=BULK_LOAD,
+                        help="drop the vector index while uploading and rebuild it afterwards")
+    ingest.set_defaults(handler=run_ingest)
+
+    search = commands.add_parser("search", help="search the vector store")
+    search.add_argument("query", nargs="?",
+                        help="query text (prompted for if omitted; empty runs the sample queries)")
+    search.add_argument("--top-k", type=int, default=5)
+    search.add_argument("--local", nargs="?", const=LOCAL_INDEX_PATH,
+                        help="search an exported local index instead of Supabase")
+    search.add_argument("--nprobe", type=int,
+                        help="with --local: approximate IVF search probing this many lists (default exact)")
+    search.add_argument("--mode", default=SEARCH_MODE, choices=["vector", "prefilter", "rrf"],
+                        help="vector only, lexical prefilter, or vector + lexical rank fusion")
+    search.add_argument("--ef-search", type=int, default=HNSW_EF_SEARCH or None,
+                        help="HNSW candidate list for these queries (higher = better recall, slower)")
+    search.add_argument("--batch", metavar="PATH",
+                        help="file with one query per line, answered in one batch (see --out)")
+    search.add_argument("--out", default=".cache/search_results.jsonl", help="JSONL output of --batch")
+    search.add_argument("--concurrency", type=int, default=SEARCH_CONCURRENCY,
+                        help="search requests in flight for --batch")
+    search.add_argument("--category")
+    search.add_argument("--source-type", choices=["markdown", "community_post", "community_comment"])
+    search.add_argument("--tag", action="append", help="required tag (repeatable)")
+    search.add_argument("--location")
+    search.add_argument("--post-month", type=int, choices=range(1, 13), metavar="1-12")
+    search.set_defaults(handler=run_search)
+
+    setup = commands.add_parser("setup", help="create the table, indexes and search functions")
+    setup.add_argument("--print-sql", action="store_true",
+                       help="check the table and print the setup SQL instead of running it "
+                            "(with --rebuild-index: print the rebuild SQL without a statement timeout)")
+    setup.add_argument("--tokenizer", action="store_true",
+                       help="only fill the local tokenizer cache (TIKTOKEN_CACHE_DIR)")
+    setup.add_argument("--tokenizer-file", metavar="PATH",
+                       help="bundled cl100k_base.tiktoken to install instead of downloading it")
+    setup.add_argument("--rebuild-index", action="store_true",
+                       help="drop and rebuild the HNSW index in one pass with the parameters below")
+    setup.add_argument("--m", type=int, default=HNSW_M)
+    setup.add_argument("--ef-construction", type=int, default=HNSW_EF_CONSTRUCTION)
+    setup.add_argument("--maintenance-work-mem", default=HNSW_MAINTENANCE_WORK_MEM)
+    setup.add_argument("--build-workers", type=int, default=HNSW_BUILD_WORKERS)
+    setup.set_defaults(handler=run_setup)
+
+    queue = commands.add_parser("queue", help="fill or inspect the distributed ingest queue")
+    queue.add_argument("action", choices=["fill", "status", "retry"],
+                       help="enqueue work units, show unit counts, or requeue failed and abandoned units")
+    queue.add_argument("--backend", default=QUEUE_BACKEND, choices=["sqlite", "postgres"])
+    queue.add_argument("--name", default=QUEUE_NAME, help="queue name (one per rebuild)")
+    queue.add_argument("--files", action=argparse.BooleanOptionalAction, default=True,
+                       help="one unit per markdown file")
+    queue.add_argument("--posts", action="store_true", help="one unit per page of community posts")
+    queue.add_argument("--category", help="only community posts of this category")
+    queue.add_argument("--page-size", type=int, default=FETCH_PAGE_SIZE, help="posts per unit")
+    queue.add_argument("--reset", action="store_true", help="set already queued units back to pending")
+    queue.set_defaults(handler=run_queue)
+
+    worker = commands.add_parser("worker", help="process units from the ingest queue (run several)")
+    worker.add_argument("--backend", default=QUEUE_BACKEND, choices=["sqlite", "postgres"])
+    worker.add_argument("--name", default=QUEUE_NAME)
+    worker.add_argument("--id", help="worker name in the queue (default host-pid)")
+    worker.add_argument("--shard", type=int, help="preferred shard of --shards (e.g. this worker's index)")
+    worker.add_argument("--shards", type=int)
+    worker.add_argument("--max-units", type=int)
+    worker.add_argument("--wait", action="store_true", help="keep polling when the queue is empty")
+    worker.add_argument("--metrics-dir", default=METRICS_DIR)
+    worker.add_argument("--profile-stage", default=PROFILE_STAGE,
+                        choices=["", "parse", "chunk", "dedup", "embed", "upload", "delete", "link", "index"])
+    worker.add_argument("--profiler", default=PROFILER, choices=["cprofile", "pyinstrument"])
+    worker.set_defaults(handler=run_worker)
+
+    stats = commands.add_parser("stats", help="show manifest, cache and last run statistics")
+    stats.add_argument("--metrics-dir", default=METRICS_DIR)
+    stats.add_argument("--db", action="store_true", help="also count the rows in the database")
+    stats.set_defaults(handler=run_stats)
+
+    bench = commands.add_parser("bench", help="run one of the bench_*.py benchmarks")
+    bench.add_argument("name", choices=bench_names())
+    bench.add_argument("args", nargs=argparse.REMAINDER, help="arguments passed to the benchmark")
+    bench.set_defaults(handler=run_bench)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,22 @@
+"""
+Shared API clients for Swiss Travel RAG
+Supabase and OpenAI clients are created on first use and reused by every component in the process
+"""
+from functools import lru_cache
+from config import SUPABASE_URL, SUPABASE_KEY, OPENAI_API_KEY
+
+
+@lru_cache(maxsize=None)
+def supabase_client():
+    """The process-wide Supabase client"""
+
+    from supabase import create_client
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+
+@lru_cache(maxsize=None)
+def openai_client():
+    """The process-wide synchronous OpenAI client (async engines open their own per event loop)"""
+
+    from openai import OpenAI
+    return OpenAI(api_key=OPENAI_API_KEY)
@@ -0,0 +1,347 @@
+"""
+Compact embedding storage for Swiss Travel RAG
+halfvec / int8 / binary quantization with optional truncated dimensions, coarse search + full-precision rerank
+"""
+import hashlib
+from typing import List, Sequence, Tuple
+import numpy as np
+from config import (
+    EMBEDDING_DIMENSION, EMBEDDING_STORAGE, EMBEDDING_INDEX, EMBEDDING_INDEX_DIMENSIONS,
+    HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_MAINTENANCE_WORK_MEM, HNSW_BUILD_WORKERS,
+    PARTIAL_INDEX_CATEGORIES, PARTIAL_INDEX_SOURCE_TYPES,
+)
+
+# Coarse representations pgvector can index (int8 is local-only: pgvector has no int8 type)
+SQL_INDEX_TYPES = ("vector", "halfvec", "bit")
+INDEX_TYPES = SQL_INDEX_TYPES + ("int8",)
+
+BYTES_PER_DIMENSION = {'vector': 4, 'halfvec': 2, 'int8': 1, 'bit': 1 / 8}
+
+# Significant digits sent per value; fp16 keeps ~3.3 decimal digits
+LITERAL_DIGITS = {'vector': 7, 'halfvec': 5}
+
+
+def bytes_per_vector(index_type: str, dimensions: int = EMBEDDING_DIMENSION) -> float:
+    """Payload size of one stored vector (pgvector adds an 8-byte header)"""
+    return BYTES_PER_DIMENSION[index_type] * dimensions + 8
+
+
+# Python-side quantizers (local index and benchmarks)
+
+def truncate(matrix: np.ndarray, dimensions: int) -> np.ndarray:
+    """Keep the leading dimensions and renormalize (Matryoshka-style truncation)"""
+
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    matrix = matrix[:, :dimensions]
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+
+def quantize(matrix: np.ndarray, index_type: str, dimensions: int = EMBEDDING_DIMENSION):
+    """
+    Coarse representation of embeddings
+
+    Returns:
+        float32 (vector), float16 (halfvec), (int8 codes, per-row scale) (int8)
+        or packed uint8 bits (bit)
+    """
+
+    matrix = truncate(matrix, dimensions)
+    if index_type == "vector":
+        return matrix
+    if index_type == "halfvec":
+        return matrix.astype(np.float16)
+    if index_type == "int8":
+        scale = np.maximum(np.abs(matrix).max(axis=1, keepdims=True), 1e-12) / 127
+        return np.round(matrix / scale).astype(np.int8), scale.astype(np.float32)
+    if index_type == "bit":
+        return np.packbits(matrix > 0, axis=1)
+    raise ValueError(f"Unknown index type: {index_type}")
+
+
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def coarse_scores(compact, query: np.ndarray, index_type: str) -> np.ndarray:
+    """Higher is closer: cosine for float/int8 codes, negative Hamming distance for bits"""
+
+    if index_type == "bit":
+        query_bits = quantize(query, "bit", compact.shape[1] * 8)[0]
+        return -_POPCOUNT[np.bitwise_xor(compact, query_bits)].sum(axis=1, dtype=np.int32)
+
+    query = truncate(query, compact[0].shape[1] if index_type == "int8" else compact.shape[1])[0]
+    if index_type == "int8":
+        codes, scale = compact
+        return (codes.astype(np.float32) * scale) @ query
+    return compact.astype(np.float32) @ query
+
+
+def search_with_rerank(full: np.ndarray, compact, query: np.ndarray, index_type: str,
+                       match_count: int, candidate_count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Coarse top-N on the compact representation, reranked with full-precision cosine
+
+    Args:
+        full: Normalized float32 embeddings
+        compact: Output of quantize()
+        query: Query embedding
+        match_count: Results to return
+        candidate_count: Coarse candidates to rerank
+
+    Returns:
+        (row indices, similarities), best first
+    """
+
+    scores = coarse_scores(compact, query, index_type)
+    candidate_count = min(candidate_count, len(scores))
+    candidates = np.argpartition(-scores, candidate_count - 1)[:candidate_count]
+
+    query = truncate(query, full.shape[1])[0]
+    similarities = full[candidates] @ query
+    order = np.argsort(-similarities)[:match_count]
+    return candidates[order], similarities[order]
+
+
+# SQL (setup_db.py / simple_setup.py)
+
+def _compact_expression(column: str, index_type: str, dimensions: int) -> str:
+    """Expression for the coarse index, applied identically to rows and the query"""
+
+    expression = column
+    if dimensions < EMBEDDING_DIMENSION:
+        expression = f"subvector({expression}, 1, {dimensions})"
+    if index_type == "bit":
+        return f"(binary_quantize({expression})::bit({dimensions}))"
+    return f"(({expression})::{index_type}({dimensions}))"
+
+
+def compact_storage_enabled() -> bool:
+    return (EMBEDDING_STORAGE != "vector" or EMBEDDING_INDEX != "vector"
+            or EMBEDDING_INDEX_DIMENSIONS < EMBEDDING_DIMENSION)
+
+
+def vector_index_sql(m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION) -> str:
+    """The HNSW index match_travel_content scans (full-precision or compact, per config)"""
+
+    if compact_storage_enabled():
+        index_type = EMBEDDING_INDEX
+        dimensions = EMBEDDING_INDEX_DIMENSIONS or EMBEDDING_DIMENSION
+        ops = "bit_hamming_ops" if index_type == "bit" else f"{index_type}_cosine_ops"
+        name, column = "travel_content_embedding_compact_idx", _compact_expression('embedding', index_type, dimensions)
+    else:
+        name, column, ops = "travel_content_embedding_idx", "embedding", "vector_cosine_ops"
+    return (f"create index if not exists {name} on travel_content "
+            f"using hnsw ({column} {ops}) with (m = {m}, ef_construction = {ef_construction});")
+
+
+def sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def partial_index_name(column: str, value: str) -> str:
+    # Category names are Korean; a digest keeps the identifier ASCII and short
+    return f"travel_content_embedding_{column}_{hashlib.md5(value.encode('utf-8')).hexdigest()[:10]}_idx"
+
+
+def partial_vector_index_sql(m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION,
+                             categories: Sequence[str] = PARTIAL_INDEX_CATEGORIES,
+                             source_types: Sequence[str] = PARTIAL_INDEX_SOURCE_TYPES) -> List[str]:
+    """
+    HNSW indexes over the rows of one category / source_type each
+
+    A filtered scan of the full graph only keeps the candidates that happen
+    to match, so selective filters come back short; a partial graph holds
+    matching rows only. The planner picks it when the query compares the
+    column to the same literal, which match_travel_content_filtered does.
+    Full-precision storage only (the compact index is an expression index).
+    """
+
+    if compact_storage_enabled():
+        return []
+    statements = []
+    for column, values in (('category', categories), ('source_type', source_types)):
+        for value in values:
+            statements.append(
+                f"create index if not exists {partial_index_name(column, value)} on travel_content "
+                f"using hnsw (embedding vector_cosine_ops) with (m = {m}, ef_construction = {ef_construction}) "
+                f"where {column} = {sql_literal(value)};"
+            )
+    return statements
+
+
+DROP_VECTOR_INDEX_SQL = """
+drop index if exists travel_content_embedding_idx;
+drop index if exists travel_content_embedding_compact_idx;
+"""
+
+
+def drop_vector_index_sql() -> str:
+    """DROP_VECTOR_INDEX_SQL plus the configured partial indexes"""
+
+    drops = [f"drop index if exists {partial_index_name(column, value)};"
+             for column, values in (('category', PARTIAL_INDEX_CATEGORIES),
+                                    ('source_type', PARTIAL_INDEX_SOURCE_TYPES))
+             for value in values]
+    return DROP_VECTOR_INDEX_SQL + ''.join(drop + '\n' for drop in drops)
+
+
+def index_build_settings_sql(maintenance_work_mem: str = HNSW_MAINTENANCE_WORK_MEM,
+                             workers: int = HNSW_BUILD_WORKERS) -> List[str]:
+    """
+    Transaction-local settings for a one-shot HNSW build
+
+    The graph is built in memory while it fits in maintenance_work_mem
+    (pgvector logs a notice when it spills, after which the build is many
+    times slower).
+
+    statement_timeout is not lifted here: it is armed when the enclosing
+    rpc("sql") statement starts, so the build still runs under the API
+    role's timeout. Large tables need the SQL run from the SQL editor or
+    psql (see build_vector_index_sql).
+    """
+
+    statements = [f"set local maintenance_work_mem = '{maintenance_work_mem}';"]
+    if workers:
+        statements.append(f"set local max_parallel_maintenance_workers = {int(workers)};")
+    return statements
+
+
+def build_vector_index_sql(m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION,
+                           maintenance_work_mem: str = HNSW_MAINTENANCE_WORK_MEM,
+                           workers: int = HNSW_BUILD_WORKERS) -> str:
+    """One-shot HNSW build after a bulk load"""
+
+    statements = index_build_settings_sql(maintenance_work_mem, workers)
+    statements.append(vector_index_sql(m, ef_construction))
+    statements += partial_vector_index_sql(m, ef_construction)
+    statements.append("analyze travel_content;")
+    return '\n'.join(statements) + '\n'
+
+
+def compact_index_sql(storage: str = EMBEDDING_STORAGE, index_type: str = EMBEDDING_INDEX,
+                      dimensions: int = EMBEDDING_INDEX_DIMENSIONS) -> str:
+    """
+    DDL for compact storage: column type, coarse HNSW index and the rerank search function
+
+    The full-precision HNSW index is replaced by the compact one; match_travel_content
+    keeps its signature and delegates to match_travel_content_compact, so the web
+    app is unaffected.
+    """
+
+    if index_type not in SQL_INDEX_TYPES:
+        raise ValueError(f"pgvector cannot index {index_type}; use one of {SQL_INDEX_TYPES}")
+
+    dimensions = dimensions or EMBEDDING_DIMENSION
+    query = "query_embedding" if storage == "vector" else f"query_embedding::{storage}({EMBEDDING_DIMENSION})"
+    ops = "bit_hamming_ops" if index_type == "bit" else f"{index_type}_cosine_ops"
+    operator = "<~>" if index_type == "bit" else "<=>"
+    row_expression = _compact_expression("tc.embedding", index_type, dimensions)
+    query_expression = _compact_expression(query, index_type, dimensions)
+
+    # Recreated on every run so a changed index type or dimension takes effect
+    statements = [
+        "drop index if exists travel_content_embedding_idx;",
+        "drop index if exists travel_content_embedding_compact_idx;",
+    ]
+    if storage != "vector":
+        statements.append(
+            f"alter table travel_content alter column embedding type {storage}({EMBEDDING_DIMENSION}) "
+            f"using embedding::{storage}({EMBEDDING_DIMENSION});"
+        )
+    statements.append(
+        f"create index if not exists travel_content_embedding_compact_idx on travel_content "
+        f"using hnsw ({_compact_expression('embedding', index_type, dimensions)} {ops}) "
+        f"with (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION});"
+    )
+
+    statements.append(f"""
+drop function if exists match_travel_content_compact(vector, float, int, text, int);
+
+create or replace function match_travel_content_compact (
+  query_embedding vector({EMBEDDING_DIMENSION}),
+  match_threshold float default 0.7,
+  match_count int default 5,
+  filter_category text default null,
+  candidate_count int default 100,
+  ef_search int default null
+)
+returns table (
+  id bigint,
+  content text,
+  title text,
+  file_name text,
+  category text,
+  section_title text,
+  chunk_index int,
+  total_chunks int,
+  similarity float,
+  created_at timestamptz
+)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+  -- The coarse HNSW scan returns at most hnsw.ef_search rows (default 40),
+  -- so widen it to the number of candidates to rerank for this call only
+  perform set_config('hnsw.ef_search',
+    greatest(candidate_count, match_count, coalesce(ef_search, 40))::text, true);
+  return query
+  with candidates as (
+    select tc.id
+    from travel_content tc
+    where filter_category is null or tc.category = filter_category
+    order by {row_expression} {operator} {query_expression}
+    limit greatest(candidate_count, match_count)
+  )
+  select
+    tc.id,
+    tc.content,
+    tc.title,
+    tc.file_name,
+    tc.category,
+    tc.section_title,
+    tc.chunk_index,
+    tc.total_chunks,
+    1 - (tc.embedding <=> {query}) as similarity,
+    tc.created_at
+  from candidates c
+  join travel_content tc on tc.id = c.id
+  where 1 - (tc.embedding <=> {query}) > match_threshold
+  order by tc.embedding <=> {query}
+  limit match_count;
+end;
+$$;""")
+
+    statements.append(f"""
+drop function if exists match_travel_content(vector, float, int, text);
+
+create or replace function match_travel_content (
+  query_embedding vector({EMBEDDING_DIMENSION}),
+  match_threshold float default 0.7,
+  match_count int default 5,
+  filter_category text default null,
+  ef_search int default null
+)
+returns table (
+  id bigint,
+  content text,
+  title text,
+  file_name text,
+  category text,
+  section_title text,
+  chunk_index int,
+  total_chunks int,
+  similarity float,
+  created_at timestamptz
+)
+language plpgsql
+as $$
+begin
+  return query
+  select * from match_travel_content_compact(
+    query_embedding, match_threshold, match_count, filter_category, ef_search => ef_search);
+end;
+$$;""")
+
+    return '\n'.join(statements) + '\n'
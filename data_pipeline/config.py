@@ -17,11 +17,117 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 # Chunking settings
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "800"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+CHUNKER_ENGINE = os.getenv("CHUNKER_ENGINE", "token")  # "token" (single-pass) or "langchain"
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", "1"))  # parse/chunk processes (0 = all cores)
 
 # Processing settings
-BATCH_SIZE = 100  # for embedding batch processing
-RATE_LIMIT_RPM = 3000  # requests per minute
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "2048"))  # max inputs per embedding request
+EMBEDDING_MAX_TOKENS_PER_INPUT = int(os.getenv("EMBEDDING_MAX_TOKENS_PER_INPUT", "8191"))
+EMBEDDING_MAX_TOKENS_PER_REQUEST = int(os.getenv("EMBEDDING_MAX_TOKENS_PER_REQUEST", "250000"))  # API cap is 300k
+RATE_LIMIT_RPM = int(os.getenv("RATE_LIMIT_RPM", "3000"))  # requests per minute
+RATE_LIMIT_TPM = int(os.getenv("RATE_LIMIT_TPM", "1000000"))  # tokens per minute
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "8"))  # requests in flight
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "6"))
+
+# Embedding cache settings
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+EMBEDDING_CACHE_MAX_AGE_DAYS = float(os.getenv("EMBEDDING_CACHE_MAX_AGE_DAYS", "90"))
+
+# Streaming pipeline settings
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))  # batches buffered between stages
+PIPELINE_BATCH_CHUNKS = int(os.getenv("PIPELINE_BATCH_CHUNKS", "256"))  # chunks per embed/upload batch
+PIPELINE_PARSE_WORKERS = int(os.getenv("PIPELINE_PARSE_WORKERS", "2"))
+PIPELINE_EMBED_WORKERS = int(os.getenv("PIPELINE_EMBED_WORKERS", "2"))
+PIPELINE_UPLOAD_WORKERS = int(os.getenv("PIPELINE_UPLOAD_WORKERS", "2"))
+
+# Upload settings
+UPLOAD_MODE = os.getenv("UPLOAD_MODE", "upsert")  # "upsert" (idempotent) or "insert"
+UPLOAD_BATCH_SIZE = int(os.getenv("UPLOAD_BATCH_SIZE", "50"))
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "4"))  # concurrent batch uploads
+UPLOAD_MAX_RETRIES = int(os.getenv("UPLOAD_MAX_RETRIES", "5"))
+UPLOAD_JOURNAL_PATH = os.getenv("UPLOAD_JOURNAL_PATH", ".cache/upload_journal.sqlite")
+
+# Incremental ingest settings
+MANIFEST_PATH = os.getenv("MANIFEST_PATH", ".cache/ingest_manifest.json")
+
+# Local search settings
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", ".cache/local_index")
+
+# Query cache settings
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1000"))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "3600"))
+QUERY_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("QUERY_CACHE_SEMANTIC_THRESHOLD", "0.95"))  # cosine
+TABLE_GENERATION_PATH = os.getenv("TABLE_GENERATION_PATH", ".cache/table_generation")  # bumped by ingests
+
+# Run metrics settings
+METRICS_DIR = os.getenv("METRICS_DIR", ".cache/metrics")  # run_report.json + metrics.prom
+PROFILE_STAGE = os.getenv("PROFILE_STAGE", "")  # e.g. "chunk" to profile one stage
+PROFILER = os.getenv("PROFILER", "cprofile")  # "cprofile" or "pyinstrument"
+
+# Lexical / hybrid search settings
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", ".cache/lexical_index.json")
+SEARCH_MODE = os.getenv("SEARCH_MODE", "vector")  # "vector", "prefilter" or "rrf"
+LEXICAL_MAX_CANDIDATES = int(os.getenv("LEXICAL_MAX_CANDIDATES", "200"))
+LEXICAL_MIN_KEYWORD_STRENGTH = float(os.getenv("LEXICAL_MIN_KEYWORD_STRENGTH", "0.4"))  # prefilter only above this
+RRF_K = int(os.getenv("RRF_K", "60"))
+RRF_OVERFETCH = int(os.getenv("RRF_OVERFETCH", "4"))  # candidates per ranking = match_count * this
+
+# Dedup settings (between chunking and embedding)
+DEDUP_POLICY = os.getenv("DEDUP_POLICY", "collapse")  # "collapse", "skip" or "off"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))  # estimated Jaccard of character shingles
+DEDUP_SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", "5"))
+
+# Community post fetch settings (supabase_fetcher.py)
+FETCH_PAGE_SIZE = int(os.getenv("FETCH_PAGE_SIZE", "500"))  # posts per page (keyset on id)
+FETCH_COMMENT_PAGE_SIZE = int(os.getenv("FETCH_COMMENT_PAGE_SIZE", "1000"))  # PostgREST max-rows
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "4"))  # pages loaded in parallel
+
+# Run spool settings (crash-safe chunks/embeddings per ingest run, see --resume)
+SPOOL_ENABLED = os.getenv("SPOOL_ENABLED", "true").lower() == "true"
+SPOOL_DIR = os.getenv("SPOOL_DIR", ".cache/spool")
+SPOOL_BATCH_CHUNKS = int(os.getenv("SPOOL_BATCH_CHUNKS", "500"))  # chunks embedded per durable batch
+
+# HNSW index settings (setup_db.py and bulk-load ingests)
+HNSW_M = int(os.getenv("HNSW_M", "16"))  # graph degree
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))  # build-time candidate list
+HNSW_MAINTENANCE_WORK_MEM = os.getenv("HNSW_MAINTENANCE_WORK_MEM", "1GB")  # graph should fit, or the build crawls
+HNSW_BUILD_WORKERS = int(os.getenv("HNSW_BUILD_WORKERS", "0"))  # parallel build workers (0 = server default)
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "0"))  # per-query candidate list (0 = server default, 40)
+BULK_LOAD = os.getenv("BULK_LOAD", "false").lower() == "true"  # drop the vector index while uploading
+
+# Filtered search settings (match_travel_content_filtered and partial HNSW indexes, see setup_db.py)
+FILTERED_MAX_EF_SEARCH = int(os.getenv("FILTERED_MAX_EF_SEARCH", "1000"))  # refill limit (pgvector caps ef_search at 1000)
+PARTIAL_INDEX_CATEGORIES = [v for v in os.getenv("PARTIAL_INDEX_CATEGORIES", "").split(",") if v]  # own HNSW graph each
+PARTIAL_INDEX_SOURCE_TYPES = [v for v in os.getenv("PARTIAL_INDEX_SOURCE_TYPES", "").split(",") if v]
+
+# Batch query settings (Retriever.search_many: evaluation runs, answer precomputation)
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "8"))  # search RPCs in flight over the shared client
+
+# Distributed ingest settings (cli.py queue / cli.py worker)
+QUEUE_BACKEND = os.getenv("QUEUE_BACKEND", "sqlite")  # "sqlite" (one host) or "postgres" (ingest_queue table)
+QUEUE_PATH = os.getenv("QUEUE_PATH", ".cache/ingest_queue.sqlite")
+QUEUE_NAME = os.getenv("QUEUE_NAME", "ingest")
+QUEUE_LEASE_SECONDS = int(os.getenv("QUEUE_LEASE_SECONDS", "300"))  # unit is requeued if not renewed in time
+QUEUE_HEARTBEAT_SECONDS = int(os.getenv("QUEUE_HEARTBEAT_SECONDS", "60"))
+QUEUE_MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "3"))
+QUEUE_SHARDS = int(os.getenv("QUEUE_SHARDS", "64"))  # unit -> shard by hash, fixed for the queue's lifetime
+QUEUE_POLL_SECONDS = float(os.getenv("QUEUE_POLL_SECONDS", "5"))  # idle wait with --wait
+
+# Tokenizer settings (tiktoken BPE files are read from here instead of being downloaded)
+TIKTOKEN_CACHE_DIR = os.getenv("TIKTOKEN_CACHE_DIR", ".cache/tiktoken")  # fill with `cli.py setup --tokenizer`
 
 # Database settings
 TABLE_NAME = "travel_content"
-EMBEDDING_DIMENSION = 1536
\ No newline at end of file
+EMBEDDING_DIMENSION = 1536
+
+# Compact embedding storage settings (applied by setup_db.py)
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "vector")  # column type: "vector" or "halfvec"
+EMBEDDING_INDEX = os.getenv("EMBEDDING_INDEX", "vector")  # HNSW index: "vector", "halfvec" or "bit"
+EMBEDDING_INDEX_DIMENSIONS = int(os.getenv("EMBEDDING_INDEX_DIMENSIONS", str(EMBEDDING_DIMENSION)))  # truncated coarse index
+if EMBEDDING_STORAGE not in ("vector", "halfvec"):
+    raise ValueError(f"Unknown EMBEDDING_STORAGE: {EMBEDDING_STORAGE!r} (use 'vector' or 'halfvec')")
+if EMBEDDING_INDEX not in ("vector", "halfvec", "bit"):
+    raise ValueError(f"Unknown EMBEDDING_INDEX: {EMBEDDING_INDEX!r} (use 'vector', 'halfvec' or 'bit')")
\ No newline at end of file
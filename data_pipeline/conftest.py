@@ -0,0 +1,2 @@
+# test_search.py is a manual search script (python test_search.py), not a test module
+collect_ignore = ["test_search.py"]
@@ -0,0 +1,169 @@
+"""
+Near-duplicate chunk detection for Swiss Travel RAG
+Exact (normalized hash) and near (MinHash + LSH) duplicates are dropped before embedding
+"""
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+import numpy as np
+from embedding_cache import normalize_text, text_hash
+from metrics import current_run
+from config import DEDUP_POLICY, DEDUP_THRESHOLD, DEDUP_SHINGLE_SIZE
+
+_PRIME = (1 << 31) - 1  # a * h stays below 2**62, so uint64 arithmetic cannot overflow
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32  # 32 bands x 4 rows: pairs above ~0.45 Jaccard become candidates
+
+
+def shingles(text: str, size: int = DEDUP_SHINGLE_SIZE) -> Set[str]:
+    """Character n-grams of the normalized text (language independent)"""
+
+    text = normalize_text(text)
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class ChunkDeduplicator:
+    def __init__(self, policy: str = DEDUP_POLICY, threshold: float = DEDUP_THRESHOLD, seed: int = 1):
+        """
+        Args:
+            policy: "collapse" (keep the first copy and record the others in
+                its 'duplicate_sources'), "skip" (drop copies without a trace)
+                or "off"
+            threshold: Estimated Jaccard similarity above which chunks are near duplicates
+        """
+
+        if policy not in ("collapse", "skip", "off"):
+            raise ValueError(f"Unknown dedup policy: {policy}")
+
+        self.policy = policy
+        self.threshold = threshold
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+        self.rows_per_band = NUM_PERMUTATIONS // LSH_BANDS
+
+        # Kept chunks are remembered by a small record (the key of their row and
+        # the duplicates collapsed into it), never by the chunk itself, so the
+        # streaming pipeline can release chunks and their embeddings after upload
+        self.exact: Dict[str, int] = {}
+        self.buckets: Dict[tuple, List[int]] = defaultdict(list)
+        self.signatures = np.empty((0, NUM_PERMUTATIONS), dtype=np.uint64)
+        self.canonical: List[Dict] = []
+
+        # Files whose content is (partly) stored under another file's rows
+        self.dependencies: Dict[str, Set[str]] = defaultdict(set)
+        self.stats = {'chunks': 0, 'exact_duplicates': 0, 'near_duplicates': 0, 'tokens_saved': 0}
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) % _PRIME for s in shingles(text)), dtype=np.uint64)
+        return ((np.outer(self.a, hashes) + self.b[:, None]) % _PRIME).min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(LSH_BANDS):
+            rows = signature[band * self.rows_per_band:(band + 1) * self.rows_per_band]
+            yield (band, rows.tobytes())
+
+    def _find_near(self, signature: np.ndarray) -> Optional[int]:
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self.buckets.get(key, ()))
+        if not candidates:
+            return None
+
+        # Verify all LSH candidates at once: matching MinHash slots estimate Jaccard
+        candidates = np.fromiter(candidates, dtype=np.int64)
+        similarity = (self.signatures[candidates] == signature).mean(axis=1)
+        best = int(np.argmax(similarity))
+        if similarity[best] >= self.threshold:
+            return int(candidates[best])
+        return None
+
+    def _register(self, chunk: Dict, content_hash: str, signature: np.ndarray) -> Dict:
+        index = len(self.canonical)
+        if index == len(self.signatures):
+            grown = np.empty((max(64, 2 * index), NUM_PERMUTATIONS), dtype=np.uint64)
+            grown[:index] = self.signatures
+            self.signatures = grown
+        self.signatures[index] = signature
+        record = {
+            'file_name': chunk['file_name'],
+            'chunk_index': chunk['chunk_index'],
+            'section_title': chunk.get('section_title'),
+            'content_hash': content_hash,
+            'duplicate_sources': [],
+        }
+        self.exact[content_hash] = index
+        self.canonical.append(record)
+        for key in self._band_keys(signature):
+            self.buckets[key].append(index)
+        return record
+
+    def filter(self, chunks: List[Dict]) -> List[Dict]:
+        """
+        Drop duplicates of chunks seen so far (in this call or earlier ones)
+
+        Returns:
+            The chunks to embed
+        """
+
+        if self.policy == "off":
+            return chunks
+
+        kept = []
+        kept_records = []
+        with current_run().stage('dedup'):
+            for chunk in chunks:
+                self.stats['chunks'] += 1
+                content_hash = text_hash(chunk['content'])
+                index = self.exact.get(content_hash)
+                kind = 'exact_duplicates'
+
+                signature = None
+                if index is None:
+                    signature = self.signature(chunk['content'])
+                    index = self._find_near(signature)
+                    kind = 'near_duplicates'
+
+                if index is None:
+                    kept_records.append((chunk, self._register(chunk, content_hash, signature)))
+                    kept.append(chunk)
+                    continue
+
+                original = self.canonical[index]
+
+                self.stats[kind] += 1
+                self.stats['tokens_saved'] += chunk.get('token_count') or 0
+                if original['file_name'] != chunk['file_name']:
+                    self.dependencies[chunk['file_name']].add(original['file_name'])
+                if self.policy == "collapse":
+                    original['duplicate_sources'].append({
+                        'file_name': chunk['file_name'],
+                        'chunk_index': chunk['chunk_index'],
+                        'section_title': chunk.get('section_title'),
+                    })
+
+        # Duplicates found in this call are uploaded with their kept chunk;
+        # later ones are stored through collapsed()
+        for chunk, record in kept_records:
+            if record['duplicate_sources']:
+                chunk['duplicate_sources'] = list(record['duplicate_sources'])
+
+        tokens_saved = sum(chunk.get('token_count') or 0 for chunk in chunks) - \
+            sum(chunk.get('token_count') or 0 for chunk in kept)
+        current_run().add('dedup', items=len(chunks), duplicates=len(chunks) - len(kept),
+                          tokens_saved=tokens_saved)
+        return kept
+
+    def collapsed(self) -> List[Dict]:
+        """Records (file_name, chunk_index, content_hash, duplicate_sources) of kept chunks that absorbed a duplicate"""
+        return [record for record in self.canonical if record['duplicate_sources']]
+
+    def print_report(self):
+        if self.policy == "off":
+            return
+        duplicates = self.stats['exact_duplicates'] + self.stats['near_duplicates']
+        print(f"🧹 Dedup ({self.policy}): {duplicates}/{self.stats['chunks']} chunks were duplicates "
+              f"({self.stats['exact_duplicates']} exact, {self.stats['near_duplicates']} near), "
+              f"{self.stats['tokens_saved']} tokens saved")
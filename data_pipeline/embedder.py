@@ -2,67 +2,119 @@
 Embedding generation utilities for Swiss Travel RAG
 Handles OpenAI embeddings with rate limiting
 """
-import time
-import asyncio
 from typing import List, Dict
-from openai import OpenAI
-from tqdm import tqdm
-from config import OPENAI_API_KEY, EMBEDDING_MODEL, BATCH_SIZE, RATE_LIMIT_RPM
+import numpy as np
+from config import (
+    EMBEDDING_MODEL, BATCH_SIZE,
+    EMBEDDING_CACHE_ENABLED,
+)
+from embedding_cache import EmbeddingCache
+from metrics import current_run
+from embedding_engine import AsyncEmbeddingEngine
+from embedding_store import attach_embeddings
+from clients import openai_client
 
 class EmbeddingGenerator:
-    def __init__(self):
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+    def __init__(self, use_cache: bool = EMBEDDING_CACHE_ENABLED):
+        self.client = openai_client()
         self.model = EMBEDDING_MODEL
         self.batch_size = BATCH_SIZE
-        self.rate_limit_delay = 60 / RATE_LIMIT_RPM  # seconds between requests
+        
+        # Concurrent batch requests, paced by RATE_LIMIT_RPM / RATE_LIMIT_TPM
+        self.engine = AsyncEmbeddingEngine(model=self.model)
+        
+        # Content-addressed cache in front of the API (only misses are sent)
+        self.cache = None
+        if use_cache:
+            self.cache = EmbeddingCache()
     
-    def generate_embedding(self, text: str) -> List[float]:
+    def generate_embedding(self, text: str, use_cache: bool = True) -> List[float]:
         """Generate embedding for a single text"""
         
+        use_cache = use_cache and self.cache is not None
+        
+        if use_cache:
+            cached = self.cache.get(self.model, text)
+            if cached is not None:
+                return cached.tolist()
+        
         try:
             response = self.client.embeddings.create(
                 model=self.model,
                 input=text.replace("\n", " ")
             )
-            return response.data[0].embedding
+            embedding = response.data[0].embedding
+            
+            if use_cache:
+                self.cache.put(self.model, text, embedding)
+            
+            return embedding
         
         except Exception as e:
             print(f"Error generating embedding: {e}")
             return None
     
-    def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for a batch of texts"""
+    def generate_query_embeddings(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Embed short query texts in one request per batch_size, like generate_embedding
         
-        embeddings = []
+        Queries skip the engine's token counting and packing, so the tokenizer
+        is never loaded on the search path.
         
-        # Process in batches to respect rate limits
-        for i in tqdm(range(0, len(texts), self.batch_size), desc="Generating embeddings"):
-            batch = texts[i:i + self.batch_size]
-            
+        Returns:
+            float32 embeddings aligned with texts, None where the request failed
+        """
+        
+        embeddings = self.cache.get_many(self.model, texts) if self.cache else [None] * len(texts)
+        miss_indices = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        
+        for start in range(0, len(miss_indices), self.batch_size):
+            batch = miss_indices[start:start + self.batch_size]
             try:
-                # Clean texts for embedding
-                cleaned_batch = [text.replace("\n", " ") for text in batch]
-                
                 response = self.client.embeddings.create(
                     model=self.model,
-                    input=cleaned_batch
+                    input=[texts[i].replace("\n", " ") for i in batch]
                 )
-                
-                # Extract embeddings from response
-                batch_embeddings = [data.embedding for data in response.data]
-                embeddings.extend(batch_embeddings)
-                
-                # Rate limiting delay
-                if i + self.batch_size < len(texts):
-                    time.sleep(self.rate_limit_delay)
-                
             except Exception as e:
-                print(f"Error in batch {i//self.batch_size + 1}: {e}")
-                # Add None for failed embeddings
-                embeddings.extend([None] * len(batch))
+                print(f"Error generating query embeddings: {e}")
+                continue
+            
+            fresh = [np.asarray(data.embedding, dtype=np.float32) for data in response.data]
+            if self.cache:
+                self.cache.put_many(self.model, [texts[i] for i in batch], fresh)
+            for i, embedding in zip(batch, fresh):
+                embeddings[i] = embedding
         
         return embeddings
     
+    def generate_embeddings_batch(self, texts: List[str], token_counts: List[int] = None) -> List[np.ndarray]:
+        """Generate float32 embeddings for a batch of texts, serving cache hits locally"""
+        
+        if not self.cache:
+            return self._request_embeddings(texts, token_counts)
+        
+        embeddings = self.cache.get_many(self.model, texts)
+        miss_indices = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        
+        print(f"Embedding cache: {len(texts) - len(miss_indices)} hits, {len(miss_indices)} misses")
+        current_run().add('embed', cache_hits=len(texts) - len(miss_indices))
+        
+        if miss_indices:
+            miss_texts = [texts[i] for i in miss_indices]
+            miss_counts = [token_counts[i] for i in miss_indices] if token_counts else None
+            fresh = self._request_embeddings(miss_texts, miss_counts)
+            self.cache.put_many(self.model, miss_texts, fresh)
+            
+            for i, embedding in zip(miss_indices, fresh):
+                embeddings[i] = embedding
+        
+        return embeddings
+    
+    def _request_embeddings(self, texts: List[str], token_counts: List[int] = None) -> List[np.ndarray]:
+        """Call the embeddings API concurrently within the RPM/TPM budget"""
+        
+        return self.engine.embed(texts, token_counts, self.batch_size)
+    
     def embed_chunks(self, chunks: List[Dict]) -> List[Dict]:
         """
         Generate embeddings for a list of chunks
@@ -71,27 +123,32 @@ class EmbeddingGenerator:
             chunks: List of chunk dictionaries with 'content' field
             
         Returns:
-            List of chunks with 'embedding' field added
+            List of chunks with 'embedding' (float32 row view) and 'embedding_row' added
         """
         
         print(f"Generating embeddings for {len(chunks)} chunks...")
         
-        # Extract texts
+        # Extract texts (and the chunker's token counts for request packing)
         texts = [chunk['content'] for chunk in chunks]
+        token_counts = [chunk.get('token_count') for chunk in chunks]
         
         # Generate embeddings
-        embeddings = self.generate_embeddings_batch(texts)
+        embeddings = self.generate_embeddings_batch(texts, token_counts)
         
-        # Add embeddings to chunks
-        embedded_chunks = []
         for chunk, embedding in zip(chunks, embeddings):
-            if embedding is not None:
-                chunk['embedding'] = embedding
-                embedded_chunks.append(chunk)
-            else:
+            if embedding is None:
                 print(f"Skipping chunk due to embedding failure: {chunk.get('title', 'Unknown')}")
         
+        # Add embeddings to chunks as rows of one contiguous float32 matrix
+        embedded_chunks = attach_embeddings(chunks, embeddings)
+        
         print(f"Successfully embedded {len(embedded_chunks)}/{len(chunks)} chunks")
+        
+        if self.cache:
+            stats = self.cache.stats()
+            print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+                  f"({stats['hit_rate']:.1%} hit rate, {stats['entries']} entries)")
+        
         return embedded_chunks
     
     def test_embedding(self) -> bool:
@@ -100,7 +157,8 @@ class EmbeddingGenerator:
         test_text = "스위스 여행 테스트"
         
         try:
-            embedding = self.generate_embedding(test_text)
+            # Bypass the cache so this actually exercises the API connection
+            embedding = self.generate_embedding(test_text, use_cache=False)
             if embedding and len(embedding) == 1536:
                 print("Embedding test successful!")
                 return True
@@ -0,0 +1,197 @@
+"""
+On-disk embedding cache for Swiss Travel RAG
+Content-addressed SQLite store keyed by (model, normalized text hash)
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from embedding_store import to_float32
+from config import (
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_MAX_AGE_DAYS,
+)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """
+    Collapse whitespace runs into single spaces (the cache and content_hash key)
+
+    Looser than what the embeddings API receives (only newlines replaced),
+    so texts that differ only in spacing share one cached embedding.
+    """
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 of the normalized text"""
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH,
+                 max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+                 max_age_days: float = EMBEDDING_CACHE_MAX_AGE_DAYS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 86400 if max_age_days else None
+        self.hits = 0
+        self.misses = 0
+
+        # Shared by the streaming pipeline's worker threads (asyncio.to_thread)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("pragma journal_mode=wal")
+        self.conn.execute("pragma synchronous=normal")
+        self.conn.execute("""
+            create table if not exists embeddings (
+              model text not null,
+              text_hash text not null,
+              dim int not null,
+              vector blob not null,
+              created_at real not null,
+              accessed_at real not null,
+              primary key (model, text_hash)
+            )
+        """)
+        self.conn.execute(
+            "create index if not exists idx_embeddings_accessed on embeddings(accessed_at)"
+        )
+        self.conn.commit()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up embeddings for a list of texts
+
+        Args:
+            model: Embedding model name
+            texts: Raw texts (normalized internally)
+
+        Returns:
+            float32 vectors aligned with texts, None where the cache has no entry
+        """
+
+        with self.lock:
+            return self._get_many(model, texts)
+
+    def _get_many(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+
+        hashes = [text_hash(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+
+        # sqlite limits the number of bound parameters per statement
+        unique_hashes = list(dict.fromkeys(hashes))
+        for i in range(0, len(unique_hashes), 500):
+            batch = unique_hashes[i:i + 500]
+            placeholders = ','.join('?' * len(batch))
+            rows = self.conn.execute(
+                f"select text_hash, vector, created_at from embeddings "
+                f"where model = ? and text_hash in ({placeholders})",
+                [model, *batch]
+            ).fetchall()
+
+            for h, blob, created_at in rows:
+                if self._expired(created_at):
+                    continue
+                found[h] = np.frombuffer(blob, dtype=np.float32)
+
+        if found:
+            now = time.time()
+            self.conn.executemany(
+                "update embeddings set accessed_at = ? where model = ? and text_hash = ?",
+                [(now, model, h) for h in found]
+            )
+            self.conn.commit()
+
+        results = [found.get(h) for h in hashes]
+        hit_count = sum(1 for r in results if r is not None)
+        self.hits += hit_count
+        self.misses += len(results) - hit_count
+        return results
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        """Look up a single embedding"""
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, texts: List[str], embeddings: List[Optional[object]]):
+        """Store embeddings, skipping failed (None) entries"""
+
+        now = time.time()
+        rows = [
+            (model, text_hash(text), len(embedding), to_float32(embedding).tobytes(), now, now)
+            for text, embedding in zip(texts, embeddings)
+            if embedding is not None
+        ]
+
+        if not rows:
+            return
+
+        with self.lock:
+            self.conn.executemany(
+                "insert or replace into embeddings "
+                "(model, text_hash, dim, vector, created_at, accessed_at) values (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self.conn.commit()
+            self.evict()
+
+    def put(self, model: str, text: str, embedding):
+        """Store a single embedding"""
+        self.put_many(model, [text], [embedding])
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones above max_entries"""
+
+        with self.lock:
+            return self._evict()
+
+    def _evict(self) -> int:
+        removed = 0
+
+        if self.max_age_seconds:
+            cursor = self.conn.execute(
+                "delete from embeddings where created_at < ?",
+                (time.time() - self.max_age_seconds,)
+            )
+            removed += cursor.rowcount
+
+        if self.max_entries:
+            count = self.conn.execute("select count(*) from embeddings").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                cursor = self.conn.execute(
+                    "delete from embeddings where rowid in ("
+                    "select rowid from embeddings order by accessed_at asc limit ?)",
+                    (overflow,)
+                )
+                removed += cursor.rowcount
+
+        self.conn.commit()
+        return removed
+
+    def _expired(self, created_at: float) -> bool:
+        return bool(self.max_age_seconds) and created_at < time.time() - self.max_age_seconds
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and current size"""
+
+        with self.lock:
+            entries = self.conn.execute("select count(*) from embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+        }
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,190 @@
+"""
+Concurrent embedding engine for Swiss Travel RAG
+Async OpenAI requests with RPM/TPM rate limiting, retries and batch splitting
+"""
+import asyncio
+import random
+from typing import List, Optional
+import numpy as np
+import openai
+from openai import AsyncOpenAI
+from tqdm import tqdm
+from config import (
+    OPENAI_API_KEY, EMBEDDING_MODEL, BATCH_SIZE,
+    EMBEDDING_CONCURRENCY, EMBEDDING_MAX_RETRIES,
+)
+from rate_limiter import RateLimiter
+from tokenizer import get_encoding
+from batching import pack_batches, prepare_inputs
+from embedding_store import decode_base64_embedding
+from metrics import current_run
+
+# Errors worth retrying as-is
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+# Errors caused by some of the inputs; the batch is split to isolate them
+INPUT_ERRORS = (
+    openai.BadRequestError,
+    openai.UnprocessableEntityError,
+)
+
+MAX_BACKOFF_SECONDS = 60
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the server's Retry-After hint from an API error, if any"""
+
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+
+    headers = response.headers
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except ValueError:
+        return None
+    return None
+
+
+class AsyncEmbeddingEngine:
+    def __init__(self, model: str = EMBEDDING_MODEL, concurrency: int = EMBEDDING_CONCURRENCY,
+                 rate_limiter: RateLimiter = None, max_retries: int = EMBEDDING_MAX_RETRIES):
+        self.model = model
+        self.concurrency = concurrency
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.client: Optional[AsyncOpenAI] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self):
+        # Retries are handled here so they can share the rate limiter
+        self.client = AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.close()
+        self.client = None
+        self._semaphore = None
+
+    @property
+    def encoding(self):
+        # Loaded on first use: query embedding never needs the tokenizer
+        return get_encoding(self.model)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.encoding.encode(text))
+
+    def embed(self, texts: List[str], token_counts: List[Optional[int]] = None,
+              batch_size: int = BATCH_SIZE) -> List[Optional[np.ndarray]]:
+        """Synchronous entry point: embed texts on a private event loop"""
+
+        async def run():
+            async with self:
+                return await self.embed_texts(texts, token_counts, batch_size)
+
+        return asyncio.run(run())
+
+    async def embed_texts(self, texts: List[str], token_counts: List[Optional[int]] = None,
+                          batch_size: int = BATCH_SIZE, show_progress: bool = True) -> List[Optional[np.ndarray]]:
+        """
+        Embed texts with concurrent requests packed by token budget
+
+        Args:
+            texts: Texts to embed
+            token_counts: Token count per text if already known (e.g. the
+                chunker's token_count); missing counts are computed
+            batch_size: Maximum inputs per request
+            show_progress: Show a progress bar
+
+        Returns:
+            float32 embeddings aligned with texts, None for inputs that failed
+        """
+
+        texts = [text.replace("\n", " ") for text in texts]
+        texts, token_counts = prepare_inputs(texts, token_counts, self.encoding)
+
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        batches = pack_batches(token_counts, max_items=batch_size)
+
+        with tqdm(total=len(texts), desc="Generating embeddings", disable=not show_progress) as progress:
+            async def run_batch(indices: List[int]):
+                embeddings = await self._embed_indices(texts, token_counts, indices)
+                for index, embedding in zip(indices, embeddings):
+                    results[index] = embedding
+                progress.update(len(indices))
+
+            await asyncio.gather(*(run_batch(indices) for indices in batches))
+
+        return results
+
+    async def _embed_indices(self, texts: List[str], token_counts: List[int],
+                             indices: List[int]) -> List[Optional[np.ndarray]]:
+        """Embed one batch; on input errors split it in half so only bad inputs fail"""
+
+        batch = [texts[i] for i in indices]
+
+        try:
+            return await self._request_with_retry(batch, sum(token_counts[i] for i in indices))
+
+        except RETRYABLE_ERRORS as e:
+            print(f"Embedding batch of {len(batch)} failed after {self.max_retries} retries: {e}")
+            return [None] * len(batch)
+
+        except openai.APIStatusError as e:
+            current_run().add('embed', errors=1)
+            if not isinstance(e, INPUT_ERRORS):
+                # Auth, permission, unknown model: every split would fail the same way
+                print(f"Embedding batch of {len(batch)} failed: {e}")
+                return [None] * len(batch)
+            if len(indices) == 1:
+                print(f"Skipping input that cannot be embedded: {e}")
+                return [None]
+
+            middle = len(indices) // 2
+            left, right = await asyncio.gather(
+                self._embed_indices(texts, token_counts, indices[:middle]),
+                self._embed_indices(texts, token_counts, indices[middle:])
+            )
+            return left + right
+
+    async def _request_with_retry(self, batch: List[str], token_count: int) -> List[np.ndarray]:
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire(token_count)
+
+            metrics = current_run()
+            metrics.add('embed', api_calls=1, retries=1 if attempt else 0,
+                        bytes_sent=sum(len(text.encode('utf-8')) for text in batch))
+
+            try:
+                async with self._semaphore:
+                    with metrics.stage('embed'):
+                        # base64 float32 is ~4x smaller on the wire than JSON floats
+                        response = await self.client.embeddings.create(
+                            model=self.model, input=batch, encoding_format="base64"
+                        )
+                metrics.add('embed', items=len(batch), tokens=token_count)
+                return [decode_base64_embedding(data.embedding) for data in response.data]
+
+            except RETRYABLE_ERRORS as e:
+                metrics.add('embed', errors=1)
+                if attempt == self.max_retries:
+                    raise
+
+                backoff = min(MAX_BACKOFF_SECONDS, 2 ** attempt) * (0.5 + random.random() / 2)
+                retry_after = retry_after_seconds(e)
+                if retry_after is not None:
+                    backoff = max(backoff, retry_after)
+                    # A 429 means the shared budget is exhausted, not just this request's
+                    if isinstance(e, openai.RateLimitError):
+                        self.rate_limiter.pause(retry_after)
+
+                await asyncio.sleep(backoff)
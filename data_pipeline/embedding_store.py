@@ -0,0 +1,94 @@
+"""
+Compact embedding representation for Swiss Travel RAG
+Keeps embeddings as rows of contiguous float32 matrices and serializes them once at the edge
+"""
+import base64
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from config import EMBEDDING_DIMENSION
+
+# '%.7g' keeps float32 precision at about half the size of Python's float repr
+_VECTOR_FORMATS = {}
+
+
+def decode_base64_embedding(data: str) -> np.ndarray:
+    """Decode an embeddings API result requested with encoding_format='base64'"""
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32)
+
+
+def to_float32(embedding) -> np.ndarray:
+    """View or convert an embedding (list, array, bytes) as a float32 vector"""
+
+    if isinstance(embedding, (bytes, bytearray, memoryview)):
+        return np.frombuffer(embedding, dtype=np.float32)
+    return np.asarray(embedding, dtype=np.float32)
+
+
+def vector_literal(embedding, digits: int = 7) -> str:
+    """Serialize an embedding in pgvector's text format: '[x1,x2,...]'"""
+
+    vector = to_float32(embedding)
+    fmt = _VECTOR_FORMATS.get((len(vector), digits))
+    if fmt is None:
+        fmt = _VECTOR_FORMATS[(len(vector), digits)] = '[' + ','.join([f'%.{digits}g'] * len(vector)) + ']'
+    return fmt % tuple(vector.tolist())
+
+
+def parse_vector_literal(literal: str) -> np.ndarray:
+    """Parse pgvector's text format (as returned by PostgREST) into float32"""
+    return np.array(literal.strip('[]').split(','), dtype=np.float32)
+
+
+def stack_embeddings(embeddings: Sequence[Optional[object]],
+                     dimension: int = None) -> Tuple[np.ndarray, List[Optional[int]]]:
+    """
+    Pack embeddings into one contiguous float32 matrix
+
+    Args:
+        embeddings: Embeddings aligned with their chunks; None for failures
+        dimension: Embedding dimension (defaults to the first embedding's)
+
+    Returns:
+        (matrix, rows) where rows[i] is the matrix row of embeddings[i],
+        or None if it failed
+    """
+
+    present = [embedding for embedding in embeddings if embedding is not None]
+    if dimension is None:
+        dimension = len(present[0]) if present else EMBEDDING_DIMENSION
+    matrix = np.empty((len(present), dimension), dtype=np.float32)
+    rows: List[Optional[int]] = []
+
+    row = 0
+    for embedding in embeddings:
+        if embedding is None:
+            rows.append(None)
+            continue
+        matrix[row] = to_float32(embedding)
+        rows.append(row)
+        row += 1
+
+    return matrix, rows
+
+
+def attach_embeddings(chunks: List[dict], embeddings: Sequence[Optional[object]],
+                      dimension: int = None) -> List[dict]:
+    """
+    Attach embeddings to chunks as row views of one shared float32 matrix
+
+    Each successful chunk gets 'embedding' (a zero-copy row view) and
+    'embedding_row' (its index in the matrix). Failed chunks are dropped.
+
+    Returns:
+        The chunks that have an embedding
+    """
+
+    matrix, rows = stack_embeddings(embeddings, dimension)
+    embedded = []
+    for chunk, row in zip(chunks, rows):
+        if row is None:
+            continue
+        chunk['embedding'] = matrix[row]
+        chunk['embedding_row'] = row
+        embedded.append(chunk)
+    return embedded
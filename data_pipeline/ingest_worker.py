@@ -0,0 +1,217 @@
+"""
+Distributed ingest worker for Swiss Travel RAG
+Pulls work units from the shared queue and runs parse → chunk → embed → upload for each, under a renewed lease
+"""
+import os
+import socket
+import threading
+import time
+from functools import cached_property
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from chunking import TextChunker, chunk_file
+from dedup import ChunkDeduplicator
+from embedder import EmbeddingGenerator
+from markdown_parser import MarkdownParser
+from uploader import DatabaseUploader
+from work_queue import file_unit, post_page_unit
+from config import (
+    QUEUE_LEASE_SECONDS, QUEUE_HEARTBEAT_SECONDS, QUEUE_MAX_ATTEMPTS, QUEUE_POLL_SECONDS, FETCH_PAGE_SIZE,
+)
+
+MARKDOWN_DIR = Path("markdown_files")
+
+
+def fill_queue(queue, files: bool = True, posts: bool = False, category: Optional[str] = None,
+               page_size: int = FETCH_PAGE_SIZE, reset: bool = False) -> int:
+    """
+    Enqueue one unit per markdown file and one per page of community posts
+
+    Post pages are cut into fixed id ranges here, once, so every worker and
+    every retry of a unit sees the same posts.
+
+    Returns:
+        Number of units added (or reset)
+    """
+
+    units = []
+    if files:
+        units += [file_unit(path.name) for path in sorted(MARKDOWN_DIR.glob("*.md"))]
+    if posts:
+        from supabase_fetcher import SupabaseFetcher
+        after_id = 0
+        for page in SupabaseFetcher(page_size=page_size).iter_post_pages(category):
+            units.append(post_page_unit(after_id, page[-1]['id'], category))
+            after_id = page[-1]['id']
+    return queue.enqueue(units, reset=reset)
+
+
+class IngestWorker:
+    def __init__(self, queue, worker_id: str = None, shard: int = None, shards: int = None,
+                 lease_seconds: int = QUEUE_LEASE_SECONDS, heartbeat_seconds: int = QUEUE_HEARTBEAT_SECONDS,
+                 max_attempts: int = QUEUE_MAX_ATTEMPTS):
+        """
+        Args:
+            queue: SqliteWorkQueue or PostgresWorkQueue
+            worker_id: Name in the queue (host-pid if omitted)
+            shard, shards: Prefer units with shard % shards == shard; other
+                shards are still helped with once this one is drained
+            lease_seconds: A unit whose lease is not renewed within this time
+                is handed to another worker
+            heartbeat_seconds: Lease renewal interval (well below lease_seconds)
+            max_attempts: Claims per unit before it is marked failed
+        """
+
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.shard = shard
+        self.shards = shards
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_attempts = max_attempts
+
+        self.parser = MarkdownParser()
+        self.chunker = TextChunker()
+        self.embedder = EmbeddingGenerator()
+        self.uploader = DatabaseUploader()
+
+        self.held: List[str] = []
+        self.active_workers = 1
+        self._stop = threading.Event()
+
+    @cached_property
+    def fetcher(self):
+        from supabase_fetcher import SupabaseFetcher
+        return SupabaseFetcher()
+
+    @cached_property
+    def post_processor(self):
+        from post_processor import PostProcessor
+        return PostProcessor(self.chunker)
+
+    def heartbeat(self):
+        """Renew held leases and take this worker's share of the embedding rate limit"""
+
+        self.active_workers = self.queue.heartbeat(self.worker_id, list(self.held), self.lease_seconds)
+        self.embedder.engine.rate_limiter.share(self.active_workers)
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                # The lease survives a missed beat; it only lapses after lease_seconds
+                print(f"⚠️ Heartbeat failed: {e}")
+
+    def run(self, max_units: int = None, wait: bool = False) -> Dict:
+        """
+        Process units until the queue is drained (or max_units are done)
+
+        Args:
+            max_units: Stop after this many units
+            wait: Keep polling an empty queue (for workers started before the queue is filled)
+
+        Returns:
+            Counts of done / failed / lost units and uploaded chunks
+        """
+
+        summary = {'done': 0, 'failed': 0, 'lost': 0, 'chunks': 0}
+        self.heartbeat()
+        print(f"👷 Worker {self.worker_id} joined ({self.active_workers} active"
+              + (f", shard {self.shard}/{self.shards}" if self.shards else "") + ")")
+        beats = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        beats.start()
+
+        try:
+            while max_units is None or summary['done'] + summary['failed'] + summary['lost'] < max_units:
+                units = self.queue.claim(self.worker_id, 1, self.lease_seconds, self.max_attempts,
+                                         self.shard, self.shards)
+                if not units:
+                    if not wait:
+                        break
+                    time.sleep(QUEUE_POLL_SECONDS)
+                    continue
+
+                unit = units[0]
+                self.held.append(unit['unit_id'])
+                try:
+                    outcome, chunks = self.process_unit(unit)
+                finally:
+                    self.held.remove(unit['unit_id'])
+                summary[outcome] += 1
+                summary['chunks'] += chunks
+        finally:
+            self._stop.set()
+            beats.join()
+            self.queue.leave(self.worker_id)
+
+        print(f"👷 Worker {self.worker_id}: {summary['done']} units done, {summary['failed']} failed, "
+              f"{summary['lost']} lost to other workers, {summary['chunks']} chunks uploaded")
+        return summary
+
+    def process_unit(self, unit: Dict) -> Tuple[str, int]:
+        """Run one unit and report it to the queue: ('done' | 'failed' | 'lost', chunks uploaded)"""
+
+        print(f"\n📦 {unit['unit_id']} (attempt {unit['attempts']})")
+        start = time.perf_counter()
+        try:
+            chunks = self.ingest(unit)
+        except Exception as e:
+            status = self.queue.fail(self.worker_id, unit['unit_id'], str(e)[:1000], self.max_attempts)
+            print(f"❌ {unit['unit_id']}: {e} ({status or 'lease lost'})")
+            return 'failed', 0
+
+        result = {'chunks': chunks, 'seconds': round(time.perf_counter() - start, 3), 'worker': self.worker_id}
+        if not self.queue.complete(self.worker_id, unit['unit_id'], result):
+            # The lease lapsed and another worker took the unit; its rerun replaces these rows
+            print(f"⚠️ {unit['unit_id']}: lease lost before completion")
+            return 'lost', chunks
+        print(f"✅ {unit['unit_id']}: {chunks} chunks in {result['seconds']:.1f}s")
+        return 'done', chunks
+
+    def ingest(self, unit: Dict) -> int:
+        """
+        Replace the unit's rows in travel_content
+
+        Rows of the unit's files that the upload did not replace are deleted
+        afterwards, so a failed unit keeps its previous rows and a unit rerun
+        after a lost lease or a crash does not leave partial or duplicate rows.
+        """
+
+        file_names, chunks = self.unit_chunks(unit)
+
+        # Duplicates are collapsed within the unit; cross-unit dedup needs the single-process ingest
+        chunks = ChunkDeduplicator().filter(chunks)
+
+        embedded = self.embedder.embed_chunks(chunks) if chunks else []
+        if len(embedded) < len(chunks):
+            raise RuntimeError(f"{len(chunks) - len(embedded)} chunks failed to embed")
+        if embedded and not self.uploader.upload_chunks(embedded, show_progress=False):
+            raise RuntimeError("upload failed")
+
+        kept = self.uploader.chunk_keys(embedded)
+        if not self.uploader.delete_leftover_chunks({name: kept[name] for name in file_names}):
+            raise RuntimeError("could not delete the unit's previous rows")
+        if embedded:
+            self.uploader.update_parent_chunk_ids(embedded)
+        return len(embedded)
+
+    def unit_chunks(self, unit: Dict) -> Tuple[List[str], List[Dict]]:
+        """(file names whose rows the unit owns, chunks)"""
+
+        payload = unit['payload']
+        if unit['kind'] == 'file':
+            path = MARKDOWN_DIR / payload['file']
+            # A file deleted since the queue was filled only has rows to remove
+            chunks = chunk_file(self.parser, self.chunker, path) if path.exists() else []
+            return [payload['file']], chunks
+
+        if unit['kind'] == 'post_page':
+            file_names, chunks = [], []
+            for post, comments in self.fetcher.iter_posts_with_comments(
+                    payload.get('category'), payload['after_id'], until_id=payload['until_id']):
+                file_names += self.post_processor.file_names(post)
+                chunks += self.post_processor.process_bundle(post, comments)
+            return file_names, chunks
+
+        raise ValueError(f"Unknown work unit kind: {unit['kind']}")
@@ -0,0 +1,197 @@
+"""
+Lexical index for Swiss Travel RAG
+Character-bigram BM25 inverted index over chunks (works for Korean without a morphological analyzer)
+"""
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import LEXICAL_INDEX_PATH
+
+_WORD = re.compile(r'\w+')
+
+# Title-like fields count more than body text
+FIELD_WEIGHTS = {'title': 3, 'section_title': 2, 'tags': 2, 'content': 1}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+DocKey = Tuple[str, int]  # (file_name, chunk_index)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Character bigrams within each word (unigrams for one-character words)
+
+    '리기산에' -> ['리기', '기산', '산에'], so the query '리기산' matches it
+    even with the particle attached.
+    """
+
+    terms = []
+    for word in _WORD.findall(unicodedata.normalize('NFKC', text).lower()):
+        if len(word) == 1:
+            terms.append(word)
+        else:
+            terms.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return terms
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[DocKey]], k: int = 60) -> List[Tuple[DocKey, float]]:
+    """Fuse ranked key lists: score = sum over rankings of 1 / (k + rank)"""
+
+    scores: Dict[DocKey, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            scores[key] += 1 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+class LexicalIndex:
+    def __init__(self):
+        # Per-document term frequencies are kept so files can be removed on re-ingest
+        self.docs: Dict[DocKey, Dict] = {}
+        self.postings: Dict[str, Dict[DocKey, int]] = defaultdict(dict)
+        self.total_length = 0
+        self._norms: Optional[Dict[DocKey, float]] = None  # BM25 length normalization per doc
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add_chunks(self, chunks: List[Dict]):
+        """Index chunks (re-adding a key replaces it)"""
+
+        for chunk in chunks:
+            key = (chunk['file_name'], chunk['chunk_index'])
+            if key in self.docs:
+                self._remove(key)
+
+            terms = Counter()
+            for field, weight in FIELD_WEIGHTS.items():
+                value = chunk.get(field)
+                if not value:
+                    continue
+                text = ' '.join(value) if isinstance(value, list) else value
+                for term in tokenize(text):
+                    terms[term] += weight
+
+            self._add(key, dict(terms), chunk.get('category'))
+
+    def _add(self, key: DocKey, terms: Dict[str, int], category: Optional[str]):
+        length = sum(terms.values())
+        self.docs[key] = {'terms': terms, 'length': length, 'category': category}
+        self.total_length += length
+        self._norms = None
+        for term, tf in terms.items():
+            self.postings[term][key] = tf
+
+    def _remove(self, key: DocKey):
+        doc = self.docs.pop(key)
+        self.total_length -= doc['length']
+        self._norms = None
+        for term in doc['terms']:
+            postings = self.postings[term]
+            postings.pop(key, None)
+            if not postings:
+                del self.postings[term]
+
+    def remove_files(self, file_names: Iterable[str]):
+        """Drop every chunk of the given files (changed or deleted sources)"""
+
+        file_names = set(file_names)
+        for key in [key for key in self.docs if key[0] in file_names]:
+            self._remove(key)
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.docs) - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, limit: int = 100, filter_category: Optional[str] = None,
+               max_df_ratio: float = 0.5) -> List[Tuple[DocKey, float]]:
+        """
+        BM25 top-k over the query's bigrams
+
+        Args:
+            query: Query text
+            limit: Maximum number of results
+            filter_category: Only documents of this category
+            max_df_ratio: Ignore terms found in more than this share of documents
+                (they barely change the ranking but dominate the work)
+
+        Returns:
+            (key, score) pairs, best first
+        """
+
+        if not self.docs:
+            return []
+
+        norms = self._length_norms()
+        max_df = max(1, int(len(self.docs) * max_df_ratio))
+        scores: Dict[DocKey, float] = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings or len(postings) > max_df:
+                continue
+
+            weight = self.idf(term) * (BM25_K1 + 1)
+            for key, tf in postings.items():
+                scores[key] += weight * tf / (tf + norms[key])
+
+        if filter_category is not None:
+            scores = {key: score for key, score in scores.items()
+                      if self.docs[key]['category'] == filter_category}
+
+        return sorted(scores.items(), key=lambda item: -item[1])[:limit]
+
+    def _length_norms(self) -> Dict[DocKey, float]:
+        if self._norms is None:
+            average_length = self.total_length / len(self.docs)
+            self._norms = {
+                key: BM25_K1 * (1 - BM25_B + BM25_B * doc['length'] / average_length)
+                for key, doc in self.docs.items()
+            }
+        return self._norms
+
+    def keyword_strength(self, query: str) -> float:
+        """
+        Highest IDF among the query's terms, normalized to [0, 1]
+
+        Proper nouns like '리기산' have rare bigrams and score close to 1;
+        generic queries score low and are better served by vector search alone.
+        """
+
+        if not self.docs:
+            return 0.0
+        present = [self.idf(term) for term in set(tokenize(query)) if term in self.postings]
+        if not present:
+            return 0.0
+        return max(present) / self.idf('\0')  # idf of an unseen term is the maximum
+
+    def save(self, path: str = LEXICAL_INDEX_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = [
+            {'file_name': key[0], 'chunk_index': key[1], **doc}
+            for key, doc in self.docs.items()
+        ]
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = LEXICAL_INDEX_PATH) -> "LexicalIndex":
+        """Load a saved index (empty if none exists yet)"""
+
+        index = cls()
+        if not Path(path).exists():
+            return index
+
+        with open(path, 'r', encoding='utf-8') as f:
+            for doc in json.load(f):
+                index._add((doc['file_name'], doc['chunk_index']), doc['terms'], doc.get('category'))
+        return index
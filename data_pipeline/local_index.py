@@ -0,0 +1,285 @@
+"""
+Local vector index for Swiss Travel RAG
+In-process stand-in for the match_travel_content RPC over exported rows
+"""
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from embedding_store import parse_vector_literal
+from config import EMBEDDING_DIMENSION, TABLE_NAME, LOCAL_INDEX_PATH
+
+# Columns returned by match_travel_content (besides similarity)
+RESULT_COLUMNS = [
+    'id', 'content', 'title', 'file_name', 'category', 'section_title',
+    'chunk_index', 'total_chunks', 'created_at',
+]
+
+# Filterable metadata, also returned by match_travel_content_filtered
+FILTER_COLUMNS = ['source_type', 'tags', 'location', 'post_month']
+
+# Extra columns exported for offline tools (filters, lexical index, ...)
+EXPORT_COLUMNS = RESULT_COLUMNS + ['section_level', 'tags', 'location', 'content_hash', 'source_type', 'post_month']
+
+
+def matches_filters(row: Dict, filters: Dict) -> bool:
+    """Same semantics as the filter_* arguments of match_travel_content_filtered"""
+
+    for column, value in filters.items():
+        if value is None:
+            continue
+        if column == 'tags':
+            if not set(value) <= set(row.get('tags') or []):
+                return False
+        elif (row.get(column) or ('markdown' if column == 'source_type' else None)) != value:
+            return False
+    return True
+
+
+class _LocalResponse:
+    """Mimics the supabase query builder so callers can keep .execute().data"""
+
+    def __init__(self, data: List[Dict]):
+        self.data = data
+
+    def execute(self):
+        return self
+
+
+class LocalVectorIndex:
+    def __init__(self, rows: List[Dict], embeddings: np.ndarray, normalized: bool = False,
+                 nprobe: int = None):
+        """
+        Args:
+            rows: Exported rows, aligned with embeddings
+            embeddings: float32 matrix (may be a memmap)
+            normalized: Rows are already unit length (kept as is, so a
+                memmap stays on disk instead of being copied)
+            nprobe: Default IVF lists to probe in rpc() once build_ivf() ran
+        """
+
+        self.rows = rows
+        self.nprobe = nprobe
+
+        # Normalized once so cosine similarity is a single matrix-vector product
+        self.embeddings = embeddings if normalized else normalize_rows(embeddings)
+
+        self.category_rows: Dict[str, np.ndarray] = {}
+        categories = np.array([row.get('category') or '' for row in rows])
+        for category in set(categories.tolist()):
+            self.category_rows[category] = np.flatnonzero(categories == category)
+
+        self.key_rows = {(row.get('file_name'), row.get('chunk_index')): i for i, row in enumerate(rows)}
+        self.ivf = None
+
+    @classmethod
+    def load(cls, path: str = LOCAL_INDEX_PATH) -> "LocalVectorIndex":
+        """Load an index written by export_index / save"""
+
+        path = Path(path)
+        with open(path / 'rows.jsonl', 'r', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        embeddings = np.load(path / 'embeddings.npy', mmap_mode='r')
+        # Exports written before vectors were stored normalized are normalized in memory
+        normalized = (path / 'index.json').exists() and \
+            json.loads((path / 'index.json').read_text(encoding='utf-8')).get('normalized', False)
+        return cls(rows, embeddings, normalized=normalized)
+
+    def save(self, path: str = LOCAL_INDEX_PATH):
+        save_index(path, self.rows, self.embeddings)
+
+    def build_ivf(self, n_lists: int = None, iterations: int = 10, seed: int = 0):
+        """
+        Build an IVF (k-means inverted file) index for approximate search
+
+        Args:
+            n_lists: Number of clusters (defaults to ~sqrt(N))
+            iterations: k-means iterations
+            seed: Random seed for reproducible centroids
+        """
+
+        count = len(self.embeddings)
+        if not count:
+            self.ivf = None
+            return
+        n_lists = min(count, n_lists or max(1, int(np.sqrt(count))))
+        rng = np.random.default_rng(seed)
+        centroids = self.embeddings[rng.choice(count, n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = np.argmax(self.embeddings @ centroids.T, axis=1)
+            for list_id in range(n_lists):
+                members = self.embeddings[assignment == list_id]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[list_id] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+        assignment = np.argmax(self.embeddings @ centroids.T, axis=1)
+        self.ivf = {
+            'centroids': centroids,
+            'lists': [np.flatnonzero(assignment == list_id) for list_id in range(n_lists)],
+        }
+
+    def search(self, query_embedding, match_threshold: float = 0.7, match_count: int = 5,
+               filter_category: Optional[str] = None, nprobe: int = None,
+               candidates: np.ndarray = None, filters: Optional[Dict] = None) -> List[Dict]:
+        """
+        Cosine top-k search with the same semantics as match_travel_content
+
+        Args:
+            query_embedding: Query vector
+            match_threshold: Minimum cosine similarity (exclusive)
+            match_count: Maximum number of results
+            filter_category: Only rows of this category
+            nprobe: If set and an IVF index is built, probe this many lists
+                (approximate); otherwise search exactly
+            candidates: Only score these row indices (e.g. lexical candidates)
+            filters: source_type / tags / location / post_month filters; the
+                filtered columns are returned too
+
+        Returns:
+            Result rows ordered by similarity, with a 'similarity' field
+        """
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(np.linalg.norm(query), 1e-12)
+
+        if nprobe and self.ivf is not None:
+            nearest_lists = np.argsort(-(self.ivf['centroids'] @ query))[:nprobe]
+            probed = np.concatenate([self.ivf['lists'][i] for i in nearest_lists])
+            candidates = probed if candidates is None else np.intersect1d(candidates, probed)
+
+        if filter_category is not None:
+            category_rows = self.category_rows.get(filter_category, np.empty(0, dtype=np.int64))
+            candidates = category_rows if candidates is None else np.intersect1d(candidates, category_rows)
+
+        if filters:
+            scope = range(len(self.rows)) if candidates is None else candidates.tolist()
+            candidates = np.array([i for i in scope if matches_filters(self.rows[i], filters)], dtype=np.int64)
+
+        if candidates is None:
+            scores = self.embeddings @ query
+            indices = np.arange(len(scores))
+        else:
+            scores = self.embeddings[candidates] @ query
+            indices = candidates
+
+        keep = scores > match_threshold
+        scores, indices = scores[keep], indices[keep]
+
+        if len(scores) > match_count:
+            top = np.argpartition(-scores, match_count)[:match_count]
+            scores, indices = scores[top], indices[top]
+
+        columns = RESULT_COLUMNS + FILTER_COLUMNS if filters is not None else RESULT_COLUMNS
+        order = np.argsort(-scores, kind='stable')
+        results = []
+        for position in order:
+            row = self.rows[int(indices[position])]
+            result = {column: row.get(column) for column in columns}
+            result['similarity'] = float(scores[position])
+            results.append(result)
+        return results
+
+    def rpc(self, name: str, params: Dict) -> _LocalResponse:
+        """Drop-in for client.rpc('match_travel_content' | '..._filtered' | '..._candidates', params)"""
+
+        candidates = None
+        filters = None
+        if name == 'match_travel_content_filtered':
+            filters = {column: params[f'filter_{column}'] for column in FILTER_COLUMNS
+                       if params.get(f'filter_{column}') is not None}
+        elif name == 'match_travel_content_candidates':
+            keys = zip(params['candidate_file_names'], params['candidate_chunk_indexes'])
+            candidates = np.array([self.key_rows[key] for key in keys if key in self.key_rows],
+                                  dtype=np.int64)
+        elif name != 'match_travel_content':
+            raise ValueError(f"Local index does not support {name}")
+
+        return _LocalResponse(self.search(
+            params['query_embedding'],
+            match_threshold=params.get('match_threshold', 0.7),
+            match_count=params.get('match_count', 5),
+            filter_category=params.get('filter_category'),
+            nprobe=params.get('nprobe', self.nprobe),
+            candidates=candidates,
+            filters=filters,
+        ))
+
+
+def normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if not embeddings.size:
+        return embeddings
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+def save_index(path: str, rows: List[Dict], embeddings: np.ndarray):
+    """Write rows as JSONL and unit-length embeddings as a float32 .npy (memory-mapped on load)"""
+
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    with open(path / 'rows.jsonl', 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + '\n')
+    np.save(path / 'embeddings.npy', normalize_rows(embeddings))
+    (path / 'index.json').write_text(json.dumps({'normalized': True}), encoding='utf-8')
+
+
+def export_index(client, path: str = LOCAL_INDEX_PATH, page_size: int = 500) -> int:
+    """
+    Export travel_content rows and embeddings from Supabase for offline search
+
+    Args:
+        client: Supabase client
+        path: Output directory
+        page_size: Rows per request (keyset pagination on id)
+
+    Returns:
+        Number of exported rows
+    """
+
+    rows = []
+    vectors = []
+    last_id = 0
+    columns = ', '.join(EXPORT_COLUMNS + ['embedding'])
+
+    while True:
+        response = client.table(TABLE_NAME).select(columns) \
+            .gt('id', last_id).order('id').limit(page_size).execute()
+        page = response.data or []
+        if not page:
+            break
+
+        for record in page:
+            embedding = record.pop('embedding')
+            if embedding is None:
+                continue
+            vectors.append(parse_vector_literal(embedding) if isinstance(embedding, str) else embedding)
+            rows.append(record)
+
+        last_id = page[-1]['id']
+        print(f"Exported {len(rows)} rows...")
+
+    save_index(path, rows, np.vstack(vectors) if vectors else np.empty((0, EMBEDDING_DIMENSION), dtype=np.float32))
+    return len(rows)
+
+
+if __name__ == "__main__":
+    from clients import supabase_client
+
+    arg_parser = argparse.ArgumentParser(description="Export travel_content for local search")
+    arg_parser.add_argument("--out", default=LOCAL_INDEX_PATH)
+    args = arg_parser.parse_args()
+
+    count = export_index(supabase_client(), args.out)
+    print(f"✅ Exported {count} rows to {args.out}")
+
+    # Rebuild the lexical index from the same rows so hybrid search matches the table
+    from lexical_index import LexicalIndex
+    lexical_index = LexicalIndex()
+    lexical_index.add_chunks(LocalVectorIndex.load(args.out).rows)
+    lexical_index.save()
+    print(f"✅ Lexical index rebuilt with {len(lexical_index)} chunks")
@@ -0,0 +1,119 @@
+"""
+Ingest manifest for Swiss Travel RAG
+Tracks per-file content hashes so re-ingestion only touches changed files
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+from config import MANIFEST_PATH
+
+class IngestManifest:
+    def __init__(self, path: str = MANIFEST_PATH):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict] = {}
+
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get('files', {})
+
+    @staticmethod
+    def file_hash(file_path: Path) -> str:
+        """SHA-256 of the raw file bytes"""
+
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def diff(self, file_paths: List[Path]) -> Tuple[List[Path], List[str]]:
+        """
+        Compare files on disk against the manifest
+
+        Files whose size and mtime match the manifest are skipped without
+        hashing; otherwise the content hash decides.
+
+        Args:
+            file_paths: Markdown files currently on disk
+
+        Returns:
+            (new or changed file paths, file names that were deleted)
+        """
+
+        changed = []
+        seen = set()
+
+        for file_path in file_paths:
+            seen.add(file_path.name)
+            entry = self.entries.get(file_path.name)
+            stat = file_path.stat()
+
+            if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                continue
+
+            if entry and entry['sha256'] == self.file_hash(file_path):
+                # Touched but not modified: refresh stat info only
+                entry['size'] = stat.st_size
+                entry['mtime'] = stat.st_mtime
+                continue
+
+            changed.append(file_path)
+
+        deleted = [name for name in self.entries if name not in seen]
+        return changed, deleted
+
+    def related(self, file_names: List[str]) -> List[str]:
+        """
+        Files linked to the given ones by collapsed duplicates, in either direction
+
+        A file whose duplicate chunks point at another file's rows has to be
+        re-ingested with it, or its content (or the references to it) go stale.
+        """
+
+        related = set(file_names)
+        pending = list(related)
+        while pending:
+            name = pending.pop()
+            linked = set(self.entries.get(name, {}).get('depends_on', ()))
+            linked.update(other for other, entry in self.entries.items()
+                          if name in entry.get('depends_on', ()))
+            for other in linked - related:
+                related.add(other)
+                pending.append(other)
+        return sorted(related - set(file_names))
+
+    def record(self, file_path: Path, chunk_count: int, depends_on: List[str] = None):
+        """
+        Mark a file as ingested at its current content
+
+        Args:
+            file_path: Ingested file
+            chunk_count: Rows stored for the file (after dedup)
+            depends_on: Files holding the rows its duplicate chunks were collapsed into
+        """
+
+        stat = file_path.stat()
+        self.entries[file_path.name] = {
+            'sha256': self.file_hash(file_path),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'chunk_count': chunk_count,
+            'ingested_at': time.time(),
+        }
+        if depends_on:
+            self.entries[file_path.name]['depends_on'] = sorted(depends_on)
+
+    def remove(self, file_name: str):
+        self.entries.pop(file_name, None)
+
+    def save(self):
+        """Write the manifest atomically"""
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'files': self.entries}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
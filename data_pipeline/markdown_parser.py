@@ -1,12 +1,154 @@
 """
 Markdown file parser for Swiss Travel RAG
-Handles frontmatter parsing and section extraction
+Handles frontmatter parsing and section extraction (streamed in blocks, fenced code aware)
 """
 import frontmatter
+from frontmatter.default_handlers import YAMLHandler
 import re
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional
 from pathlib import Path
 
+READ_BLOCK_SIZE = 1 << 20
+
+_FRONTMATTER_BOUNDARY = re.compile(rb'-{3,}\s*$')
+
+# Only header and fence lines are visited; the text between them is sliced, not scanned.
+# Matching from the preceding newline lets the regex engine skip ahead with a fast literal search.
+_STRUCTURE_LINE = re.compile(
+    rb'\n(#[^\n]*'                          # header candidate (checked with section_pattern)
+    rb'| {0,3}(`{3,}|~{3,})([^\n]*))'       # fence: marker, rest of line
+)
+
+# Whitespace that str.split() knows but bytes.split() does not (NBSP is common in the guides);
+# each pattern starts with a literal so the scan stays a fast byte search
+_UNICODE_SPACES = [re.compile(pattern) for pattern in (
+    rb'\xc2[\x85\xa0]', rb'\xe1\x9a\x80', rb'\xe2\x80[\x80-\x8a\xa8\xa9\xaf]', rb'\xe2\x81\x9f', rb'\xe3\x80\x80'
+)]
+_SEPARATORS_TO_SPACE = bytes.maketrans(b'\x1c\x1d\x1e\x1f', b'    ')
+
+
+def _word_count(data: bytes) -> int:
+    """len(data.decode().split()) without decoding"""
+
+    data = data.translate(_SEPARATORS_TO_SPACE)
+    for pattern in _UNICODE_SPACES:
+        data = pattern.sub(b' ', data)
+    return len(data.split())
+
+
+def _decode(data: bytes) -> str:
+    text = data.decode('utf-8')
+    return text.replace('\r\n', '\n') if '\r' in text else text
+
+
+class MarkdownDocument:
+    """
+    A markdown file opened for streaming
+
+    Frontmatter metadata is read up front; sections() then reads the rest of
+    the file in fixed-size blocks, so memory stays bounded by the block size
+    plus the largest section. Word and byte counts are complete once
+    sections() is exhausted.
+    """
+
+    def __init__(self, parser: "MarkdownParser", file_path: Path, clean: bool = False):
+        self.parser = parser
+        self.file_path = file_path
+        self.clean = clean
+        self.file = open(file_path, 'rb')
+        self.bytes_read = 0
+        self.word_count = 0
+
+        self._head = b''  # body bytes read ahead while looking for frontmatter
+        self._body_offset = 0
+        self.metadata = self._read_metadata()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def _readline(self) -> bytes:
+        line = self.file.readline()
+        self.bytes_read += len(line)
+        return line
+
+    def _skip_blank_lines(self) -> bytes:
+        """Read up to the first non-blank line (frontmatter strips the text and the body)"""
+
+        while True:
+            line = self._readline()
+            if not line or line.strip():
+                stripped = line.lstrip()
+                self._body_offset += len(line) - len(stripped)
+                return stripped
+            self._body_offset += len(line)
+
+    def _read_metadata(self) -> Dict:
+        """Parse a leading '---' YAML block the way python-frontmatter does"""
+
+        fm_data = {}
+        first = self._skip_blank_lines()
+        self._head = first
+
+        if _FRONTMATTER_BOUNDARY.match(first):
+            lines = [first]
+            while True:
+                line = self._readline()
+                if not line:
+                    # No closing boundary: the whole file is content
+                    self._head = b''.join(lines)
+                    break
+                lines.append(line)
+                if _FRONTMATTER_BOUNDARY.match(line):
+                    fm_data = YAMLHandler().load(_decode(b''.join(lines[1:-1]))) or {}
+                    self._body_offset += sum(len(line) for line in lines)
+                    self._head = self._skip_blank_lines()
+                    break
+
+        metadata = fm_data if isinstance(fm_data, dict) else {}
+        return {
+            'title': metadata.get('title', self.file_path.stem),
+            'category': metadata.get('category', '기타'),
+            'tags': metadata.get('tags', []),
+            'location': metadata.get('location', ''),
+            'file_name': self.file_path.name
+        }
+
+    def _blocks(self) -> Iterator[bytes]:
+        """The body in blocks of about READ_BLOCK_SIZE that end on a line boundary"""
+
+        carry, self._head = self._head, b''
+        while True:
+            data = self.file.read(READ_BLOCK_SIZE)
+            self.bytes_read += len(data)
+            if not data:
+                if carry:
+                    self.word_count += _word_count(carry)
+                    yield carry
+                return
+            data = carry + data
+            cut = data.rfind(b'\n') + 1
+            if cut:
+                block, carry = data[:cut], data[cut:]
+                self.word_count += _word_count(block)
+                yield block
+            else:
+                carry = data
+
+    def sections(self) -> Iterator[Dict]:
+        """Sections in document order (see MarkdownParser.iter_sections)"""
+
+        try:
+            yield from self.parser.iter_sections(self._blocks(), self._body_offset, self.clean)
+        finally:
+            self.close()
+
+
 class MarkdownParser:
     def __init__(self):
         self.section_pattern = re.compile(r'^(#{1,6})\s+(.+)$', re.MULTILINE)
@@ -35,51 +177,110 @@ class MarkdownParser:
             'full_content': post.content
         }
     
+    def open_document(self, file_path: Path, clean: bool = False) -> MarkdownDocument:
+        """
+        Open a markdown file for streaming section by section
+        
+        Args:
+            file_path: Markdown file
+            clean: Apply clean_content to each section
+        
+        Returns:
+            MarkdownDocument with .metadata and a lazy .sections() iterator
+        """
+        return MarkdownDocument(self, file_path, clean)
+    
     def _parse_sections(self, content: str) -> List[Dict]:
-        """Parse markdown content into sections based on headers"""
-        
-        sections = []
-        lines = content.split('\n')
-        current_section = {
-            'title': '',
-            'level': 0,
-            'content': [],
-            'start_line': 0
-        }
+        """Parse markdown content into sections based on headers (offsets relative to content)"""
+        return list(self.iter_sections([content.encode('utf-8')]))
+    
+    def iter_sections(self, blocks: Iterable[bytes], offset: int = 0,
+                      clean: bool = False) -> Iterator[Dict]:
+        """
+        Split a stripped markdown body into sections at headers in one pass
         
-        for i, line in enumerate(lines):
-            header_match = self.section_pattern.match(line)
-            
-            if header_match:
-                # Save previous section if it has content
-                if current_section['content']:
-                    current_section['content'] = '\n'.join(current_section['content']).strip()
-                    sections.append(current_section.copy())
+        Only header and fence lines are matched; section text is sliced out
+        of the blocks between them. Header-looking lines inside fenced code
+        blocks (``` or ~~~) are kept as content. A section is yielded as soon
+        as the next header starts.
+        
+        Args:
+            blocks: UTF-8 body in blocks that each end on a line boundary
+            offset: Byte offset of the body in the source
+            clean: Apply clean_content to each section
+        
+        Yields:
+            Section dicts with title, level, content, start_line (line number
+            within the body) and start_byte/end_byte (byte span in the source)
+        """
+        
+        title, level, start_line, start_byte = '', 0, 0, offset
+        parts: List[bytes] = []  # text of the current section, possibly spanning blocks
+        fence: Optional[bytes] = None
+        line = 0
+        
+        for block in blocks:
+            position = counted = 0
+            # The leading newline lets the first line of the block match too; match offsets
+            # in `scan` are one past the same offsets in `block`
+            scan = b'\n' + block
+            for match in _STRUCTURE_LINE.finditer(scan):
+                marker = match.group(2)
+                if marker is not None:
+                    if fence is None:
+                        fence = marker
+                    elif marker[0] == fence[0] and len(marker) >= len(fence) \
+                            and not match.group(3).strip():
+                        fence = None
+                    continue
+                if fence is not None:
+                    continue
+                # Decoded so that any Unicode space (e.g. NBSP) separates '#' from the title
+                header = self.section_pattern.match(_decode(match.group(1)).rstrip('\r'))
+                if header is None:
+                    continue
                 
-                # Start new section
-                level = len(header_match.group(1))
-                title = header_match.group(2).strip()
+                start = match.start(1) - 1
+                line += block.count(b'\n', counted, start)
+                counted = start
+                if start > position:
+                    parts.append(block[position:start])
+                # Any line between two headers makes a section, even a blank one
+                if parts:
+                    yield self._section(title, level, parts, start_line, start_byte, offset + start, clean)
                 
-                current_section = {
-                    'title': title,
-                    'level': level,
-                    'content': [],
-                    'start_line': i
-                }
-            else:
-                # Add line to current section
-                current_section['content'].append(line)
-        
-        # Add final section
-        if current_section['content']:
-            current_section['content'] = '\n'.join(current_section['content']).strip()
-            sections.append(current_section)
+                title, level = header.group(2).strip(), len(header.group(1))
+                start_line, start_byte = line, offset + start
+                position = match.end()
+                parts = []
+            
+            if position < len(block):
+                parts.append(block[position:])
+            line += block.count(b'\n', counted)
+            offset += len(block)
         
-        return sections
+        # The source text is stripped, so a whitespace-only tail is not content
+        if any(part.strip() for part in parts):
+            yield self._section(title, level, parts, start_line, start_byte, offset, clean)
+    
+    def _section(self, title: str, level: int, parts: List[bytes], start_line: int,
+                 start_byte: int, end_byte: int, clean: bool) -> Dict:
+        text = _decode(b''.join(parts)).strip()
+        return {
+            'title': title,
+            'level': level,
+            'content': self.clean_content(text) if clean else text,
+            'start_line': start_line,
+            'start_byte': start_byte,
+            'end_byte': end_byte,
+        }
     
     def estimate_reading_time(self, text: str) -> int:
         """Estimate reading time in seconds (assuming 200 words per minute)"""
-        word_count = len(text.split())
+        return self.reading_time_for_words(len(text.split()))
+    
+    @staticmethod
+    def reading_time_for_words(word_count: int) -> int:
         reading_time_minutes = word_count / 200
         return int(reading_time_minutes * 60)
     
@@ -0,0 +1,236 @@
+"""
+Ingest run metrics for Swiss Travel RAG
+Per-stage wall time, counts and throughput, exported as a JSON run report and Prometheus text
+"""
+import cProfile
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict
+from config import METRICS_DIR, PROFILE_STAGE, PROFILER
+
+# Counters every stage reports (others may be added per stage, e.g. cache_hits)
+COUNTERS = ('items', 'tokens', 'api_calls', 'retries', 'bytes_sent', 'bytes_read', 'errors')
+
+_PROMETHEUS_PREFIX = "swiss_rag_ingest"
+
+
+def _new_stage() -> Dict:
+    stage = {counter: 0 for counter in COUNTERS}
+    stage.update({'calls': 0, 'busy_seconds': 0.0, 'first_start': None, 'last_end': None})
+    return stage
+
+
+class RunMetrics:
+    def __init__(self, run_id: str = None, profile_stage: str = PROFILE_STAGE, profiler: str = PROFILER):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self.finished_at = None
+        self.stages: Dict[str, Dict] = {}
+        # Stages run in threads (uploads) and processes (chunk workers)
+        self.lock = threading.Lock()
+
+        self.profile_stage = profile_stage or None
+        self.profiler_name = profiler
+        self.profiler = None
+        self._profiling = False
+
+    def _stage(self, name: str) -> Dict:
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = _new_stage()
+        return stage
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time one unit of work of a stage (stages may overlap and run concurrently)"""
+
+        profiling = self._start_profile(name)
+        start_wall = time.time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiling:
+                self._stop_profile()
+            with self.lock:
+                stage = self._stage(name)
+                stage['calls'] += 1
+                stage['busy_seconds'] += elapsed
+                if stage['first_start'] is None or start_wall < stage['first_start']:
+                    stage['first_start'] = start_wall
+                stage['last_end'] = max(stage['last_end'] or 0.0, start_wall + elapsed)
+
+    def add(self, name: str, **counters):
+        """Add to a stage's counters (items, tokens, api_calls, retries, bytes_sent, ...)"""
+
+        with self.lock:
+            stage = self._stage(name)
+            for counter, value in counters.items():
+                stage[counter] = stage.get(counter, 0) + value
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self.lock:
+            return {name: dict(stage) for name, stage in self.stages.items()}
+
+    def merge(self, snapshot: Dict[str, Dict]):
+        """Fold in stage metrics recorded by another process (e.g. a chunk worker)"""
+
+        with self.lock:
+            for name, other in snapshot.items():
+                stage = self._stage(name)
+                for key, value in other.items():
+                    if key == 'first_start':
+                        if value is not None and (stage[key] is None or value < stage[key]):
+                            stage[key] = value
+                    elif key == 'last_end':
+                        if value is not None:
+                            stage[key] = max(stage[key] or 0.0, value)
+                    else:
+                        stage[key] = stage.get(key, 0) + value
+
+    # Profiling (one stage at a time; overlapping calls of the stage are not profiled)
+
+    def _start_profile(self, name: str) -> bool:
+        if name != self.profile_stage:
+            return False
+
+        with self.lock:
+            if self._profiling:
+                return False
+            self._profiling = True
+
+        if self.profiler is None:
+            self.profiler = self._make_profiler()
+        if isinstance(self.profiler, cProfile.Profile):
+            self.profiler.enable()
+        else:
+            self.profiler.start()
+        return True
+
+    def _stop_profile(self):
+        if isinstance(self.profiler, cProfile.Profile):
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
+        with self.lock:
+            self._profiling = False
+
+    def _make_profiler(self):
+        if self.profiler_name == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+                return Profiler(async_mode="disabled")
+            except ImportError:
+                print("⚠️ pyinstrument is not installed, profiling with cProfile")
+        return cProfile.Profile()
+
+    # Reports
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    def report(self) -> Dict:
+        """Structured run report with derived throughput per stage"""
+
+        finished_at = self.finished_at or time.time()
+        stages = {}
+        for name, stage in self.snapshot().items():
+            wall = (stage['last_end'] - stage['first_start']) if stage['first_start'] is not None else 0.0
+            stages[name] = {
+                **{key: value for key, value in stage.items() if key not in ('first_start', 'last_end')},
+                'wall_seconds': wall,
+                'items_per_second': stage['items'] / wall if wall else 0.0,
+                'tokens_per_second': stage['tokens'] / wall if wall else 0.0,
+            }
+
+        return {
+            'run_id': self.run_id,
+            'started_at': self.started_at,
+            'finished_at': finished_at,
+            'wall_seconds': finished_at - self.started_at,
+            'stages': stages,
+        }
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (e.g. for node_exporter's textfile collector)"""
+
+        report = self.report()
+        lines = [
+            f"# HELP {_PROMETHEUS_PREFIX}_run_seconds Wall time of the last ingest run",
+            f"# TYPE {_PROMETHEUS_PREFIX}_run_seconds gauge",
+            f"{_PROMETHEUS_PREFIX}_run_seconds {report['wall_seconds']:.6f}",
+            f"# HELP {_PROMETHEUS_PREFIX}_run_finished_timestamp_seconds End of the last ingest run",
+            f"# TYPE {_PROMETHEUS_PREFIX}_run_finished_timestamp_seconds gauge",
+            f"{_PROMETHEUS_PREFIX}_run_finished_timestamp_seconds {report['finished_at']:.3f}",
+        ]
+
+        metrics = sorted({key for stage in report['stages'].values() for key in stage})
+        for metric in metrics:
+            name = f"{_PROMETHEUS_PREFIX}_stage_{metric}"
+            lines.append(f"# HELP {name} Per-stage {metric.replace('_', ' ')} of the last ingest run")
+            lines.append(f"# TYPE {name} gauge")
+            for stage_name, stage in sorted(report['stages'].items()):
+                if metric in stage:
+                    lines.append(f'{name}{{stage="{stage_name}"}} {float(stage[metric]):.6g}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write_reports(self, directory: str = METRICS_DIR) -> Path:
+        """Write run_report.json, metrics.prom and the stage profile (if any)"""
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        with open(directory / 'run_report.json', 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+        (directory / 'metrics.prom').write_text(self.to_prometheus())
+
+        if self.profiler is not None:
+            if isinstance(self.profiler, cProfile.Profile):
+                self.profiler.dump_stats(str(directory / f'profile_{self.profile_stage}.prof'))
+            else:
+                (directory / f'profile_{self.profile_stage}.html').write_text(self.profiler.output_html())
+
+        return directory
+
+    def print_summary(self):
+        print_report(self.report())
+
+
+def print_report(report: Dict):
+    """Stage table of a run report (a live run's or one loaded from run_report.json)"""
+
+    print(f"\n⏱️ Run {report['run_id']}: {report['wall_seconds']:.2f}s")
+    print(f"{'stage':<10}{'wall s':>9}{'busy s':>9}{'items':>9}{'items/s':>10}{'tokens/s':>11}"
+          f"{'api':>7}{'retries':>9}{'MB sent':>9}{'MB read':>9}")
+    for name, stage in report['stages'].items():
+        print(f"{name:<10}{stage['wall_seconds']:>9.2f}{stage['busy_seconds']:>9.2f}{stage['items']:>9}"
+              f"{stage['items_per_second']:>10.1f}{stage['tokens_per_second']:>11.0f}"
+              f"{stage['api_calls']:>7}{stage['retries']:>9}{stage['bytes_sent'] / 1e6:>9.2f}"
+              f"{stage.get('bytes_read', 0) / 1e6:>9.2f}")
+
+    dedup = report['stages'].get('dedup')
+    if dedup and dedup.get('duplicates'):
+        print(f"dedup: {dedup['duplicates']} duplicate chunks not embedded, "
+              f"{dedup['tokens_saved']} tokens saved")
+
+
+_current = RunMetrics()
+
+
+def current_run() -> RunMetrics:
+    """Metrics of the run in progress (components record into this)"""
+    return _current
+
+
+def start_run(**kwargs) -> RunMetrics:
+    """Start recording a new run, replacing the current one"""
+
+    global _current
+    _current = RunMetrics(**kwargs)
+    return _current
@@ -0,0 +1,161 @@
+"""
+Multi-process parse and chunk stage for Swiss Travel RAG
+Spreads markdown files across CPU cores while keeping output order deterministic
+"""
+import asyncio
+import os
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List, Tuple
+from config import CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_WORKERS
+from metrics import current_run
+
+# Per-process parser/chunker, built once by the pool initializer
+_worker_parser = None
+_worker_chunker = None
+
+
+def _init_worker(chunk_size: int, chunk_overlap: int):
+    """Load the tiktoken encoding and text splitter once per worker process"""
+
+    global _worker_parser, _worker_chunker
+    from markdown_parser import MarkdownParser
+    from chunking import TextChunker
+
+    _worker_parser = MarkdownParser()
+    _worker_chunker = TextChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def _chunk_in_worker(file_path: Path) -> Tuple[List[Dict], Dict]:
+    from chunking import chunk_file
+    from metrics import start_run
+
+    # Fresh per-file metrics, merged into the parent's run by the consumer
+    metrics = start_run(profile_stage=None)
+    start = time.perf_counter()
+    chunks = chunk_file(_worker_parser, _worker_chunker, file_path)
+    stats = {
+        'pid': os.getpid(),
+        'seconds': time.perf_counter() - start,
+        'chunks': len(chunks),
+        'tokens': sum(chunk['token_count'] for chunk in chunks),
+        'metrics': metrics.snapshot(),
+    }
+    return chunks, stats
+
+
+class ParallelChunker:
+    def __init__(self, workers: int = CHUNK_WORKERS,
+                 chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(chunk_size, chunk_overlap)
+        )
+        # Submit a little ahead of the consumer, but never the whole corpus
+        self.lookahead = self.workers * 2
+        self.worker_stats = defaultdict(lambda: {'files': 0, 'chunks': 0, 'tokens': 0, 'seconds': 0.0})
+        self.started_at = None
+
+    def _record(self, stats: Dict):
+        current_run().merge(stats['metrics'])
+        worker = self.worker_stats[stats['pid']]
+        worker['files'] += 1
+        worker['chunks'] += stats['chunks']
+        worker['tokens'] += stats['tokens']
+        worker['seconds'] += stats['seconds']
+
+    def chunk_files(self, files: List[Path]) -> Iterator[Tuple[Path, List[Dict]]]:
+        """
+        Chunk files in parallel, yielding results in input order
+
+        Args:
+            files: Markdown files to chunk
+
+        Yields:
+            (file_path, chunks) per file, or (file_path, exception) on failure
+        """
+
+        self.started_at = self.started_at or time.perf_counter()
+        pending = deque()
+        files = iter(files)
+
+        while True:
+            while len(pending) < self.lookahead:
+                file_path = next(files, None)
+                if file_path is None:
+                    break
+                pending.append((file_path, self.executor.submit(_chunk_in_worker, file_path)))
+
+            if not pending:
+                return
+
+            file_path, future = pending.popleft()
+            try:
+                chunks, stats = future.result()
+            except Exception as e:
+                yield file_path, e
+                continue
+
+            self._record(stats)
+            yield file_path, chunks
+
+    async def chunk_files_async(self, files: List[Path]) -> AsyncIterator[Tuple[Path, List[Dict]]]:
+        """Async variant of chunk_files for the streaming pipeline"""
+
+        self.started_at = self.started_at or time.perf_counter()
+        pending = deque()
+        files = iter(files)
+
+        while True:
+            while len(pending) < self.lookahead:
+                file_path = next(files, None)
+                if file_path is None:
+                    break
+                future = asyncio.wrap_future(self.executor.submit(_chunk_in_worker, file_path))
+                pending.append((file_path, future))
+
+            if not pending:
+                return
+
+            file_path, future = pending.popleft()
+            try:
+                chunks, stats = await future
+            except Exception as e:
+                yield file_path, e
+                continue
+
+            self._record(stats)
+            yield file_path, chunks
+
+    def report(self) -> Dict:
+        """Per-worker throughput plus totals"""
+
+        wall = time.perf_counter() - self.started_at if self.started_at else 0.0
+        workers = {
+            pid: {**stats, 'tokens_per_second': stats['tokens'] / stats['seconds'] if stats['seconds'] else 0.0}
+            for pid, stats in self.worker_stats.items()
+        }
+        total_tokens = sum(stats['tokens'] for stats in workers.values())
+        return {
+            'workers': workers,
+            'wall_seconds': wall,
+            'files': sum(stats['files'] for stats in workers.values()),
+            'chunks': sum(stats['chunks'] for stats in workers.values()),
+            'tokens_per_second': total_tokens / wall if wall else 0.0,
+        }
+
+    def print_report(self):
+        report = self.report()
+        print(f"🧩 Chunked {report['files']} files into {report['chunks']} chunks "
+              f"in {report['wall_seconds']:.2f}s ({report['tokens_per_second']:.0f} tokens/s) "
+              f"on {len(report['workers'])} workers")
+        for pid, stats in sorted(report['workers'].items()):
+            print(f"   worker {pid}: {stats['files']} files, {stats['chunks']} chunks, "
+                  f"{stats['tokens_per_second']:.0f} tokens/s busy")
+
+    def close(self):
+        self.executor.shutdown()
@@ -0,0 +1,232 @@
+"""
+Streaming ingest pipeline for Swiss Travel RAG
+Runs parse → chunk → embed → upload as concurrent stages joined by bounded queues
+"""
+import asyncio
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List
+from markdown_parser import MarkdownParser
+from chunking import TextChunker, chunk_file
+from embedding_engine import AsyncEmbeddingEngine
+from uploader import DatabaseUploader
+from embedding_store import attach_embeddings
+from metrics import current_run
+from config import (
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_BATCH_CHUNKS,
+    PIPELINE_PARSE_WORKERS,
+    PIPELINE_EMBED_WORKERS,
+    PIPELINE_UPLOAD_WORKERS,
+)
+
+_DONE = object()  # end-of-stream marker passed between stages
+
+
+class StreamingPipeline:
+    def __init__(self, parser: MarkdownParser, chunker: TextChunker,
+                 engine: AsyncEmbeddingEngine, uploader: DatabaseUploader, cache=None,
+                 parallel_chunker=None, lexical_index=None, deduplicator=None, spool=None,
+                 queue_size: int = PIPELINE_QUEUE_SIZE,
+                 batch_chunks: int = PIPELINE_BATCH_CHUNKS,
+                 parse_workers: int = PIPELINE_PARSE_WORKERS,
+                 embed_workers: int = PIPELINE_EMBED_WORKERS,
+                 upload_workers: int = PIPELINE_UPLOAD_WORKERS):
+        self.parser = parser
+        self.chunker = chunker
+        self.engine = engine
+        self.uploader = uploader
+        self.cache = cache
+        self.parallel_chunker = parallel_chunker
+        self.lexical_index = lexical_index
+        self.deduplicator = deduplicator
+        self.spool = spool
+        self.queue_size = queue_size
+        self.batch_chunks = batch_chunks
+        self.parse_workers = parse_workers
+        self.embed_workers = embed_workers
+        self.upload_workers = upload_workers
+
+        # Per-file bookkeeping (counts and row keys only, chunks are released after upload)
+        self.expected = Counter()
+        self.uploaded = Counter()
+        self.uploaded_keys = defaultdict(set)
+        self.failed_files: List[str] = []
+
+    def run(self, files: List[Path]) -> Dict:
+        """Synchronous entry point"""
+        return asyncio.run(self.run_async(files))
+
+    async def run_async(self, files: List[Path]) -> Dict:
+        """
+        Stream files through all stages
+
+        Args:
+            files: Markdown files to ingest
+
+        Returns:
+            Summary with per-file expected/uploaded chunk counts
+        """
+
+        file_queue: asyncio.Queue = asyncio.Queue()
+        for file_path in files:
+            file_queue.put_nowait(file_path)
+        for _ in range(self.parse_workers):
+            file_queue.put_nowait(_DONE)
+
+        # Bounded queues give backpressure: a slow stage blocks the one before it
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        upload_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        async with self.engine:
+            if self.parallel_chunker:
+                # Process pool: one ordered producer keeps chunk output deterministic
+                parsers = [self._pool_parse_worker(files, chunk_queue)]
+            else:
+                parsers = [self._parse_worker(file_queue, chunk_queue) for _ in range(self.parse_workers)]
+            stages = [
+                self._close_after(parsers, chunk_queue, 1),
+                self._batcher(chunk_queue, embed_queue),
+                self._close_after([self._embed_worker(embed_queue, upload_queue)
+                                   for _ in range(self.embed_workers)],
+                                  upload_queue, self.upload_workers),
+                *[self._upload_worker(upload_queue) for _ in range(self.upload_workers)],
+            ]
+            await self._run_stages(stages)
+
+        # Files left with no chunks after dedup are complete as well
+        complete = [name for name, count in self.expected.items()
+                    if self.uploaded[name] == count]
+
+        return {
+            'files': len(files),
+            'complete_files': complete,
+            'failed_files': self.failed_files,
+            'chunks_expected': sum(self.expected.values()),
+            'chunks_uploaded': sum(self.uploaded.values()),
+        }
+
+    async def _run_stages(self, stages):
+        """Run all stages; if one fails, cancel the rest instead of deadlocking"""
+
+        tasks = [asyncio.ensure_future(stage) for stage in stages]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+
+        for task in pending:
+            task.cancel()
+        for task in done:
+            if task.exception():
+                raise task.exception()
+
+    async def _close_after(self, workers, queue: asyncio.Queue, consumers: int):
+        """Run a stage's workers, then signal end-of-stream to the next stage"""
+
+        await asyncio.gather(*workers)
+        for _ in range(consumers):
+            await queue.put(_DONE)
+
+    async def _parse_worker(self, file_queue: asyncio.Queue, chunk_queue: asyncio.Queue):
+        while True:
+            file_path = file_queue.get_nowait()
+            if file_path is _DONE:
+                return
+
+            try:
+                # Parsing and tokenizing are CPU-bound: keep them off the event loop
+                chunks = await asyncio.to_thread(chunk_file, self.parser, self.chunker, file_path)
+            except Exception as e:
+                print(f"  ❌ Error processing {file_path.name}: {e}")
+                self.failed_files.append(file_path.name)
+                continue
+
+            if self.deduplicator:
+                chunks = self.deduplicator.filter(chunks)
+            self.expected[file_path.name] = len(chunks)
+            print(f"  📝 {file_path.name}: {len(chunks)} chunks")
+            await chunk_queue.put(chunks)
+
+    async def _pool_parse_worker(self, files: List[Path], chunk_queue: asyncio.Queue):
+        async for file_path, chunks in self.parallel_chunker.chunk_files_async(files):
+            if isinstance(chunks, Exception):
+                print(f"  ❌ Error processing {file_path.name}: {chunks}")
+                self.failed_files.append(file_path.name)
+                continue
+
+            if self.deduplicator:
+                chunks = self.deduplicator.filter(chunks)
+            self.expected[file_path.name] = len(chunks)
+            print(f"  📝 {file_path.name}: {len(chunks)} chunks")
+            await chunk_queue.put(chunks)
+
+    async def _batcher(self, chunk_queue: asyncio.Queue, embed_queue: asyncio.Queue):
+        """Regroup per-file chunk lists into fixed-size embedding batches"""
+
+        batch: List[Dict] = []
+
+        while True:
+            chunks = await chunk_queue.get()
+            if chunks is _DONE:
+                break
+
+            batch.extend(chunks)
+            while len(batch) >= self.batch_chunks:
+                await embed_queue.put(batch[:self.batch_chunks])
+                batch = batch[self.batch_chunks:]
+
+        if batch:
+            await embed_queue.put(batch)
+        for _ in range(self.embed_workers):
+            await embed_queue.put(_DONE)
+
+    async def _embed_worker(self, embed_queue: asyncio.Queue, upload_queue: asyncio.Queue):
+        while True:
+            batch = await embed_queue.get()
+            if batch is _DONE:
+                return
+
+            texts = [chunk['content'] for chunk in batch]
+            # Embeddings spooled by an interrupted attempt of this run come first
+            # SQLite cache and spool calls block, so they run off the event loop
+            embeddings = await asyncio.to_thread(self.spool.get_many, batch) if self.spool else [None] * len(texts)
+            if self.cache:
+                cached = await asyncio.to_thread(self.cache.get_many, self.engine.model, texts)
+                embeddings = [embedding if embedding is not None else hit
+                              for embedding, hit in zip(embeddings, cached)]
+            misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+            current_run().add('embed', cache_hits=len(texts) - len(misses))
+
+            if misses:
+                fresh = await self.engine.embed_texts(
+                    [texts[i] for i in misses],
+                    [batch[i].get('token_count') for i in misses],
+                    show_progress=False
+                )
+                if self.cache:
+                    await asyncio.to_thread(self.cache.put_many, self.engine.model, [texts[i] for i in misses], fresh)
+                for i, embedding in zip(misses, fresh):
+                    embeddings[i] = embedding
+                if self.spool:
+                    await asyncio.to_thread(self.spool.append_embeddings, [batch[i] for i in misses], fresh)
+
+            # One float32 matrix per batch, released once the batch is uploaded
+            embedded = attach_embeddings(batch, embeddings)
+
+            if embedded:
+                await upload_queue.put(embedded)
+
+    async def _upload_worker(self, upload_queue: asyncio.Queue):
+        while True:
+            batch = await upload_queue.get()
+            if batch is _DONE:
+                return
+
+            success = await asyncio.to_thread(self.uploader.upload_chunks, batch, False)
+            if success:
+                self.uploaded.update(chunk['file_name'] for chunk in batch)
+                for name, keys in self.uploader.chunk_keys(batch).items():
+                    self.uploaded_keys[name] |= keys
+                if self.lexical_index is not None:
+                    self.lexical_index.add_chunks(batch)
+            else:
+                print(f"  ❌ Upload failed for a batch of {len(batch)} chunks")
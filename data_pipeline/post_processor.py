@@ -0,0 +1,55 @@
+"""
+Community post processing for Swiss Travel RAG
+Turns (post, comments) bundles from SupabaseFetcher into chunks shaped like markdown chunks (RAG_DESIGN.md 4.2.2/4.2.3)
+"""
+from typing import Dict, List
+from chunking import TextChunker
+
+
+class PostProcessor:
+    def __init__(self, chunker: TextChunker):
+        self.chunker = chunker
+
+    @staticmethod
+    def file_names(post: Dict) -> List[str]:
+        """Row groups one post owns in travel_content (its body and its comments)"""
+        return [f"post_{post['id']}", f"post_{post['id']}_comments"]
+
+    def _metadata(self, post: Dict, source_type: str, title: str, file_name: str) -> Dict:
+        return {
+            'title': title,
+            'file_name': file_name,
+            'category': post.get('category') or '',
+            'section_title': '',
+            'section_level': 1,
+            'tags': [],
+            'location': '',
+            'source_type': source_type,
+            'post_month': post.get('post_month'),
+            'source_updated_at': post.get('updated_at'),
+        }
+
+    def process_post(self, post: Dict) -> List[Dict]:
+        """Title and body as one document, split by CHUNK_SIZE"""
+
+        body = (post.get('content') or '').strip()
+        if not body:
+            return []
+        text = f"{post['title']}\n\n{body}" if post.get('title') else body
+        post_file, _ = self.file_names(post)
+        return self.chunker.chunk_text(text, self._metadata(post, 'community_post', post.get('title') or '',
+                                                            post_file))
+
+    def process_comments(self, post: Dict, comments: List[Dict]) -> List[Dict]:
+        """Comments in comment order, merged into as few chunks as CHUNK_SIZE allows"""
+
+        texts = [(comment.get('content') or comment.get('comment') or '').strip() for comment in comments]
+        text = '\n'.join(text for text in texts if text)
+        if not text:
+            return []
+        _, comments_file = self.file_names(post)
+        title = f"{post.get('title') or ''} - 댓글"
+        return self.chunker.chunk_text(text, self._metadata(post, 'community_comment', title, comments_file))
+
+    def process_bundle(self, post: Dict, comments: List[Dict]) -> List[Dict]:
+        return self.process_post(post) + self.process_comments(post, comments)
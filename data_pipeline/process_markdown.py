@@ -3,14 +3,57 @@ Main processing script for Swiss Travel RAG
 Processes markdown files and uploads to database
 """
 import os
+import sys
+from collections import Counter
 from pathlib import Path
 from markdown_parser import MarkdownParser
-from chunking import TextChunker
+from chunking import TextChunker, chunk_file
 from embedder import EmbeddingGenerator
 from uploader import DatabaseUploader
+from manifest import IngestManifest
+from lexical_index import LexicalIndex
+from pipeline import StreamingPipeline
+from parallel_chunking import ParallelChunker
+from dedup import ChunkDeduplicator
+from spool import IngestSpool
+from embedding_store import attach_embeddings
+from metrics import current_run
+from config import CHUNK_WORKERS, SPOOL_ENABLED, SPOOL_BATCH_CHUNKS, BULK_LOAD
 
-def process_markdown_files():
-    """Main function to process all markdown files"""
+def process_markdown_files(incremental: bool = False, stream: bool = False, workers: int = CHUNK_WORKERS,
+                           resume: str = None, bulk_load: bool = BULK_LOAD):
+    """
+    Main function to process all markdown files
+    
+    Args:
+        incremental: Only process new/changed files (tracked in the ingest
+            manifest); rows of deleted files are removed first, old rows of
+            changed files once their replacements are uploaded
+        stream: Run parse/embed/upload as overlapping stages with bounded
+            memory instead of materializing every chunk first
+        workers: Parse/chunk processes (1 = in-process, 0 = all cores)
+        resume: Run id of an interrupted run to continue from its last
+            checkpoint (its file selection and options are reused)
+        bulk_load: Drop the vector index while uploading and rebuild it in
+            one pass afterwards (for large ingests)
+    """
+    
+    # Every run spools its progress so it can be resumed with --resume <run_id>
+    spool = None
+    if resume:
+        spool = IngestSpool.open(resume)
+        if spool.completed('finalize'):
+            # finish() already dropped its chunks and embeddings
+            print(f"✅ Run {resume} already completed; nothing to resume")
+            return True
+        incremental = spool.state['options']['incremental']
+        stream = spool.state['options']['stream']
+        bulk_load = spool.state['options'].get('bulk_load', bulk_load)
+        print(f"♻️ Resuming run {resume} (completed: {', '.join(spool.state['stages']) or 'nothing'}, "
+              f"{spool.embedded_count()} embeddings spooled)")
+    elif SPOOL_ENABLED:
+        spool = IngestSpool(current_run().run_id)
+        spool.state['options'] = {'incremental': incremental, 'stream': stream, 'bulk_load': bulk_load}
     
     # Initialize components
     parser = MarkdownParser()
@@ -36,45 +79,107 @@ def process_markdown_files():
         print(f"❌ Markdown directory not found: {markdown_dir}")
         return False
     
-    markdown_files = list(markdown_dir.glob("*.md"))
+    markdown_files = sorted(markdown_dir.glob("*.md"))
     if not markdown_files:
         print("❌ No markdown files found")
         return False
     
     print(f"Found {len(markdown_files)} markdown files")
     
-    # Clear existing data (optional)
-    print("Proceeding with new data (existing data will be preserved)...")
-    # clear_existing = input("Clear existing data? (y/N): ").lower().strip()
-    # if clear_existing == 'y':
-    #     uploader.clear_table()
+    # Lexical index is maintained alongside the table for hybrid search
+    lexical_index = LexicalIndex.load()
     
-    # Process each file
-    all_chunks = []
+    manifest = IngestManifest() if incremental else None
     
-    for file_path in markdown_files:
-        print(f"\n📄 Processing: {file_path.name}")
+    if spool and spool.completed('plan'):
+        # Rows of deleted files were already removed; continue with the same files
+        plan = spool.stage_info('plan')
+        by_name = {f.name: f for f in markdown_files}
+        markdown_files = [by_name[name] for name in plan['files'] if name in by_name]
+        for file_name in plan['deleted_files']:
+            if manifest:
+                manifest.remove(file_name)
+        lexical_index.remove_files(plan['stale_files'])
+    elif incremental:
+        changed_files, deleted_files = manifest.diff(markdown_files)
+        
+        # Files sharing collapsed duplicates are re-ingested together, so no
+        # row keeps content or references of a file that changed
+        related = manifest.related([f.name for f in changed_files] + deleted_files)
+        by_name = {f.name: f for f in markdown_files}
+        changed_files += [by_name[name] for name in related if name in by_name]
+        
+        print(f"🔄 Incremental mode: {len(changed_files)} new/changed, "
+              f"{len(deleted_files)} deleted, "
+              f"{len(markdown_files) - len(changed_files)} unchanged")
+        
+        # Deleted files have no replacement rows, so theirs go now; changed
+        # files keep their old rows until the new ones are uploaded
+        stale_files = [f.name for f in changed_files] + deleted_files
+        if not uploader.delete_file_chunks(deleted_files):
+            print("❌ Failed to remove stale chunks")
+            return False
+        
+        for file_name in deleted_files:
+            manifest.remove(file_name)
+        lexical_index.remove_files(stale_files)
+        
+        if not changed_files:
+            manifest.save()
+            lexical_index.save()
+            print("✅ Everything is up to date")
+            return True
         
+        markdown_files = changed_files
+        if spool:
+            spool.checkpoint('plan', files=[f.name for f in markdown_files],
+                             stale_files=stale_files, deleted_files=deleted_files)
+    else:
+        # Clear existing data (optional)
+        print("Proceeding with new data (existing data will be preserved)...")
+        # clear_existing = input("Clear existing data? (y/N): ").lower().strip()
+        # if clear_existing == 'y':
+        #     uploader.clear_table()
+        lexical_index.remove_files(f.name for f in markdown_files)
+        if spool:
+            spool.checkpoint('plan', files=[f.name for f in markdown_files],
+                             stale_files=[f.name for f in markdown_files], deleted_files=[])
+    
+    if spool:
+        print(f"🧾 Run {spool.run_id} (resume with --resume {spool.run_id})")
+    
+    parallel_chunker = ParallelChunker(workers) if workers != 1 else None
+    deduplicator = ChunkDeduplicator()
+    
+    if stream:
         try:
-            # Parse markdown
-            parsed = parser.parse_file(file_path)
-            
-            # Add reading time estimation
-            parsed['metadata']['estimated_reading_time'] = parser.estimate_reading_time(parsed['full_content'])
-            
-            # Chunk sections
-            if parsed['sections']:
-                chunks = chunker.chunk_sections(parsed['sections'], parsed['metadata'])
-            else:
-                # Fallback: chunk entire content
-                chunks = chunker.chunk_text(parsed['full_content'], parsed['metadata'])
-            
-            print(f"  📝 Created {len(chunks)} chunks")
-            all_chunks.extend(chunks)
-            
-        except Exception as e:
-            print(f"  ❌ Error processing {file_path.name}: {e}")
-            continue
+            return _process_streaming(markdown_files, parser, chunker, embedder, uploader,
+                                      manifest, lexical_index, deduplicator, spool, parallel_chunker,
+                                      bulk_load)
+        finally:
+            if parallel_chunker:
+                parallel_chunker.print_report()
+                parallel_chunker.close()
+    
+    if spool and spool.completed('chunk'):
+        all_chunks = spool.load_chunks()
+        file_chunk_counts = spool.stage_info('chunk')['file_chunk_counts']
+        dependencies = spool.stage_info('chunk')['dependencies']
+        print(f"♻️ {len(all_chunks)} chunks restored from spool")
+    else:
+        # Process each file
+        all_chunks, file_chunk_counts = _chunk_files(markdown_files, parser, chunker, parallel_chunker)
+        
+        # Drop exact and near-duplicate chunks before paying for their embeddings
+        all_chunks = deduplicator.filter(all_chunks)
+        deduplicator.print_report()
+        stored_counts = Counter(chunk['file_name'] for chunk in all_chunks)
+        file_chunk_counts = {name: stored_counts[name] for name in file_chunk_counts}
+        dependencies = {name: sorted(files) for name, files in deduplicator.dependencies.items()}
+        
+        if spool:
+            spool.save_chunks(all_chunks)
+            spool.checkpoint('chunk', file_chunk_counts=file_chunk_counts, dependencies=dependencies)
     
     if not all_chunks:
         print("❌ No chunks to process")
@@ -84,7 +189,10 @@ def process_markdown_files():
     
     # Generate embeddings
     print("\n🤖 Generating embeddings...")
-    embedded_chunks = embedder.embed_chunks(all_chunks)
+    if spool:
+        embedded_chunks = _embed_spooled(embedder, all_chunks, spool)
+    else:
+        embedded_chunks = embedder.embed_chunks(all_chunks)
     
     if not embedded_chunks:
         print("❌ No embeddings generated")
@@ -92,15 +200,54 @@ def process_markdown_files():
     
     # Upload to database
     print("\n📤 Uploading to database...")
-    success = uploader.upload_chunks(embedded_chunks)
+    # A resumed run whose upload finished must not upload again (its journal session is closed)
+    uploaded = spool and spool.completed('upload')
+    if bulk_load and not uploaded:
+        uploader.drop_vector_index()
+    try:
+        success = uploaded or uploader.upload_chunks(embedded_chunks)
+    finally:
+        if bulk_load:
+            # Also after a failed upload: searches must not be left without an index
+            uploader.build_vector_index()
     
     if success:
         print("✅ Processing completed successfully!")
+        if spool and not spool.completed('upload'):
+            spool.checkpoint('upload', chunks=len(embedded_chunks))
+        
+        # Only files whose chunks were all embedded count as ingested
+        # (a file can legitimately keep zero chunks after dedup)
+        embedded_counts = Counter(chunk['file_name'] for chunk in embedded_chunks)
+        complete_files = [file_path for file_path in markdown_files
+                          if file_path.name in file_chunk_counts
+                          and embedded_counts[file_path.name] == file_chunk_counts[file_path.name]]
+        
+        if manifest:
+            # Old rows of changed files (and partial rows of an interrupted run)
+            # go only now that the new ones are in
+            kept = uploader.chunk_keys(embedded_chunks)
+            if not uploader.delete_leftover_chunks({f.name: kept[f.name] for f in complete_files}):
+                # Left out of the manifest so the next run cleans them up
+                complete_files = []
         
         # Update parent chunk relationships
         print("🔗 Updating chunk relationships...")
         uploader.update_parent_chunk_ids(embedded_chunks)
         
+        lexical_index.add_chunks(embedded_chunks)
+        lexical_index.save()
+        print(f"🔤 Lexical index: {len(lexical_index)} chunks")
+        
+        if manifest:
+            for file_path in complete_files:
+                manifest.record(file_path, file_chunk_counts[file_path.name], dependencies.get(file_path.name))
+            manifest.save()
+        
+        if spool:
+            spool.checkpoint('finalize')
+            spool.finish()
+        
         # Show final stats
         total_chunks = uploader.get_chunk_count()
         print(f"📊 Total chunks in database: {total_chunks}")
@@ -108,7 +255,140 @@ def process_markdown_files():
         return True
     else:
         print("❌ Upload failed")
+        if spool:
+            print(f"🧾 Embeddings are spooled; continue with --resume {spool.run_id}")
         return False
 
+def _chunk_files(markdown_files, parser, chunker, parallel_chunker=None):
+    """Parse and chunk files; returns (all chunks, chunk count per file)"""
+    
+    all_chunks = []
+    file_chunk_counts = {}
+    
+    if parallel_chunker:
+        print(f"\n📄 Processing {len(markdown_files)} files on {parallel_chunker.workers} workers")
+        
+        # Results come back in input order, so output is reproducible
+        for file_path, chunks in parallel_chunker.chunk_files(markdown_files):
+            if isinstance(chunks, Exception):
+                print(f"  ❌ Error processing {file_path.name}: {chunks}")
+                continue
+            
+            all_chunks.extend(chunks)
+            file_chunk_counts[file_path.name] = len(chunks)
+        
+        parallel_chunker.print_report()
+        parallel_chunker.close()
+    else:
+        for file_path in markdown_files:
+            print(f"\n📄 Processing: {file_path.name}")
+            
+            try:
+                # Parse markdown and chunk sections
+                chunks = chunk_file(parser, chunker, file_path)
+                
+                print(f"  📝 Created {len(chunks)} chunks")
+                all_chunks.extend(chunks)
+                file_chunk_counts[file_path.name] = len(chunks)
+                
+            except Exception as e:
+                print(f"  ❌ Error processing {file_path.name}: {e}")
+                continue
+    
+    return all_chunks, file_chunk_counts
+
+def _embed_spooled(embedder, chunks, spool, batch_chunks: int = SPOOL_BATCH_CHUNKS):
+    """
+    Embed chunks batch by batch, spooling each batch durably as it completes
+    
+    Chunks spooled by an earlier attempt of the run are not embedded again.
+    
+    Returns:
+        Chunks with 'embedding' and 'embedding_row' (failed ones are dropped)
+    """
+    
+    pending = [chunk for chunk in chunks if not spool.has_embedding(chunk)]
+    if len(pending) < len(chunks):
+        print(f"♻️ {len(chunks) - len(pending)} embeddings restored from spool")
+    
+    for i in range(0, len(pending), batch_chunks):
+        batch = pending[i:i + batch_chunks]
+        embeddings = embedder.generate_embeddings_batch([chunk['content'] for chunk in batch],
+                                                        [chunk.get('token_count') for chunk in batch])
+        spool.append_embeddings(batch, embeddings)
+        print(f"Spooled {min(i + batch_chunks, len(pending))}/{len(pending)} new embeddings")
+    
+    embedded_chunks = attach_embeddings(chunks, spool.get_many(chunks))
+    print(f"Successfully embedded {len(embedded_chunks)}/{len(chunks)} chunks")
+    if len(embedded_chunks) == len(chunks):
+        spool.checkpoint('embed', chunks=len(embedded_chunks))
+    return embedded_chunks
+
+def _process_streaming(markdown_files, parser, chunker, embedder, uploader, manifest,
+                       lexical_index, deduplicator, spool=None, parallel_chunker=None,
+                       bulk_load: bool = False) -> bool:
+    """Ingest through the streaming pipeline (flat memory, overlapping network I/O)"""
+    
+    print(f"\n🌊 Streaming {len(markdown_files)} files through parse → embed → upload...")
+    
+    pipeline = StreamingPipeline(parser, chunker, embedder.engine, uploader, cache=embedder.cache,
+                                 parallel_chunker=parallel_chunker, lexical_index=lexical_index,
+                                 deduplicator=deduplicator, spool=spool)
+    if bulk_load:
+        uploader.drop_vector_index()
+    try:
+        summary = pipeline.run(markdown_files)
+    finally:
+        if bulk_load:
+            uploader.build_vector_index()
+    deduplicator.print_report()
+    
+    print(f"\n📤 Uploaded {summary['chunks_uploaded']}/{summary['chunks_expected']} chunks "
+          f"({len(summary['complete_files'])}/{summary['files']} files complete)")
+    
+    cleaned = True
+    if manifest and summary['complete_files']:
+        # Old rows of changed files go only now that the new ones are in
+        cleaned = uploader.delete_leftover_chunks(
+            {name: pipeline.uploaded_keys[name] for name in summary['complete_files']})
+    
+    if summary['complete_files']:
+        # Update parent chunk relationships
+        print("🔗 Updating chunk relationships...")
+        uploader.update_parent_chunk_ids([{'file_name': name} for name in summary['complete_files']])
+    
+    if deduplicator.policy == "collapse":
+        # A kept row may have been uploaded before its later duplicates were seen
+        uploader.update_duplicate_sources(deduplicator.collapsed())
+    
+    lexical_index.save()
+    print(f"🔤 Lexical index: {len(lexical_index)} chunks")
+    
+    if manifest:
+        # Without the cleanup the files stay out of the manifest so the next run redoes it
+        complete = set(summary['complete_files']) if cleaned else set()
+        for file_path in markdown_files:
+            if file_path.name in complete:
+                manifest.record(file_path, pipeline.expected[file_path.name],
+                                deduplicator.dependencies.get(file_path.name))
+        manifest.save()
+    
+    total_chunks = uploader.get_chunk_count()
+    print(f"📊 Total chunks in database: {total_chunks}")
+    
+    success = summary['chunks_uploaded'] == summary['chunks_expected'] and not summary['failed_files']
+    print("✅ Processing completed successfully!" if success else "⚠️ Processing finished with errors")
+    
+    if spool:
+        if success:
+            spool.checkpoint('finalize')
+            spool.finish()
+        else:
+            # Re-streaming reuses spooled embeddings; uploads are idempotent upserts
+            print(f"🧾 Embeddings are spooled; continue with --resume {spool.run_id}")
+    return success
+
 if __name__ == "__main__":
-    process_markdown_files()
\ No newline at end of file
+    # Same as `python cli.py ingest ...` (kept for existing job definitions)
+    from cli import main
+    sys.exit(main(["ingest", *sys.argv[1:]]))
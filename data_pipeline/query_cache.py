@@ -0,0 +1,173 @@
+"""
+Query cache for Swiss Travel RAG
+Two tiers in front of retrieval: exact normalized-text LRU and semantic (cosine) lookup
+"""
+import os
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from embedding_cache import normalize_text
+from config import (
+    QUERY_CACHE_MAX_ENTRIES,
+    QUERY_CACHE_TTL_SECONDS,
+    QUERY_CACHE_SEMANTIC_THRESHOLD,
+    TABLE_GENERATION_PATH,
+)
+
+
+def bump_table_generation(path: str = TABLE_GENERATION_PATH):
+    """
+    Record that travel_content changed so cached search results are dropped
+
+    The generation is a local file, so this only reaches query caches on the
+    same host as the ingest; elsewhere cached results live until their TTL.
+    """
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    tmp_path.write_text(uuid.uuid4().hex)
+    os.replace(tmp_path, path)
+
+
+def read_table_generation(path: str = TABLE_GENERATION_PATH) -> str:
+    try:
+        return Path(path).read_text()
+    except FileNotFoundError:
+        return ''
+
+
+def params_key(match_threshold: float, match_count: int, filter_category: Optional[str]) -> Tuple:
+    return (round(float(match_threshold), 6), int(match_count), filter_category)
+
+
+class _Entry:
+    __slots__ = ('embedding', 'results', 'created_at')
+
+    def __init__(self, embedding: np.ndarray):
+        self.embedding = embedding
+        self.results: Dict[Tuple, List[Dict]] = {}
+        self.created_at = time.time()
+
+
+class QueryCache:
+    def __init__(self, max_entries: int = QUERY_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = QUERY_CACHE_TTL_SECONDS,
+                 semantic_threshold: float = QUERY_CACHE_SEMANTIC_THRESHOLD,
+                 generation_path: str = TABLE_GENERATION_PATH):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+        self.generation_path = generation_path
+        self.generation = read_table_generation(generation_path)
+        self.entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.embedding_hits = 0
+        self.misses = 0
+
+    def get_embedding(self, query: str) -> Optional[np.ndarray]:
+        """Tier 1: cached query embedding for the normalized query text"""
+
+        entry = self._get_entry(normalize_text(query))
+        if entry is not None:
+            self.embedding_hits += 1
+            return entry.embedding
+        return None
+
+    def get_results(self, query: str, key: Tuple) -> Optional[List[Dict]]:
+        """Tier 1: cached results for the exact normalized query and search parameters"""
+
+        self._check_generation()
+        entry = self._get_entry(normalize_text(query))
+        if entry is not None and key in entry.results:
+            self.exact_hits += 1
+            return entry.results[key]
+        return None
+
+    def get_similar_results(self, embedding, key: Tuple) -> Optional[List[Dict]]:
+        """
+        Tier 2: results of the most similar cached query, if it is within the cosine threshold
+
+        Args:
+            embedding: Embedding of the new query
+            key: Search parameters (see params_key)
+
+        Returns:
+            Cached results, or None (counted as a miss)
+        """
+
+        self._check_generation()
+        candidates = [(text, entry) for text, entry in self.entries.items()
+                      if key in entry.results and not self._expired(entry)]
+
+        if candidates:
+            query = np.asarray(embedding, dtype=np.float32)
+            query = query / max(np.linalg.norm(query), 1e-12)
+            matrix = np.vstack([entry.embedding for _, entry in candidates])
+            scores = matrix @ query / np.maximum(np.linalg.norm(matrix, axis=1), 1e-12)
+            best = int(np.argmax(scores))
+
+            if scores[best] >= self.semantic_threshold:
+                text, entry = candidates[best]
+                self.entries.move_to_end(text)
+                self.semantic_hits += 1
+                return entry.results[key]
+
+        self.misses += 1
+        return None
+
+    def put(self, query: str, embedding, key: Tuple = None, results: List[Dict] = None):
+        """Store a query embedding, and optionally the results for one parameter set"""
+
+        text = normalize_text(query)
+        entry = self._get_entry(text)
+        if entry is None:
+            entry = self.entries[text] = _Entry(np.asarray(embedding, dtype=np.float32))
+        if key is not None and results is not None:
+            entry.results[key] = results
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self):
+        """Drop cached results (query embeddings do not depend on the table)"""
+
+        for entry in self.entries.values():
+            entry.results.clear()
+
+    def _check_generation(self):
+        generation = read_table_generation(self.generation_path)
+        if generation != self.generation:
+            self.generation = generation
+            self.invalidate()
+
+    def _get_entry(self, text: str) -> Optional[_Entry]:
+        entry = self.entries.get(text)
+        if entry is None:
+            return None
+        if self._expired(entry):
+            del self.entries[text]
+            return None
+        self.entries.move_to_end(text)
+        return entry
+
+    def _expired(self, entry: _Entry) -> bool:
+        return bool(self.ttl_seconds) and entry.created_at < time.time() - self.ttl_seconds
+
+    def stats(self) -> Dict:
+        """Hit counters per tier; hit_rate counts lookups that skipped the search RPC"""
+
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            'exact_hits': self.exact_hits,
+            'semantic_hits': self.semantic_hits,
+            'embedding_hits': self.embedding_hits,
+            'misses': self.misses,
+            'hit_rate': (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            'entries': len(self.entries),
+        }
@@ -0,0 +1,90 @@
+"""
+Rate limiting utilities for Swiss Travel RAG
+Token buckets enforcing requests-per-minute and tokens-per-minute budgets
+"""
+import asyncio
+import time
+from config import RATE_LIMIT_RPM, RATE_LIMIT_TPM
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0  # tokens refilled per second
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def resize(self, per_minute: float):
+        """Change the budget, keeping at most a full bucket of the new size"""
+
+        self._refill()
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, amount: float) -> float:
+        """
+        Take amount from the bucket if available
+
+        Requests larger than the whole bucket are let through once it is full
+        and leave the bucket in debt, so they are still paced correctly.
+
+        Returns:
+            0 if acquired, otherwise seconds to wait before trying again
+        """
+
+        self._refill()
+        needed = min(amount, self.capacity)
+
+        if self.tokens >= needed:
+            self.tokens -= amount
+            return 0.0
+
+        return (needed - self.tokens) / self.rate
+
+    async def acquire(self, amount: float = 1):
+        while True:
+            wait = self.try_acquire(amount)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+class RateLimiter:
+    def __init__(self, rpm: int = RATE_LIMIT_RPM, tpm: int = RATE_LIMIT_TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+
+    def share(self, workers: int):
+        """
+        Use 1/workers of the budgets: processes pulling from one ingest queue
+        split a single API limit (re-applied as workers join and leave)
+        """
+
+        workers = max(1, workers)
+        self.requests.resize(self.rpm / workers)
+        self.tokens.resize(self.tpm / workers)
+
+    def pause(self, seconds: float):
+        """Hold back every caller, e.g. after a 429 with Retry-After"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, token_count: int):
+        """Wait until one request carrying token_count tokens fits both budgets"""
+
+        while True:
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+
+            await self.requests.acquire(1)
+            await self.tokens.acquire(token_count)
+            return
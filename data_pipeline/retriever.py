@@ -0,0 +1,282 @@
+"""
+Retriever for Swiss Travel RAG
+Query embedding + match_travel_content search with a query cache in front,
+optionally combined with the lexical index (prefilter or reciprocal rank fusion)
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+from supabase import Client
+from embedder import EmbeddingGenerator
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from query_cache import QueryCache, params_key
+from clients import supabase_client
+from config import (
+    QUERY_CACHE_ENABLED, HNSW_EF_SEARCH, FILTERED_MAX_EF_SEARCH, SEARCH_CONCURRENCY,
+    SEARCH_MODE, LEXICAL_MAX_CANDIDATES, LEXICAL_MIN_KEYWORD_STRENGTH, RRF_K, RRF_OVERFETCH,
+)
+
+SEARCH_MODES = ("vector", "prefilter", "rrf")
+
+# Metadata filters besides filter_category (match_travel_content_filtered's filter_* arguments)
+FILTER_FIELDS = ("source_type", "tags", "location", "post_month")
+
+
+def filters_key(filters: Optional[Dict]) -> Tuple:
+    if not filters:
+        return ()
+    unknown = set(filters) - set(FILTER_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown search filters: {sorted(unknown)}")
+    return tuple((field, tuple(value) if isinstance(value, list) else value)
+                 for field, value in sorted(filters.items()) if value is not None)
+
+
+class Retriever:
+    def __init__(self, client=None, embedder: EmbeddingGenerator = None,
+                 use_cache: bool = QUERY_CACHE_ENABLED, mode: str = SEARCH_MODE,
+                 lexical_index: LexicalIndex = None, ef_search: Optional[int] = HNSW_EF_SEARCH or None):
+        """
+        Args:
+            client: Supabase client or LocalVectorIndex (anything with .rpc)
+            embedder: Embedding generator (created if omitted)
+            use_cache: Put a QueryCache in front of embedding and search
+            mode: "vector" (embedding only), "prefilter" (vector search over
+                lexical candidates when the query has strong keywords) or
+                "rrf" (fuse vector and lexical rankings)
+            lexical_index: Lexical index (loaded from disk if a lexical mode is used)
+            ef_search: HNSW candidate list per vector search (None = server default);
+                the scan returns at most this many rows, so keep it above match_count
+        """
+
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+
+        self.client: Client = client or supabase_client()
+        self.embedder = embedder or EmbeddingGenerator()
+        self.cache = QueryCache() if use_cache else None
+        self.mode = mode
+        self.ef_search = ef_search
+        self.lexical_index = lexical_index
+        if self.lexical_index is None and mode != "vector":
+            self.lexical_index = LexicalIndex.load()
+
+    def embed_query(self, query: str):
+        """Query embedding, served from the query cache when possible"""
+
+        if self.cache:
+            embedding = self.cache.get_embedding(query)
+            if embedding is not None:
+                return embedding
+        return self.embedder.generate_embedding(query)
+
+    def search(self, query: str, match_threshold: float = 0.7, match_count: int = 5,
+               filter_category: Optional[str] = None, mode: str = None,
+               ef_search: Optional[int] = None, filters: Optional[Dict] = None) -> Optional[List[Dict]]:
+        """
+        Search travel content for a query
+
+        Repeated queries are answered from the exact tier without any network
+        call; paraphrases close to a cached query skip the search RPC.
+
+        Args:
+            filters: Values for FILTER_FIELDS (tags must all be present); filtered
+                searches use vector ranking only
+
+        Returns:
+            Result rows, or None if the query embedding failed
+        """
+
+        mode = mode or self.mode
+        ef_search = ef_search or self.ef_search
+        key = params_key(match_threshold, match_count, filter_category) + (mode, ef_search, filters_key(filters))
+
+        if self.cache:
+            results = self.cache.get_results(query, key)
+            if results is not None:
+                return results
+
+        query_embedding = self.embed_query(query)
+        if query_embedding is None:
+            return None
+
+        if self.cache:
+            results = self.cache.get_similar_results(query_embedding, key)
+            if results is not None:
+                # Only the embedding: re-storing the results would restart their TTL
+                self.cache.put(query, query_embedding)
+                return results
+
+        results = self.search_embedding(query, query_embedding, match_threshold, match_count,
+                                        filter_category, mode, ef_search, filters)
+
+        if self.cache:
+            self.cache.put(query, query_embedding, key, results)
+        return results
+
+    def search_many(self, queries: Sequence[str], match_threshold: float = 0.7, match_count: int = 5,
+                    filter_category: Optional[str] = None, mode: str = None,
+                    ef_search: Optional[int] = None, filters: Optional[Dict] = None,
+                    concurrency: int = SEARCH_CONCURRENCY) -> List[Optional[List[Dict]]]:
+        """
+        Search many queries at once (evaluation runs, answer precomputation)
+
+        Query cache tiers are checked first; the remaining queries are embedded
+        in one embeddings call and their searches run concurrently over the
+        shared client, so a batch costs about one round trip per `concurrency`
+        queries instead of two per query.
+
+        Returns:
+            Result rows per query in input order (None where embedding failed)
+        """
+
+        mode = mode or self.mode
+        ef_search = ef_search or self.ef_search
+        key = params_key(match_threshold, match_count, filter_category) + (mode, ef_search, filters_key(filters))
+        results: List[Optional[List[Dict]]] = [None] * len(queries)
+        embeddings = [None] * len(queries)
+
+        pending = []
+        for i, query in enumerate(queries):
+            cached = self.cache.get_results(query, key) if self.cache else None
+            if cached is not None:
+                results[i] = cached
+                continue
+            embeddings[i] = self.cache.get_embedding(query) if self.cache else None
+            pending.append(i)
+
+        missing = [i for i in pending if embeddings[i] is None]
+        if missing:
+            # The query path: no tokenizer, no token-budget packing
+            fresh = self.embedder.generate_query_embeddings([queries[i] for i in missing])
+            for i, embedding in zip(missing, fresh):
+                embeddings[i] = embedding
+
+        to_search = []
+        for i in pending:
+            if embeddings[i] is None:
+                continue
+            similar = self.cache.get_similar_results(embeddings[i], key) if self.cache else None
+            if similar is not None:
+                results[i] = similar
+                self.cache.put(queries[i], embeddings[i])
+            else:
+                to_search.append(i)
+
+        found = self.search_embeddings([queries[i] for i in to_search], [embeddings[i] for i in to_search],
+                                       match_threshold, match_count, filter_category, mode, ef_search,
+                                       filters, concurrency)
+        for i, rows in zip(to_search, found):
+            results[i] = rows
+            if self.cache:
+                self.cache.put(queries[i], embeddings[i], key, rows)
+        return results
+
+    def search_embeddings(self, queries: Sequence[str], query_embeddings, match_threshold: float = 0.7,
+                          match_count: int = 5, filter_category: Optional[str] = None,
+                          mode: str = None, ef_search: Optional[int] = None,
+                          filters: Optional[Dict] = None,
+                          concurrency: int = SEARCH_CONCURRENCY) -> List[List[Dict]]:
+        """search_embedding for many queries, `concurrency` RPCs in flight (results in input order)"""
+
+        def search_one(query, query_embedding):
+            return self.search_embedding(query, query_embedding, match_threshold, match_count,
+                                         filter_category, mode, ef_search, filters)
+
+        if concurrency <= 1 or len(queries) <= 1:
+            return [search_one(query, embedding) for query, embedding in zip(queries, query_embeddings)]
+        # The client's HTTP connection pool is shared by the threads (keep-alive, no per-query setup)
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(queries))) as pool:
+            return list(pool.map(search_one, queries, query_embeddings))
+
+    def search_embedding(self, query: str, query_embedding, match_threshold: float = 0.7,
+                         match_count: int = 5, filter_category: Optional[str] = None,
+                         mode: str = None, ef_search: Optional[int] = None,
+                         filters: Optional[Dict] = None) -> List[Dict]:
+        """Search with an already computed query embedding (no query cache)"""
+
+        mode = mode or self.mode
+        ef_search = ef_search or self.ef_search
+        # The lexical index only knows categories, so other filters rank by vector alone
+        if mode == "vector" or not self.lexical_index or filters_key(filters):
+            return self._vector_search(query_embedding, match_threshold, match_count, filter_category,
+                                       ef_search, filters)
+
+        if mode == "prefilter":
+            return self._prefilter_search(query, query_embedding, match_threshold, match_count,
+                                          filter_category, ef_search)
+        return self._rrf_search(query, query_embedding, match_threshold, match_count, filter_category,
+                                ef_search)
+
+    def _vector_search(self, query_embedding, match_threshold: float, match_count: int,
+                       filter_category: Optional[str], ef_search: Optional[int] = None,
+                       filters: Optional[Dict] = None) -> List[Dict]:
+        params = {
+            'query_embedding': list(map(float, query_embedding)),
+            'match_threshold': match_threshold,
+            'match_count': match_count,
+        }
+        if ef_search:
+            params['ef_search'] = ef_search
+        filter_params = {f'filter_{field}': value for field, value in filters_key(filters)}
+        if filter_category is None and not filter_params:
+            return self.client.rpc('match_travel_content', params).execute().data or []
+
+        # Filtered scans refill until match_count rows pass (plain HNSW + filter comes back short)
+        if filter_category is not None:
+            filter_params['filter_category'] = filter_category
+        params.update(filter_params, max_ef_search=FILTERED_MAX_EF_SEARCH)
+        if 'filter_tags' in params:
+            params['filter_tags'] = list(params['filter_tags'])
+        return self.client.rpc('match_travel_content_filtered', params).execute().data or []
+
+    def _candidate_search(self, query_embedding, keys, match_threshold: float, match_count: int,
+                          filter_category: Optional[str]) -> List[Dict]:
+        """Exact vector ranking of the given (file_name, chunk_index) candidates only"""
+
+        params = {
+            'query_embedding': list(map(float, query_embedding)),
+            'candidate_file_names': [file_name for file_name, _ in keys],
+            'candidate_chunk_indexes': [chunk_index for _, chunk_index in keys],
+            'match_threshold': match_threshold,
+            'match_count': match_count,
+            'filter_category': filter_category,
+        }
+        return self.client.rpc('match_travel_content_candidates', params).execute().data or []
+
+    def _prefilter_search(self, query: str, query_embedding, match_threshold: float, match_count: int,
+                          filter_category: Optional[str], ef_search: Optional[int] = None) -> List[Dict]:
+        """Narrow vector search to lexical candidates when the query names something specific"""
+
+        if self.lexical_index.keyword_strength(query) >= LEXICAL_MIN_KEYWORD_STRENGTH:
+            candidates = self.lexical_index.search(query, LEXICAL_MAX_CANDIDATES, filter_category)
+            if candidates:
+                results = self._candidate_search(query_embedding, [key for key, _ in candidates],
+                                                 match_threshold, match_count, filter_category)
+                if results:
+                    return results
+
+        return self._vector_search(query_embedding, match_threshold, match_count, filter_category, ef_search)
+
+    def _rrf_search(self, query: str, query_embedding, match_threshold: float, match_count: int,
+                    filter_category: Optional[str], ef_search: Optional[int] = None) -> List[Dict]:
+        """
+        Reciprocal rank fusion of the vector and lexical rankings
+
+        Lexical hits are fetched with their similarity but without the
+        threshold, so exact keyword matches can surface below it.
+        """
+
+        depth = match_count * RRF_OVERFETCH
+        vector_results = self._vector_search(query_embedding, match_threshold, depth, filter_category,
+                                             ef_search and max(ef_search, depth))
+        lexical_keys = [key for key, _ in self.lexical_index.search(query, depth, filter_category)]
+        lexical_results = self._candidate_search(query_embedding, lexical_keys, -1.0, depth,
+                                                 filter_category) if lexical_keys else []
+
+        rows = {(row['file_name'], row['chunk_index']): row for row in lexical_results + vector_results}
+        fused = reciprocal_rank_fusion([
+            [(row['file_name'], row['chunk_index']) for row in vector_results],
+            [key for key in lexical_keys if key in rows],
+        ], k=RRF_K)
+
+        return [{**rows[key], 'rrf_score': score} for key, score in fused[:match_count]]
@@ -3,14 +3,320 @@ Database setup script for Swiss Travel RAG
 Creates tables and indexes in Supabase
 """
 import asyncio
-from supabase import create_client, Client
-from config import SUPABASE_URL, SUPABASE_KEY
+from supabase import Client
+from compact_storage import compact_index_sql, compact_storage_enabled, vector_index_sql, partial_vector_index_sql
+from clients import supabase_client
+from config import (
+    EMBEDDING_DIMENSION, EMBEDDING_STORAGE, EMBEDDING_INDEX, EMBEDDING_INDEX_DIMENSIONS,
+    HNSW_M, HNSW_EF_CONSTRUCTION, QUEUE_BACKEND,
+)
+from work_queue import INGEST_QUEUE_SQL
+
+# Natural key for idempotent upserts from DatabaseUploader (UPLOAD_MODE=upsert)
+NATURAL_KEY_SQL = """
+alter table travel_content add column if not exists content_hash text;
+
+update travel_content
+set content_hash = encode(sha256(convert_to(btrim(regexp_replace(content, '\\s+', ' ', 'g')), 'UTF8')), 'hex')
+where content_hash is null;
+
+create unique index if not exists travel_content_natural_key
+  on travel_content(file_name, chunk_index, content_hash);
+"""
+
+# References to the chunks collapsed into a row by ChunkDeduplicator (DEDUP_POLICY=collapse),
+# stored for many rows (matched on the natural key) in one statement
+DUPLICATE_SOURCES_SQL = """
+alter table travel_content add column if not exists duplicate_sources jsonb;
+
+create or replace function store_duplicate_sources (
+  collapsed jsonb
+)
+returns int
+language sql
+as $$
+  with updated as (
+    update travel_content tc
+    set duplicate_sources = r.duplicate_sources
+    from jsonb_to_recordset(collapsed)
+      as r(file_name text, chunk_index int, content_hash text, duplicate_sources jsonb)
+    where tc.file_name = r.file_name
+      and tc.chunk_index = r.chunk_index
+      and tc.content_hash = r.content_hash
+    returning 1
+  )
+  select count(*)::int from updated;
+$$;
+"""
+
+# Links every chunk of the given files to its predecessor in one statement
+LINK_PARENT_CHUNKS_SQL = """
+create or replace function link_parent_chunks (
+  file_names text[]
+)
+returns int
+language sql
+as $$
+  with ordered as (
+    select
+      tc.id,
+      lag(tc.id) over (partition by tc.file_name order by tc.chunk_index, tc.id) as parent_id
+    from travel_content tc
+    where tc.file_name = any(file_names)
+  ),
+  updated as (
+    update travel_content tc
+    set parent_chunk_id = ordered.parent_id
+    from ordered
+    where tc.id = ordered.id
+      and tc.parent_chunk_id is distinct from ordered.parent_id
+    returning 1
+  )
+  select count(*)::int from updated;
+$$;
+"""
+
+# Vector search used by the web app; ef_search widens the HNSW candidate list for this call only
+MATCH_TRAVEL_CONTENT_SQL = """
+drop function if exists match_travel_content(vector, float, int, text);
+
+create or replace function match_travel_content (
+  query_embedding vector(1536),
+  match_threshold float default 0.7,
+  match_count int default 5,
+  filter_category text default null,
+  ef_search int default null
+)
+returns table (
+  id bigint,
+  content text,
+  title text,
+  file_name text,
+  category text,
+  section_title text,
+  chunk_index int,
+  total_chunks int,
+  similarity float,
+  created_at timestamptz
+)
+language plpgsql
+as $$
+begin
+  if ef_search is not null then
+    perform set_config('hnsw.ef_search', ef_search::text, true);
+  end if;
+  return query
+  select
+    tc.id,
+    tc.content,
+    tc.title,
+    tc.file_name,
+    tc.category,
+    tc.section_title,
+    tc.chunk_index,
+    tc.total_chunks,
+    1 - (tc.embedding <=> query_embedding) as similarity,
+    tc.created_at
+  from travel_content tc
+  where 
+    (filter_category is null or tc.category = filter_category)
+    and 1 - (tc.embedding <=> query_embedding) > match_threshold
+  order by tc.embedding <=> query_embedding
+  limit match_count;
+end;
+$$;
+"""
+
+# Source and date filters (RAG_DESIGN.md); existing markdown rows get source_type 'markdown'
+FILTER_COLUMNS_SQL = """
+alter table travel_content add column if not exists source_type text not null default 'markdown';
+alter table travel_content add column if not exists post_month smallint;
+
+create index if not exists idx_source_type on travel_content(source_type);
+create index if not exists idx_post_month on travel_content(post_month);
+create index if not exists idx_location on travel_content(location);
+"""
+
+# Filtered vector search that returns the full match_count for selective filters.
+# Filters are inlined as literals so the planner can pick a partial HNSW index or a
+# btree index on the filtered column. Without one, pgvector >= 0.8 keeps walking the
+# graph until enough rows pass (iterative scan); older versions re-run the scan with
+# a larger ef_search until the page is full (over-fetch and refill).
+MATCH_FILTERED_SQL = """
+create or replace function match_travel_content_filtered (
+  query_embedding vector(1536),
+  match_threshold float default 0.7,
+  match_count int default 5,
+  filter_category text default null,
+  filter_source_type text default null,
+  filter_tags text[] default null,
+  filter_location text default null,
+  filter_post_month int default null,
+  ef_search int default null,
+  max_ef_search int default 1000
+)
+returns table (
+  id bigint,
+  content text,
+  title text,
+  file_name text,
+  category text,
+  section_title text,
+  chunk_index int,
+  total_chunks int,
+  similarity float,
+  created_at timestamptz,
+  source_type text,
+  tags text[],
+  location text,
+  post_month smallint
+)
+language plpgsql
+as $$
+declare
+  filters text := 'true';
+  ef int := greatest(coalesce(ef_search, 40), match_count);
+  iterative boolean;
+  ranked_ids bigint[];
+  scanned int;
+begin
+  if filter_category is not null then
+    filters := filters || format(' and tc.category = %L', filter_category);
+  end if;
+  if filter_source_type is not null then
+    filters := filters || format(' and tc.source_type = %L', filter_source_type);
+  end if;
+  if filter_tags is not null then
+    filters := filters || format(' and tc.tags @> %L::text[]', filter_tags);
+  end if;
+  if filter_location is not null then
+    filters := filters || format(' and tc.location = %L', filter_location);
+  end if;
+  if filter_post_month is not null then
+    filters := filters || format(' and tc.post_month = %s', filter_post_month);
+  end if;
+
+  select string_to_array(split_part(extversion, '-', 1), '.')::int[] >= array[0, 8]
+  into iterative
+  from pg_extension
+  where extname = 'vector';
+  if iterative then
+    perform set_config('hnsw.iterative_scan', 'relaxed_order', true);
+  end if;
+
+  loop
+    perform set_config('hnsw.ef_search', least(ef, 1000)::text, true);
+    -- scanned < match_count: the graph scan ran out of candidates before enough rows matched
+    execute format(
+      'select array_agg(c.id order by c.distance) filter (where c.distance < $2), count(*)::int
+       from (
+         select tc.id, tc.embedding <=> $1 as distance
+         from travel_content tc
+         where %s
+         order by tc.embedding <=> $1
+         limit $3
+       ) c', filters)
+    into ranked_ids, scanned
+    using query_embedding, 1 - match_threshold, match_count;
+
+    exit when scanned >= match_count or iterative or ef >= max_ef_search;
+    ef := least(ef * 4, max_ef_search);
+  end loop;
+
+  return query
+  select
+    tc.id,
+    tc.content,
+    tc.title,
+    tc.file_name,
+    tc.category,
+    tc.section_title,
+    tc.chunk_index,
+    tc.total_chunks,
+    1 - (tc.embedding <=> query_embedding) as similarity,
+    tc.created_at,
+    tc.source_type,
+    tc.tags,
+    tc.location,
+    tc.post_month
+  from unnest(ranked_ids) with ordinality as c(id, rank)
+  join travel_content tc on tc.id = c.id
+  order by c.rank;
+end;
+$$;
+"""
+
+# Exact vector ranking restricted to lexical candidates (Retriever prefilter/rrf modes)
+MATCH_CANDIDATES_SQL = """
+create or replace function match_travel_content_candidates (
+  query_embedding vector(1536),
+  candidate_file_names text[],
+  candidate_chunk_indexes int[],
+  match_threshold float default 0.7,
+  match_count int default 5,
+  filter_category text default null
+)
+returns table (
+  id bigint,
+  content text,
+  title text,
+  file_name text,
+  category text,
+  section_title text,
+  chunk_index int,
+  total_chunks int,
+  similarity float,
+  created_at timestamptz
+)
+language sql stable
+as $$
+  select
+    tc.id,
+    tc.content,
+    tc.title,
+    tc.file_name,
+    tc.category,
+    tc.section_title,
+    tc.chunk_index,
+    tc.total_chunks,
+    1 - (tc.embedding <=> query_embedding) as similarity,
+    tc.created_at
+  from unnest(candidate_file_names, candidate_chunk_indexes) as c(file_name, chunk_index)
+  join travel_content tc
+    on tc.file_name = c.file_name and tc.chunk_index = c.chunk_index
+  where
+    (filter_category is null or tc.category = filter_category)
+    and 1 - (tc.embedding <=> query_embedding) > match_threshold
+  order by tc.embedding <=> query_embedding
+  limit match_count;
+$$;
+"""
+
+def match_candidates_sql(storage: str = EMBEDDING_STORAGE) -> str:
+    """MATCH_CANDIDATES_SQL for the configured embedding column type"""
+
+    if storage == "vector":
+        return MATCH_CANDIDATES_SQL
+    return MATCH_CANDIDATES_SQL.replace(
+        "tc.embedding <=> query_embedding",
+        f"tc.embedding <=> query_embedding::{storage}({EMBEDDING_DIMENSION})"
+    )
+
+def match_filtered_sql(storage: str = EMBEDDING_STORAGE) -> str:
+    """MATCH_FILTERED_SQL for the configured embedding column type"""
+
+    if storage == "vector":
+        return MATCH_FILTERED_SQL
+    cast = f"::{storage}({EMBEDDING_DIMENSION})"
+    return (MATCH_FILTERED_SQL
+            .replace("tc.embedding <=> $1", f"tc.embedding <=> $1{cast}")
+            .replace("tc.embedding <=> query_embedding", f"tc.embedding <=> query_embedding{cast}"))
 
 def setup_database():
     """Initialize database tables and functions"""
     
     # Create Supabase client
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    supabase: Client = supabase_client()
     
     # Enable pgvector extension
     try:
@@ -43,6 +349,8 @@ def setup_database():
       chunk_index int not null,
       total_chunks int not null,
       parent_chunk_id bigint,
+      content_hash text,
+      duplicate_sources jsonb,
       
       -- 최신성 관리
       last_updated timestamptz default now(),
@@ -70,9 +378,27 @@ def setup_database():
     except Exception as e:
         print(f"Table creation error: {e}")
     
+    # Add natural key for idempotent uploads
+    try:
+        supabase.rpc("sql", {"query": NATURAL_KEY_SQL}).execute()
+        print("✅ travel_content natural key created")
+    except Exception as e:
+        print(f"Natural key error (remove duplicate rows first): {e}")
+    
+    try:
+        supabase.rpc("sql", {"query": DUPLICATE_SOURCES_SQL}).execute()
+        print("✅ duplicate_sources column and store_duplicate_sources function created")
+    except Exception as e:
+        print(f"duplicate_sources column error: {e}")
+    
+    try:
+        supabase.rpc("sql", {"query": FILTER_COLUMNS_SQL}).execute()
+        print("✅ source_type / post_month filter columns created")
+    except Exception as e:
+        print(f"Filter columns error: {e}")
+    
     # Create indexes
     indexes = [
-        "create index if not exists travel_content_embedding_idx on travel_content using hnsw (embedding vector_cosine_ops);",
         "create index if not exists idx_category on travel_content(category);",
         "create index if not exists idx_file_name on travel_content(file_name);",
         "create index if not exists idx_last_updated on travel_content(last_updated desc);",
@@ -80,55 +406,62 @@ def setup_database():
         "create index if not exists idx_parent_chunk on travel_content(parent_chunk_id);"
     ]
     
+    if not compact_storage_enabled():
+        indexes.insert(0, vector_index_sql())
+        # Per-category / source_type graphs for selective filters
+        indexes += partial_vector_index_sql()
+    
     for index_sql in indexes:
-        supabase.rpc("sql", {"query": index_sql})
-    
-    # Create search function
-    search_function_sql = """
-    create or replace function match_travel_content (
-      query_embedding vector(1536),
-      match_threshold float default 0.7,
-      match_count int default 5,
-      filter_category text default null
-    )
-    returns table (
-      id bigint,
-      content text,
-      title text,
-      file_name text,
-      category text,
-      section_title text,
-      chunk_index int,
-      total_chunks int,
-      similarity float,
-      created_at timestamptz
-    )
-    language plpgsql
-    as $$
-    begin
-      return query
-      select
-        tc.id,
-        tc.content,
-        tc.title,
-        tc.file_name,
-        tc.category,
-        tc.section_title,
-        tc.chunk_index,
-        tc.total_chunks,
-        1 - (tc.embedding <=> query_embedding) as similarity,
-        tc.created_at
-      from travel_content tc
-      where 
-        (filter_category is null or tc.category = filter_category)
-        and 1 - (tc.embedding <=> query_embedding) > match_threshold
-      order by tc.embedding <=> query_embedding
-      limit match_count;
-    end;
-    $$;
-    """
+        try:
+            supabase.rpc("sql", {"query": index_sql}).execute()
+        except Exception as e:
+            print(f"Index error ({index_sql}): {e}")
+    print(f"✅ Indexes created (HNSW m={HNSW_M}, ef_construction={HNSW_EF_CONSTRUCTION})")
+    
+    # Create search function (the old 4-argument signature is dropped first)
+    try:
+        supabase.rpc("sql", {"query": MATCH_TRAVEL_CONTENT_SQL}).execute()
+        print("✅ match_travel_content function created")
+    except Exception as e:
+        print(f"match_travel_content function error: {e}")
+    
+    # Compact embedding storage: coarse index + full-precision rerank
+    if compact_storage_enabled():
+        try:
+            supabase.rpc("sql", {"query": compact_index_sql()}).execute()
+            print(f"✅ Compact embeddings: {EMBEDDING_STORAGE} column, "
+                  f"{EMBEDDING_INDEX}({EMBEDDING_INDEX_DIMENSIONS}) index with rerank")
+        except Exception as e:
+            print(f"Compact embedding storage error (needs pgvector >= 0.7): {e}")
+    
+    # Create filtered search function (category, source_type, tags, location, post_month)
+    try:
+        supabase.rpc("sql", {"query": match_filtered_sql()}).execute()
+        print("✅ match_travel_content_filtered function created")
+    except Exception as e:
+        print(f"match_travel_content_filtered function error: {e}")
+    
+    # Create candidate search function for hybrid retrieval
+    try:
+        supabase.rpc("sql", {"query": match_candidates_sql()}).execute()
+        print("✅ match_travel_content_candidates function created")
+    except Exception as e:
+        print(f"match_travel_content_candidates function error: {e}")
+    
+    # Create bulk parent-linking function
+    try:
+        supabase.rpc("sql", {"query": LINK_PARENT_CHUNKS_SQL}).execute()
+        print("✅ link_parent_chunks function created")
+    except Exception as e:
+        print(f"link_parent_chunks function error: {e}")
     
-    supabase.rpc("sql", {"query": search_function_sql})
+    # Work queue for distributed ingest workers on several hosts
+    if QUEUE_BACKEND == "postgres":
+        try:
+            supabase.rpc("sql", {"query": INGEST_QUEUE_SQL}).execute()
+            print("✅ ingest_queue table and lease functions created")
+        except Exception as e:
+            print(f"ingest_queue error: {e}")
     
     print("Database setup completed successfully!")
 
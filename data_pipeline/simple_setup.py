@@ -1,14 +1,21 @@
 """
 Simple database setup using direct table creation
 """
-from supabase import create_client, Client
-from config import SUPABASE_URL, SUPABASE_KEY
+from supabase import Client
+from clients import supabase_client
+from setup_db import (
+    NATURAL_KEY_SQL, DUPLICATE_SOURCES_SQL, LINK_PARENT_CHUNKS_SQL, MATCH_TRAVEL_CONTENT_SQL,
+    FILTER_COLUMNS_SQL, match_candidates_sql, match_filtered_sql,
+)
+from work_queue import INGEST_QUEUE_SQL
+from config import QUEUE_BACKEND
+from compact_storage import compact_index_sql, compact_storage_enabled, vector_index_sql, partial_vector_index_sql
 
 def simple_setup():
     """Create table using direct insertion"""
     
     # Create Supabase client
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    supabase: Client = supabase_client()
     
     try:
         # Test by creating a simple table first
@@ -44,6 +51,8 @@ create table if not exists travel_content (
   chunk_index int not null,
   total_chunks int not null,
   parent_chunk_id bigint,
+  content_hash text,
+  duplicate_sources jsonb,
   
   -- 최신성 관리
   last_updated timestamptz default now(),
@@ -59,54 +68,34 @@ create table if not exists travel_content (
 );
 
 -- Create indexes
-create index if not exists travel_content_embedding_idx on travel_content using hnsw (embedding vector_cosine_ops);
 create index if not exists idx_category on travel_content(category);
 create index if not exists idx_file_name on travel_content(file_name);
 create index if not exists idx_last_updated on travel_content(last_updated desc);
-
--- Create search function
-create or replace function match_travel_content (
-  query_embedding vector(1536),
-  match_threshold float default 0.7,
-  match_count int default 5,
-  filter_category text default null
-)
-returns table (
-  id bigint,
-  content text,
-  title text,
-  file_name text,
-  category text,
-  section_title text,
-  chunk_index int,
-  total_chunks int,
-  similarity float,
-  created_at timestamptz
-)
-language plpgsql
-as $$
-begin
-  return query
-  select
-    tc.id,
-    tc.content,
-    tc.title,
-    tc.file_name,
-    tc.category,
-    tc.section_title,
-    tc.chunk_index,
-    tc.total_chunks,
-    1 - (tc.embedding <=> query_embedding) as similarity,
-    tc.created_at
-  from travel_content tc
-  where 
-    (filter_category is null or tc.category = filter_category)
-    and 1 - (tc.embedding <=> query_embedding) > match_threshold
-  order by tc.embedding <=> query_embedding
-  limit match_count;
-end;
-$$;
         """)
+        if not compact_storage_enabled():
+            print(vector_index_sql())
+        print("\n-- Create search function")
+        print(MATCH_TRAVEL_CONTENT_SQL)
+        print("-- Natural key for idempotent uploads")
+        print(NATURAL_KEY_SQL)
+        print("-- Duplicate references for collapsed chunks")
+        print(DUPLICATE_SOURCES_SQL)
+        print("-- Create bulk parent-linking function")
+        print(LINK_PARENT_CHUNKS_SQL)
+        print("-- Source type / date filter columns")
+        print(FILTER_COLUMNS_SQL)
+        for index_sql in partial_vector_index_sql():
+            print(index_sql)
+        print("-- Create filtered search function")
+        print(match_filtered_sql())
+        print("-- Create candidate search function for hybrid retrieval")
+        print(match_candidates_sql())
+        if QUEUE_BACKEND == "postgres":
+            print("-- Work queue for distributed ingest workers")
+            print(INGEST_QUEUE_SQL)
+        if compact_storage_enabled():
+            print("-- Compact embedding storage (coarse index + full-precision rerank)")
+            print(compact_index_sql())
         return False
 
 if __name__ == "__main__":
@@ -0,0 +1,186 @@
+"""
+Ingest run spool for Swiss Travel RAG
+Durable per-run state (stage checkpoints, chunks, embeddings) so an interrupted run resumes without re-embedding
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from embedding_cache import text_hash
+from embedding_store import to_float32
+from config import SPOOL_DIR, EMBEDDING_DIMENSION
+
+# Stages in run order; a resumed run skips every completed one
+STAGES = ("plan", "chunk", "embed", "upload", "finalize")
+
+
+def chunk_key(chunk: Dict) -> str:
+    """Natural key of a chunk (same identity as the table's upsert key)"""
+    return f"{chunk['file_name']}\t{chunk['chunk_index']}\t{text_hash(chunk['content'])}"
+
+
+class IngestSpool:
+    def __init__(self, run_id: str, root: str = SPOOL_DIR, dimension: int = EMBEDDING_DIMENSION):
+        """
+        Args:
+            run_id: Ingest run id (the metrics run id)
+            root: Directory holding one subdirectory per run
+            dimension: Embedding dimension of the float32 sidecar
+        """
+
+        self.run_id = run_id
+        self.path = Path(root) / run_id
+        self.dimension = dimension
+        self.row_bytes = dimension * 4
+        self.lock = threading.Lock()
+
+        self.state_path = self.path / 'state.json'
+        self.chunks_path = self.path / 'chunks.jsonl'
+        self.index_path = self.path / 'embedded.jsonl'
+        self.vectors_path = self.path / 'embeddings.f32'
+
+        self.state = {'run_id': run_id, 'created_at': time.time(), 'stages': {}}
+        if self.state_path.exists():
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+
+        # chunk key -> row in the sidecar
+        self.rows: Dict[str, int] = {}
+        self.row_count = 0
+        self._recover()
+
+    @classmethod
+    def open(cls, run_id: str, root: str = SPOOL_DIR) -> "IngestSpool":
+        """Open an existing run for --resume"""
+
+        if not (Path(root) / run_id / 'state.json').exists():
+            raise FileNotFoundError(f"No spooled run {run_id} in {root}")
+        return cls(run_id, root)
+
+    # Stage checkpoints
+
+    def completed(self, stage: str) -> bool:
+        return stage in self.state['stages']
+
+    def checkpoint(self, stage: str, **info):
+        """Mark a stage as completed, with whatever the next stages need to resume"""
+
+        self.state['stages'][stage] = {'completed_at': time.time(), **info}
+        self._write_state()
+
+    def stage_info(self, stage: str) -> Dict:
+        return self.state['stages'].get(stage, {})
+
+    def _write_state(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+
+    # Chunks (written once, after chunking and dedup)
+
+    def save_chunks(self, chunks: List[Dict]):
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.chunks_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for chunk in chunks:
+                record = {k: v for k, v in chunk.items() if k not in ('embedding', 'embedding_row')}
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.chunks_path)
+
+    def load_chunks(self) -> List[Dict]:
+        with open(self.chunks_path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    # Embeddings (append-only: float32 sidecar first, then the index line pointing at it)
+
+    def _recover(self):
+        """Load spooled rows, dropping a torn tail left by a crash mid-append"""
+
+        if not self.index_path.exists():
+            # A crash between the sidecar write and the first index line leaves
+            # orphaned vectors; later rows would be misaddressed after them
+            if self.vectors_path.exists():
+                with open(self.vectors_path, 'r+b') as f:
+                    f.truncate(0)
+            return
+
+        stored_rows = self.vectors_path.stat().st_size // self.row_bytes if self.vectors_path.exists() else 0
+        valid_bytes = 0
+        with open(self.index_path, 'rb') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b'\n') or entry['row'] >= stored_rows:
+                    break
+                self.rows[entry['key']] = entry['row']
+                self.row_count = max(self.row_count, entry['row'] + 1)
+                valid_bytes += len(line)
+
+        with open(self.index_path, 'r+b') as f:
+            f.truncate(valid_bytes)
+        if self.vectors_path.exists():
+            with open(self.vectors_path, 'r+b') as f:
+                f.truncate(self.row_count * self.row_bytes)
+
+    def append_embeddings(self, chunks: List[Dict], embeddings: List[Optional[object]]):
+        """Durably record the embeddings of a batch (failed ones are left for the next attempt)"""
+
+        pairs = [(chunk_key(chunk), to_float32(embedding))
+                 for chunk, embedding in zip(chunks, embeddings) if embedding is not None]
+        if not pairs:
+            return
+
+        with self.lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            first_row = self.row_count
+
+            with open(self.vectors_path, 'ab') as f:
+                f.write(np.vstack([vector for _, vector in pairs]).astype(np.float32).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                for offset, (key, _) in enumerate(pairs):
+                    f.write(json.dumps({'key': key, 'row': first_row + offset}, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+            for offset, (key, _) in enumerate(pairs):
+                self.rows[key] = first_row + offset
+            self.row_count += len(pairs)
+
+    def has_embedding(self, chunk: Dict) -> bool:
+        return chunk_key(chunk) in self.rows
+
+    def get_many(self, chunks: List[Dict]) -> List[Optional[np.ndarray]]:
+        """Spooled embeddings aligned with chunks (None where not spooled)"""
+
+        rows = [self.rows.get(chunk_key(chunk)) for chunk in chunks]
+        if all(row is None for row in rows):
+            return rows
+        with self.lock:
+            # Only the requested rows are read from the sidecar
+            vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r',
+                                shape=(self.row_count, self.dimension))
+            return [None if row is None else np.array(vectors[row]) for row in rows]
+
+    def embedded_count(self) -> int:
+        return len(self.rows)
+
+    def finish(self):
+        """Drop the bulky spool files of a finished run (state.json stays as a record)"""
+
+        for path in (self.chunks_path, self.index_path, self.vectors_path):
+            if path.exists():
+                path.unlink()
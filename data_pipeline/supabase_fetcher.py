@@ -0,0 +1,190 @@
+"""
+Community post fetcher for Swiss Travel RAG
+Streams swissfriends posts with their bodies and comments using keyset pagination and bulk loads
+"""
+import argparse
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+from supabase import Client
+from metrics import current_run
+from clients import supabase_client
+from config import (
+    FETCH_PAGE_SIZE, FETCH_COMMENT_PAGE_SIZE, FETCH_CONCURRENCY,
+)
+
+POSTS_TABLE = "swissfriends_content_all"
+CONTENTS_TABLE = "swissfriends_post_contents"
+COMMENTS_TABLE = "swissfriends_post_comments"
+
+POST_COLUMNS = "id, category, title, author, date, view_count, comments, url, post_month"
+
+
+class SupabaseFetcher:
+    def __init__(self, client: Client = None, page_size: int = FETCH_PAGE_SIZE,
+                 comment_page_size: int = FETCH_COMMENT_PAGE_SIZE, concurrency: int = FETCH_CONCURRENCY):
+        """
+        Args:
+            client: Supabase client (created if omitted)
+            page_size: Posts per page (one request each for metadata and bodies)
+            comment_page_size: Comment rows per request (PostgREST caps responses at max-rows)
+            concurrency: Pages whose bodies and comments are loaded at the same time
+        """
+
+        self.client: Client = client or supabase_client()
+        self.page_size = page_size
+        self.comment_page_size = comment_page_size
+        self.concurrency = max(1, concurrency)
+
+    def _execute(self, query) -> List[Dict]:
+        response = query.execute()
+        rows = response.data or []
+        current_run().add('fetch', api_calls=1, items=len(rows))
+        return rows
+
+    def iter_post_pages(self, category: Optional[str] = None, after_id: int = 0,
+                        limit: Optional[int] = None, until_id: Optional[int] = None) -> Iterator[List[Dict]]:
+        """
+        Post metadata in id order, one page per request (keyset pagination on id)
+
+        Args:
+            category: Only posts of this category
+            after_id: Resume after this post id
+            limit: Stop after this many posts
+            until_id: Stop after this post id (a fixed id range, e.g. one queue work unit)
+        """
+
+        last_id = after_id
+        remaining = limit
+
+        while remaining is None or remaining > 0:
+            page_size = self.page_size if remaining is None else min(self.page_size, remaining)
+            query = self.client.table(POSTS_TABLE).select(POST_COLUMNS).gt('id', last_id)
+            if category is not None:
+                query = query.eq('category', category)
+            if until_id is not None:
+                query = query.lte('id', until_id)
+
+            with current_run().stage('fetch'):
+                page = self._execute(query.order('id').limit(page_size))
+            if not page:
+                return
+
+            yield page
+            last_id = page[-1]['id']
+            if remaining is not None:
+                remaining -= len(page)
+            if len(page) < page_size:
+                return
+
+    def fetch_contents(self, post_ids: List[int]) -> Dict[int, Dict]:
+        """Bodies of the given posts in one request, keyed by post id"""
+
+        if not post_ids:
+            return {}
+        rows = self._execute(self.client.table(CONTENTS_TABLE).select('id, title, content, updated_at')
+                             .in_('id', post_ids))
+        return {row['id']: row for row in rows}
+
+    def fetch_comments(self, post_ids: List[int]) -> Dict[int, List[Dict]]:
+        """
+        Comments of the given posts, keyed by post id and sorted by comment_order
+
+        One request per comment_page_size rows (keyset on comment id) instead
+        of one request per post.
+        """
+
+        comments = defaultdict(list)
+        if not post_ids:
+            return comments
+
+        last_id = 0
+        while True:
+            page = self._execute(self.client.table(COMMENTS_TABLE).select('*')
+                                 .in_('post_id', post_ids).gt('id', last_id)
+                                 .order('id').limit(self.comment_page_size))
+            for row in page:
+                comments[row['post_id']].append(row)
+            if len(page) < self.comment_page_size:
+                break
+            last_id = page[-1]['id']
+
+        for rows in comments.values():
+            rows.sort(key=lambda row: (row.get('comment_order') is None, row.get('comment_order'), row['id']))
+        return comments
+
+    def _load_page(self, page: List[Dict]) -> List[Tuple[Dict, List[Dict]]]:
+        """Join one metadata page with its bodies and comments"""
+
+        with current_run().stage('fetch'):
+            post_ids = [post['id'] for post in page]
+            contents = self.fetch_contents(post_ids)
+            comments = self.fetch_comments(post_ids)
+
+        bundles = []
+        for post in page:
+            body = contents.get(post['id'], {})
+            post = dict(post)
+            post['comment_count'] = post.pop('comments', None)
+            post['content'] = body.get('content') or ''
+            post['title'] = post.get('title') or body.get('title') or ''
+            post['updated_at'] = body.get('updated_at')
+            bundles.append((post, comments.get(post['id'], [])))
+        return bundles
+
+    def iter_posts_with_comments(self, category: Optional[str] = None, after_id: int = 0,
+                                 limit: Optional[int] = None,
+                                 until_id: Optional[int] = None) -> Iterator[Tuple[Dict, List[Dict]]]:
+        """
+        Stream (post, comments) bundles in post id order
+
+        Metadata pages are read sequentially (each page's last id starts the
+        next one); bodies and comments of up to `concurrency` pages are loaded
+        in the background while earlier bundles are consumed.
+
+        Args:
+            category: Only posts of this category
+            after_id: Resume after this post id
+            limit: Stop after this many posts
+            until_id: Stop after this post id
+
+        Yields:
+            (post, comments): post metadata merged with its body ('content',
+            'comment_count', ...) and its comments in comment order
+        """
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            in_flight = deque()
+
+            for page in self.iter_post_pages(category, after_id, limit, until_id):
+                in_flight.append(executor.submit(self._load_page, page))
+                if len(in_flight) >= self.concurrency:
+                    yield from in_flight.popleft().result()
+
+            while in_flight:
+                yield from in_flight.popleft().result()
+
+    def fetch_all_posts_with_comments(self, category: Optional[str] = None) -> List[Tuple[Dict, List[Dict]]]:
+        """Every (post, comments) bundle as a list (prefer the iterator for large pulls)"""
+        return list(self.iter_posts_with_comments(category))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Fetch community posts with comments")
+    arg_parser.add_argument("--category")
+    arg_parser.add_argument("--limit", type=int)
+    arg_parser.add_argument("--page-size", type=int, default=FETCH_PAGE_SIZE)
+    arg_parser.add_argument("--concurrency", type=int, default=FETCH_CONCURRENCY)
+    args = arg_parser.parse_args()
+
+    fetcher = SupabaseFetcher(page_size=args.page_size, concurrency=args.concurrency)
+    start = time.perf_counter()
+    posts = comment_count = 0
+    for post, comments in fetcher.iter_posts_with_comments(args.category, limit=args.limit):
+        posts += 1
+        comment_count += len(comments)
+
+    elapsed = time.perf_counter() - start
+    requests = current_run().report()['stages'].get('fetch', {}).get('api_calls', 0)
+    print(f"✅ Fetched {posts} posts and {comment_count} comments in {requests} requests ({elapsed:.1f}s)")
@@ -0,0 +1,49 @@
+"""
+Chunk deduplication tests for Swiss Travel RAG
+Checks collapse bookkeeping and that kept chunks are not retained after filtering
+"""
+import gc
+import weakref
+from dedup import ChunkDeduplicator
+
+
+class Chunk(dict):
+    """dict that can be weakly referenced"""
+
+
+def make_chunk(file_name: str, index: int, content: str) -> Chunk:
+    return Chunk(file_name=file_name, chunk_index=index, section_title='Zermatt', content=content,
+                 token_count=10)
+
+
+TEXT = "Der Gornergrat ist mit der Zahnradbahn ab Zermatt in 33 Minuten erreichbar. " * 3
+
+
+def test_does_not_retain_returned_chunks():
+    deduplicator = ChunkDeduplicator(policy="collapse")
+    chunks = [make_chunk('a.md', i, " ".join(str(i * 1000 + word) for word in range(60))) for i in range(5)]
+    kept = deduplicator.filter(chunks)
+    assert len(kept) == len(chunks)
+
+    refs = [weakref.ref(chunk) for chunk in chunks]
+    # As the streaming pipeline does once a batch is uploaded
+    for chunk in kept:
+        chunk['embedding'] = bytearray(1 << 16)
+    del chunks, kept, chunk
+    gc.collect()
+
+    assert all(ref() is None for ref in refs)
+
+
+def test_collapse_records_duplicates():
+    deduplicator = ChunkDeduplicator(policy="collapse")
+    first = deduplicator.filter([make_chunk('a.md', 0, TEXT), make_chunk('b.md', 3, TEXT)])
+    assert len(first) == 1
+    assert first[0]['duplicate_sources'] == [{'file_name': 'b.md', 'chunk_index': 3, 'section_title': 'Zermatt'}]
+
+    # A duplicate in a later call (another streamed file) is only recorded for collapsed()
+    assert deduplicator.filter([make_chunk('c.md', 1, TEXT)]) == []
+    [record] = deduplicator.collapsed()
+    assert (record['file_name'], record['chunk_index']) == ('a.md', 0)
+    assert [source['file_name'] for source in record['duplicate_sources']] == ['b.md', 'c.md']
+    assert deduplicator.dependencies == {'b.md': {'a.md'}, 'c.md': {'a.md'}}
@@ -0,0 +1,39 @@
+"""
+Markdown parser tests for Swiss Travel RAG
+Checks the parser against the output of its earlier implementations
+"""
+import re
+import pytest
+from markdown_parser import MarkdownParser
+
+
+def legacy_clean_content(content: str) -> str:
+    """clean_content as it was before sections were streamed"""
+
+    content = re.sub(r'\n\s*\n\s*\n', '\n\n', content)
+    content = re.sub(r'!\[([^\]]*)\]\([^)]+\)', r'\1', content)
+    content = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', content)
+    content = re.sub(r'```[^\n]*\n', '', content)
+    content = re.sub(r'```', '', content)
+    content = re.sub(r' {2,}', ' ', content)
+    return content.strip()
+
+
+@pytest.mark.parametrize("content", [
+    "[![alt](img.png)](http://x)",
+    "```py\ncode\n```\n\n\n\nx",
+    "text  with   spaces\n\n\n\n![](a.png) and [a link](http://example.com)",
+    "```\n[not a link](x)\n```\n```\n",
+    "  leading\n \n \n trailing  ",
+    "취리히 [SBB](https://sbb.ch)  안내\n\n\n\n![지도](map.png)",
+])
+def test_clean_content_matches_legacy(content):
+    assert MarkdownParser().clean_content(content) == legacy_clean_content(content)
+
+
+def test_clean_content_nested_image_link():
+    assert MarkdownParser().clean_content("[![alt](img.png)](http://x)") == "alt"
+
+
+def test_clean_content_blank_lines_after_code_block():
+    assert MarkdownParser().clean_content("```py\ncode\n```\n\n\n\nx") == "code\n\nx"
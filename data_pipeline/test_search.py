@@ -2,58 +2,59 @@
 Search testing script for Swiss Travel RAG
 Tests vector search functionality
 """
-from supabase import create_client, Client
-from embedder import EmbeddingGenerator
-from config import SUPABASE_URL, SUPABASE_KEY
+import sys
+import time
+from retriever import Retriever
 
-def test_search(query: str, top_k: int = 3):
-    """Test vector search with a query"""
+def test_search(query: str, top_k: int = 3, retriever: Retriever = None,
+                filter_category: str = None, filters: dict = None):
+    """Test vector search with a query (optionally filtered by category / source_type / tags / ...)"""
     
-    # Initialize components
-    embedder = EmbeddingGenerator()
-    client: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    # Initialize components (pass a shared retriever to reuse its query cache)
+    retriever = retriever or Retriever()
     
     print(f"🔍 Searching for: '{query}'")
     
     try:
-        # Generate query embedding
-        query_embedding = embedder.generate_embedding(query)
-        if not query_embedding:
-            print("❌ Failed to generate query embedding")
-            return
-        
-        # Search database
-        response = client.rpc('match_travel_content', {
-            'query_embedding': query_embedding,
-            'match_threshold': 0.7,
-            'match_count': top_k
-        }).execute()
-        
-        if not response.data:
-            print("❌ No results found")
-            return
-        
-        # Display results
-        print(f"\n📊 Found {len(response.data)} results:")
-        print("-" * 80)
-        
-        for i, result in enumerate(response.data, 1):
-            similarity = result['similarity']
-            title = result['title']
-            section = result['section_title'] or "메인"
-            file_name = result['file_name']
-            content_preview = result['content'][:200] + "..." if len(result['content']) > 200 else result['content']
-            
-            print(f"{i}. [{similarity:.3f}] {title} > {section}")
-            print(f"   📄 {file_name}")
-            print(f"   💬 {content_preview}")
-            print()
+        # Embed the query and search the database
+        results = retriever.search(query, match_threshold=0.7, match_count=top_k,
+                                   filter_category=filter_category, filters=filters)
+        show_results(results)
         
     except Exception as e:
         print(f"❌ Search error: {e}")
 
-def test_multiple_queries():
-    """Test with multiple sample queries"""
+def show_results(results):
+    """Print one query's results"""
+    
+    if results is None:
+        print("❌ Failed to generate query embedding")
+        return
+    
+    if not results:
+        print("❌ No results found")
+        return
+    
+    # Display results
+    print(f"\n📊 Found {len(results)} results:")
+    print("-" * 80)
+    
+    for i, result in enumerate(results, 1):
+        similarity = result['similarity']
+        title = result['title']
+        section = result['section_title'] or "메인"
+        file_name = result['file_name']
+        content_preview = result['content'][:200] + "..." if len(result['content']) > 200 else result['content']
+        
+        print(f"{i}. [{similarity:.3f}] {title} > {section}")
+        print(f"   📄 {file_name}")
+        print(f"   💬 {content_preview}")
+        print()
+
+def test_multiple_queries(retriever: Retriever = None):
+    """Test with multiple sample queries (one embeddings call, concurrent searches)"""
+    
+    retriever = retriever or Retriever()
     
     test_queries = [
         "리기산 가는 방법",
@@ -64,15 +65,26 @@ def test_multiple_queries():
         "인터라켄 숙박"
     ]
     
-    for query in test_queries:
-        test_search(query, top_k=2)
+    start = time.perf_counter()
+    try:
+        batch_results = retriever.search_many(test_queries, match_threshold=0.7, match_count=2)
+    except Exception as e:
+        print(f"❌ Search error: {e}")
+        return
+    elapsed = time.perf_counter() - start
+    
+    for query, results in zip(test_queries, batch_results):
+        print(f"🔍 Searching for: '{query}'")
+        show_results(results)
         print("=" * 80)
+    
+    print(f"⏱️ {len(test_queries)} queries in {elapsed * 1000:.0f}ms")
+    if retriever.cache:
+        stats = retriever.cache.stats()
+        print(f"Query cache: {stats['exact_hits']} exact hits, {stats['semantic_hits']} semantic hits, "
+              f"{stats['misses']} misses ({stats['hit_rate']:.1%} hit rate)")
 
 if __name__ == "__main__":
-    # Test single query
-    query = input("Enter search query (or press Enter for multiple tests): ").strip()
-    
-    if query:
-        test_search(query, top_k=5)
-    else:
-        test_multiple_queries()
\ No newline at end of file
+    # Same as `python cli.py search ...`
+    from cli import main
+    sys.exit(main(["search", *sys.argv[1:]]))
@@ -0,0 +1,42 @@
+"""
+Ingest spool tests for Swiss Travel RAG
+Checks that a run recovered after a crash serves the embeddings it spooled
+"""
+import numpy as np
+from spool import IngestSpool
+
+DIMENSION = 4
+
+
+def make_chunk(index: int) -> dict:
+    return {'file_name': 'a.md', 'chunk_index': index, 'content': f"chunk {index}"}
+
+
+def test_crash_before_first_index_write(tmp_path):
+    spool = IngestSpool('run', str(tmp_path), DIMENSION)
+    spool.path.mkdir(parents=True)
+    # Sidecar rows written, then the process died before embedded.jsonl existed
+    spool.vectors_path.write_bytes(np.ones((2, DIMENSION), dtype=np.float32).tobytes())
+
+    spool = IngestSpool('run', str(tmp_path), DIMENSION)
+    chunk = make_chunk(0)
+    spool.append_embeddings([chunk], [np.full(DIMENSION, 7, dtype=np.float32)])
+
+    reopened = IngestSpool('run', str(tmp_path), DIMENSION)
+    assert reopened.get_many([chunk])[0].tolist() == [7.0] * DIMENSION
+
+
+def test_crash_between_sidecar_and_index_append(tmp_path):
+    spool = IngestSpool('run', str(tmp_path), DIMENSION)
+    first, second = make_chunk(0), make_chunk(1)
+    spool.append_embeddings([first], [np.full(DIMENSION, 3, dtype=np.float32)])
+    # A later batch reached the sidecar but not the index
+    with open(spool.vectors_path, 'ab') as f:
+        f.write(np.ones((2, DIMENSION), dtype=np.float32).tobytes())
+
+    spool = IngestSpool('run', str(tmp_path), DIMENSION)
+    spool.append_embeddings([second], [np.full(DIMENSION, 7, dtype=np.float32)])
+
+    reopened = IngestSpool('run', str(tmp_path), DIMENSION)
+    assert [vector.tolist() for vector in reopened.get_many([first, second])] == \
+        [[3.0] * DIMENSION, [7.0] * DIMENSION]
@@ -0,0 +1,17 @@
+"""
+Upload journal tests for Swiss Travel RAG
+Checks that deleting a file's rows forgets only the batches that held them
+"""
+from upload_journal import UploadJournal
+
+
+def test_forget_files_keeps_other_sessions(tmp_path):
+    journal = UploadJournal(str(tmp_path / 'journal.db'))
+    journal.mark_done('first', 'a-and-b', 2, ['a.md', 'b.md'])
+    journal.mark_done('first', 'c', 1, ['c.md'])
+    journal.mark_done('second', 'd', 1, ['d.md'])
+
+    journal.forget_files(['a.md'])
+
+    assert journal.done_batches('first') == {'c'}
+    assert journal.done_batches('second') == {'d'}
@@ -0,0 +1,203 @@
+"""
+Single-pass token-offset chunker for Swiss Travel RAG
+Encodes each text once and cuts chunks by slicing the token array
+"""
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import TYPE_CHECKING, List, Tuple
+
+if TYPE_CHECKING:
+    import tiktoken
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", ". ", "! ", "? ", " ", ""]
+
+
+class TokenOffsetSplitter:
+    """
+    Recursive separator splitter that works in token-offset space
+
+    Mirrors RecursiveCharacterTextSplitter (separators kept at the start of the
+    following piece, pieces merged greedily with a token overlap window), but
+    token counts are differences of token offsets instead of re-encodings of
+    every candidate substring.
+    """
+
+    def __init__(self, encoding: "tiktoken.Encoding", chunk_size: int, chunk_overlap: int,
+                 separators: List[str] = None):
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or DEFAULT_SEPARATORS
+        self._token_lengths = {}  # token id -> byte length, shared across texts
+
+    def split_text(self, text: str) -> List[Tuple[str, int]]:
+        """
+        Split text into chunks
+
+        Args:
+            text: Text to split
+
+        Returns:
+            List of (chunk_text, token_count) tuples
+        """
+
+        tokens = self.encoding.encode(text)
+        if not tokens:
+            return []
+
+        # Character offset where each token starts (plus end of text)
+        starts = self._token_char_starts(text, tokens)
+        token_total = len(tokens)
+
+        # Token boundaries per separator level, computed at most once per text
+        boundaries = _LazyBoundaries(text, self.separators, starts, token_total)
+
+        ranges = self._split_range(0, token_total, 0, boundaries)
+
+        chunks = []
+        for lo, hi in ranges:
+            # Drop whitespace-only edge tokens so counts match the stripped chunk
+            while lo < hi and text[starts[lo]:starts[lo + 1]].isspace():
+                lo += 1
+            while hi > lo and text[starts[hi - 1]:starts[hi]].isspace():
+                hi -= 1
+            if lo < hi:
+                chunks.append((text[starts[lo]:starts[hi]], hi - lo))
+        return chunks
+
+    def _token_char_starts(self, text: str, tokens: List[int]) -> List[int]:
+        """
+        Map each token to the character where it starts
+
+        Equivalent to Encoding.decode_with_offsets (a token starting inside a
+        multi-byte character maps to that character), but uses cached token
+        byte lengths instead of decoding every token.
+        """
+
+        lengths = self._token_lengths
+        byte_starts = []
+        position = 0
+        for token in tokens:
+            byte_starts.append(position)
+            length = lengths.get(token)
+            if length is None:
+                length = lengths[token] = len(self.encoding.decode_single_token_bytes(token))
+            position += length
+
+        if position == len(text):
+            # Pure ASCII: byte offsets are character offsets
+            return byte_starts + [len(text)]
+
+        byte_to_char = []
+        for index, char in enumerate(text):
+            code = ord(char)
+            width = 1 if code < 0x80 else 2 if code < 0x800 else 3 if code < 0x10000 else 4
+            byte_to_char.extend([index] * width)
+
+        return [byte_to_char[start] for start in byte_starts] + [len(text)]
+
+    def _split_range(self, lo: int, hi: int, level: int, boundaries: "_LazyBoundaries") -> List[Tuple[int, int]]:
+        """Recursively split the token range [lo, hi) into chunk ranges"""
+
+        # Pick the first separator level that occurs inside the range
+        cuts = []
+        while level < len(self.separators):
+            if not self.separators[level]:
+                break
+            level_bounds = boundaries[level]
+            cuts = level_bounds[bisect_right(level_bounds, lo):bisect_left(level_bounds, hi)]
+            if cuts:
+                break
+            level += 1
+
+        if not cuts:
+            return self._hard_split(lo, hi)
+
+        edges = [lo] + cuts + [hi]
+        pieces = list(zip(edges[:-1], edges[1:]))
+
+        results = []
+        good: List[Tuple[int, int]] = []
+        for piece_lo, piece_hi in pieces:
+            if piece_hi - piece_lo < self.chunk_size:
+                good.append((piece_lo, piece_hi))
+                continue
+
+            if good:
+                results.extend(self._merge(good))
+                good = []
+            results.extend(self._split_range(piece_lo, piece_hi, level + 1, boundaries))
+
+        if good:
+            results.extend(self._merge(good))
+        return results
+
+    def _merge(self, pieces: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Greedily merge adjacent pieces into chunks, keeping an overlap window"""
+
+        merged = []
+        window = deque()
+        total = 0
+
+        for piece_lo, piece_hi in pieces:
+            length = piece_hi - piece_lo
+            if window and total + length > self.chunk_size:
+                merged.append((window[0][0], window[-1][1]))
+
+                while window and (total > self.chunk_overlap or total + length > self.chunk_size):
+                    first_lo, first_hi = window.popleft()
+                    total -= first_hi - first_lo
+
+            window.append((piece_lo, piece_hi))
+            total += length
+
+        if window:
+            merged.append((window[0][0], window[-1][1]))
+        return merged
+
+    def _hard_split(self, lo: int, hi: int) -> List[Tuple[int, int]]:
+        """No separator left: cut fixed token windows with overlap"""
+
+        if hi - lo <= self.chunk_size:
+            return [(lo, hi)]
+
+        step = max(1, self.chunk_size - self.chunk_overlap)
+        ranges = []
+        start = lo
+        while start < hi:
+            end = min(start + self.chunk_size, hi)
+            ranges.append((start, end))
+            if end == hi:
+                break
+            start += step
+        return ranges
+
+
+class _LazyBoundaries:
+    """Token indices at which a piece may start, per separator level"""
+
+    def __init__(self, text: str, separators: List[str], starts: List[int], token_total: int):
+        self.text = text
+        self.separators = separators
+        self.starts = starts
+        self.token_total = token_total
+        self.levels = {}
+
+    def __getitem__(self, level: int) -> List[int]:
+        if level not in self.levels:
+            self.levels[level] = self._compute(self.separators[level])
+        return self.levels[level]
+
+    def _compute(self, separator: str) -> List[int]:
+        if not separator:
+            return []
+
+        positions = []
+        pos = self.text.find(separator)
+        while pos != -1:
+            # First token starting at or after the separator
+            index = bisect_left(self.starts, pos, 0, self.token_total)
+            if 0 < index < self.token_total and (not positions or positions[-1] != index):
+                positions.append(index)
+            pos = self.text.find(separator, pos + len(separator))
+        return positions
@@ -0,0 +1,75 @@
+"""
+Tokenizer loading for Swiss Travel RAG
+One tiktoken encoding per process, loaded on first use from a local BPE cache instead of the network
+"""
+import hashlib
+import os
+import shutil
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+from config import EMBEDDING_MODEL, TIKTOKEN_CACHE_DIR
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# Where tiktoken downloads each BPE file from; its cache file is named by the URL's sha1
+BPE_URLS = {
+    "cl100k_base": "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken",
+}
+
+
+def _use_local_cache() -> Path:
+    """Point tiktoken at TIKTOKEN_CACHE_DIR (absolute, so later chdirs do not matter)"""
+
+    cache_dir = Path(os.environ.get("TIKTOKEN_CACHE_DIR") or TIKTOKEN_CACHE_DIR).resolve()
+    os.environ["TIKTOKEN_CACHE_DIR"] = str(cache_dir)
+    return cache_dir
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = EMBEDDING_MODEL):
+    """
+    Tokenizer for an embedding model (cl100k_base for unknown names)
+
+    tiktoken is imported and the BPE file parsed only on the first call;
+    later calls in the same process share the encoding.
+    """
+
+    _use_local_cache()
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def cache_path(encoding_name: str = DEFAULT_ENCODING) -> Path:
+    """File the encoding's BPE ranks are read from"""
+
+    url = BPE_URLS[encoding_name]
+    return _use_local_cache() / hashlib.sha1(url.encode()).hexdigest()
+
+
+def install(source: Optional[str] = None, encoding_name: str = DEFAULT_ENCODING) -> Path:
+    """
+    Fill the local tokenizer cache
+
+    Args:
+        source: A bundled .tiktoken file to copy in; without it the file is
+            downloaded once by tiktoken
+        encoding_name: Encoding to install
+
+    Returns:
+        Path of the cached BPE file
+    """
+
+    target = cache_path(encoding_name)
+    if source:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(source, target)
+
+    # Loading validates the file (tiktoken checks its hash) and downloads it if still missing
+    import tiktoken
+    tiktoken.get_encoding(encoding_name)
+    return target
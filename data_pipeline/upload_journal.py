@@ -0,0 +1,95 @@
+"""
+Upload journal for Swiss Travel RAG
+Records which upload batches finished so an interrupted upload can resume
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, List, Set
+from config import UPLOAD_JOURNAL_PATH
+
+
+def batch_key(natural_keys: Iterable[str]) -> str:
+    """Deterministic identity of a batch from its rows' natural keys"""
+    return hashlib.sha256('\n'.join(natural_keys).encode('utf-8')).hexdigest()
+
+
+class UploadJournal:
+    def __init__(self, path: str = UPLOAD_JOURNAL_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Upload workers are threads; sqlite connections are guarded by a lock
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("""
+            create table if not exists done_batches (
+              session text not null,
+              batch_key text not null,
+              rows int not null,
+              done_at real not null,
+              primary key (session, batch_key)
+            )
+        """)
+        # Source files of each done batch, so deleting a file's rows forgets only its batches
+        self.conn.execute("""
+            create table if not exists batch_files (
+              session text not null,
+              batch_key text not null,
+              file_name text not null,
+              primary key (session, batch_key, file_name)
+            )
+        """)
+        self.conn.commit()
+
+    def done_batches(self, session: str) -> Set[str]:
+        with self.lock:
+            rows = self.conn.execute(
+                "select batch_key from done_batches where session = ?", (session,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def mark_done(self, session: str, key: str, rows: int, file_names: Iterable[str] = ()):
+        with self.lock:
+            self.conn.execute(
+                "insert or replace into done_batches (session, batch_key, rows, done_at) values (?, ?, ?, ?)",
+                (session, key, rows, time.time())
+            )
+            self.conn.executemany(
+                "insert or ignore into batch_files (session, batch_key, file_name) values (?, ?, ?)",
+                [(session, key, file_name) for file_name in set(file_names)]
+            )
+            self.conn.commit()
+
+    def finish(self, session: str):
+        """Forget a session once every batch of it is uploaded"""
+
+        with self.lock:
+            self.conn.execute("delete from done_batches where session = ?", (session,))
+            self.conn.execute("delete from batch_files where session = ?", (session,))
+            self.conn.commit()
+
+    def forget_files(self, file_names: List[str]):
+        """Forget the done batches holding rows of these files, e.g. after the rows were deleted"""
+
+        file_names = list(file_names)
+        with self.lock:
+            batches = set()
+            for i in range(0, len(file_names), 500):
+                group = file_names[i:i + 500]
+                batches.update(self.conn.execute(
+                    f"select session, batch_key from batch_files where file_name in ({','.join('?' * len(group))})",
+                    group
+                ).fetchall())
+            self.conn.executemany("delete from done_batches where session = ? and batch_key = ?", batches)
+            self.conn.executemany("delete from batch_files where session = ? and batch_key = ?", batches)
+            self.conn.commit()
+
+    def clear(self):
+        """Forget all sessions, e.g. after the table was emptied"""
+
+        with self.lock:
+            self.conn.execute("delete from done_batches")
+            self.conn.execute("delete from batch_files")
+            self.conn.commit()
@@ -2,71 +2,174 @@
 Database uploader for Swiss Travel RAG
 Handles uploading chunks to Supabase
 """
-from typing import List, Dict
-from supabase import create_client, Client
+import json
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional, Set, Tuple
+from postgrest.types import ReturnMethod
+from supabase import Client
 from tqdm import tqdm
-from config import SUPABASE_URL, SUPABASE_KEY, TABLE_NAME
+from config import (
+    TABLE_NAME,
+    UPLOAD_MODE, UPLOAD_BATCH_SIZE, UPLOAD_WORKERS, UPLOAD_MAX_RETRIES, EMBEDDING_STORAGE,
+    DEDUP_POLICY,
+)
+from embedding_cache import text_hash
+from upload_journal import UploadJournal, batch_key
+from embedding_store import vector_literal
+from compact_storage import LITERAL_DIGITS, drop_vector_index_sql, build_vector_index_sql
+from query_cache import bump_table_generation
+from metrics import current_run
+from clients import supabase_client
+
+# Natural key used for idempotent upserts (unique index travel_content_natural_key)
+NATURAL_KEY = "file_name,chunk_index,content_hash"
 
 class DatabaseUploader:
-    def __init__(self):
-        self.client: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    def __init__(self, mode: str = UPLOAD_MODE, workers: int = UPLOAD_WORKERS):
+        self.client: Client = supabase_client()
         self.table_name = TABLE_NAME
+        self.mode = mode
+        self.workers = workers
+        self.batch_size = UPLOAD_BATCH_SIZE
+        self.max_retries = UPLOAD_MAX_RETRIES
+        # A halfvec column cannot hold more precision than fp16, so don't send it
+        self.literal_digits = LITERAL_DIGITS[EMBEDDING_STORAGE]
+        # Only sent when collapsing, so other policies work without the column
+        self.store_duplicate_sources = DEDUP_POLICY == "collapse"
+        self.journal = UploadJournal()
     
-    def upload_chunks(self, chunks: List[Dict]) -> bool:
+    def upload_chunks(self, chunks: List[Dict], show_progress: bool = True) -> bool:
         """
         Upload chunks to Supabase database
         
+        In upsert mode rows are keyed on (file_name, chunk_index, content_hash),
+        so re-running an upload never creates duplicates. Batches are sent
+        concurrently with retries, and finished batches are journaled so an
+        interrupted upload of the same chunks resumes where it stopped.
+        
         Args:
             chunks: List of chunk dictionaries with embeddings
+            show_progress: Print progress (off when called per batch by the streaming pipeline)
             
         Returns:
             True if successful, False otherwise
         """
         
-        print(f"Uploading {len(chunks)} chunks to database...")
+        if show_progress:
+            print(f"Uploading {len(chunks)} chunks to database...")
         
-        try:
-            # Prepare data for insertion
-            upload_data = []
-            
-            for chunk in chunks:
-                record = {
-                    'content': chunk['content'],
-                    'embedding': chunk['embedding'],
-                    'title': chunk.get('title', ''),
-                    'file_name': chunk.get('file_name', ''),
-                    'category': chunk.get('category', ''),
-                    'section_title': chunk.get('section_title', ''),
-                    'section_level': chunk.get('section_level', 1),
-                    'chunk_index': chunk['chunk_index'],
-                    'total_chunks': chunk['total_chunks'],
-                    'tags': chunk.get('tags', []),
-                    'location': chunk.get('location', ''),
-                    'estimated_reading_time': chunk.get('estimated_reading_time', 0)
-                }
-                
-                upload_data.append(record)
-            
-            # Upload in batches
-            batch_size = 50
-            uploaded_count = 0
+        # Prepare data for insertion
+        upload_data = [self._to_record(chunk) for chunk in chunks]
+        
+        # Split into batches with deterministic keys for the journal
+        batches = []
+        for i in range(0, len(upload_data), self.batch_size):
+            batch = upload_data[i:i + self.batch_size]
+            key = batch_key(self._natural_key(record) for record in batch)
+            batches.append((key, batch))
+        
+        session = batch_key(key for key, _ in batches)
+        done = self.journal.done_batches(session)
+        pending = [(key, batch) for key, batch in batches if key not in done]
+        
+        uploaded_count = sum(len(batch) for key, batch in batches if key in done)
+        if uploaded_count and show_progress:
+            print(f"Resuming upload: {uploaded_count} chunks already uploaded")
+        
+        failed_batches = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._upload_batch, batch): (key, batch) for key, batch in pending}
             
-            for i in tqdm(range(0, len(upload_data), batch_size), desc="Uploading"):
-                batch = upload_data[i:i + batch_size]
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Uploading",
+                               disable=not show_progress):
+                key, batch = futures[future]
+                count = future.result()
                 
-                response = self.client.table(self.table_name).insert(batch).execute()
+                if count is None:
+                    failed_batches += 1
+                    continue
                 
-                if response.data:
-                    uploaded_count += len(response.data)
-                else:
-                    print(f"Failed to upload batch {i//batch_size + 1}")
-            
+                uploaded_count += count
+                self.journal.mark_done(session, key, count, (record['file_name'] for record in batch))
+        
+        # Cached search results may no longer match the table
+        if len(pending) > failed_batches:
+            bump_table_generation()
+        
+        if failed_batches:
+            print(f"Failed to upload {failed_batches} batches (re-run to resume)")
+        else:
+            self.journal.finish(session)
+        
+        if show_progress:
             print(f"Successfully uploaded {uploaded_count}/{len(chunks)} chunks")
-            return uploaded_count == len(chunks)
+        return uploaded_count == len(chunks)
+    
+    def _to_record(self, chunk: Dict) -> Dict:
+        record = {
+            'content': chunk['content'],
+            # Serialized once here, at the edge, from the float32 row
+            'embedding': vector_literal(chunk['embedding'], self.literal_digits),
+            'title': chunk.get('title', ''),
+            'file_name': chunk.get('file_name', ''),
+            'category': chunk.get('category', ''),
+            'section_title': chunk.get('section_title', ''),
+            'section_level': chunk.get('section_level', 1),
+            'chunk_index': chunk['chunk_index'],
+            'total_chunks': chunk['total_chunks'],
+            'tags': chunk.get('tags', []),
+            'location': chunk.get('location', ''),
+            'estimated_reading_time': chunk.get('estimated_reading_time', 0),
+            'source_updated_at': chunk.get('source_updated_at'),
+            'content_hash': text_hash(chunk['content'])
+        }
+        if self.store_duplicate_sources:
+            record['duplicate_sources'] = chunk.get('duplicate_sources')
+        # Community posts/comments carry these; markdown rows keep the column defaults
+        if chunk.get('source_type'):
+            record['source_type'] = chunk['source_type']
+            record['post_month'] = chunk.get('post_month')
+        return record
+    
+    @staticmethod
+    def _natural_key(record: Dict) -> str:
+        return f"{record['file_name']}\t{record['chunk_index']}\t{record['content_hash']}"
+    
+    def _upload_batch(self, batch: List[Dict]) -> Optional[int]:
+        """Send one batch with retries; returns rows written or None on failure"""
         
-        except Exception as e:
-            print(f"Error uploading chunks: {e}")
-            return False
+        table = self.client.table(self.table_name)
+        metrics = current_run()
+        # UTF-8 size of the JSON body (Korean text is sent as-is, not as \u escapes)
+        payload_bytes = len(json.dumps(batch, ensure_ascii=False).encode('utf-8'))
+        
+        for attempt in range(self.max_retries + 1):
+            metrics.add('upload', api_calls=1, retries=1 if attempt else 0, bytes_sent=payload_bytes)
+            
+            try:
+                with metrics.stage('upload'):
+                    # Don't echo the rows (and their embeddings) back in the response
+                    if self.mode == "upsert":
+                        table.upsert(batch, on_conflict=NATURAL_KEY, returning=ReturnMethod.minimal).execute()
+                    else:
+                        table.insert(batch, returning=ReturnMethod.minimal).execute()
+                metrics.add('upload', items=len(batch))
+                return len(batch)
+            
+            except Exception as e:
+                metrics.add('upload', errors=1)
+                if "ON CONFLICT" in str(e):
+                    print("Upsert needs the natural-key unique index: run setup_db.py or set UPLOAD_MODE=insert")
+                    return None
+                
+                if attempt == self.max_retries:
+                    print(f"Error uploading batch of {len(batch)} chunks: {e}")
+                    return None
+                
+                time.sleep(min(30, 2 ** attempt) * (0.5 + random.random() / 2))
     
     def clear_table(self) -> bool:
         """Clear all data from the table"""
@@ -74,6 +177,8 @@ class DatabaseUploader:
         try:
             # Delete all records
             response = self.client.table(self.table_name).delete().neq('id', 0).execute()
+            self.journal.clear()
+            bump_table_generation()
             print("Table cleared successfully")
             return True
         
@@ -81,45 +186,224 @@ class DatabaseUploader:
             print(f"Error clearing table: {e}")
             return False
     
+    def drop_vector_index(self) -> bool:
+        """Drop the HNSW index so a bulk load skips per-row graph maintenance"""
+        
+        try:
+            with current_run().stage('index'):
+                self.client.rpc("sql", {"query": drop_vector_index_sql()}).execute()
+            print("🗑️ Vector index dropped for bulk load (search falls back to exact scans until rebuilt)")
+            return True
+        
+        except Exception as e:
+            print(f"Error dropping vector index: {e}")
+            return False
+    
+    def build_vector_index(self, **params) -> bool:
+        """
+        Build the HNSW index in one pass over the loaded table
+        
+        Args:
+            params: m, ef_construction, maintenance_work_mem and workers
+                overrides (see build_vector_index_sql)
+        """
+        
+        print("🏗️ Building vector index...")
+        start = time.perf_counter()
+        try:
+            with current_run().stage('index'):
+                self.client.rpc("sql", {"query": build_vector_index_sql(**params)}).execute()
+            current_run().add('index', items=1)
+            print(f"✅ Vector index built in {time.perf_counter() - start:.1f}s")
+            return True
+        
+        except Exception as e:
+            # Usually the API role's statement_timeout on a large table
+            print(f"Error building vector index: {e}")
+            print("   Run `python cli.py setup --rebuild-index --print-sql` and execute the SQL in the SQL editor or psql")
+            return False
+    
+    def delete_file_chunks(self, file_names: List[str]) -> bool:
+        """
+        Delete all chunks belonging to the given files
+        
+        Args:
+            file_names: Source file names whose rows should be removed
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        
+        if not file_names:
+            return True
+        
+        try:
+            # One delete per group of files instead of one per row
+            batch_size = 100
+            deleted_count = 0
+            
+            metrics = current_run()
+            
+            with metrics.stage('delete'):
+                for i in range(0, len(file_names), batch_size):
+                    batch = file_names[i:i + batch_size]
+                    response = self.client.table(self.table_name).delete().in_('file_name', batch).execute()
+                    deleted_count += len(response.data or [])
+                    metrics.add('delete', api_calls=1)
+            metrics.add('delete', items=deleted_count)
+            
+            # Journaled batches and cached search results may refer to rows that no longer exist
+            self.journal.forget_files(file_names)
+            bump_table_generation()
+            
+            print(f"Deleted {deleted_count} stale chunks from {len(file_names)} files")
+            return True
+        
+        except Exception as e:
+            print(f"Error deleting stale chunks: {e}")
+            return False
+    
+    @staticmethod
+    def chunk_keys(chunks: List[Dict]) -> Dict[str, Set[Tuple[int, str]]]:
+        """(chunk_index, content_hash) of each file's chunks, as they are keyed in the table"""
+        
+        keys = defaultdict(set)
+        for chunk in chunks:
+            keys[chunk['file_name']].add((chunk['chunk_index'], text_hash(chunk['content'])))
+        return keys
+    
+    def delete_leftover_chunks(self, kept: Dict[str, Set[Tuple[int, str]]]) -> bool:
+        """
+        Delete rows of re-ingested files that the new upload did not replace
+        
+        Called after the new rows are uploaded, so a failed embed or upload
+        leaves the previous version of a file searchable instead of none.
+        
+        Args:
+            kept: File name -> (chunk_index, content_hash) of its current rows
+                (an empty set removes all of the file's rows)
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        
+        file_names = sorted(kept)
+        if not file_names:
+            return True
+        
+        try:
+            batch_size = 100
+            page_size = 1000
+            leftover_ids = []
+            
+            metrics = current_run()
+            
+            with metrics.stage('delete'):
+                for i in range(0, len(file_names), batch_size):
+                    batch = file_names[i:i + batch_size]
+                    offset = 0
+                    while True:
+                        rows = self.client.table(self.table_name) \
+                            .select('id, file_name, chunk_index, content_hash') \
+                            .in_('file_name', batch).order('id') \
+                            .range(offset, offset + page_size - 1).execute().data or []
+                        metrics.add('delete', api_calls=1)
+                        leftover_ids += [row['id'] for row in rows
+                                         if (row['chunk_index'], row['content_hash']) not in kept[row['file_name']]]
+                        if len(rows) < page_size:
+                            break
+                        offset += page_size
+                
+                for i in range(0, len(leftover_ids), page_size):
+                    self.client.table(self.table_name).delete().in_('id', leftover_ids[i:i + page_size]).execute()
+                    metrics.add('delete', api_calls=1)
+            metrics.add('delete', items=len(leftover_ids))
+            
+            if leftover_ids:
+                # Journaled batches and cached search results may refer to rows that no longer exist
+                self.journal.forget_files(file_names)
+                bump_table_generation()
+            
+            print(f"Deleted {len(leftover_ids)} stale chunks from {len(file_names)} files")
+            return True
+        
+        except Exception as e:
+            print(f"Error deleting stale chunks: {e}")
+            return False
+    
     def update_parent_chunk_ids(self, chunks: List[Dict]) -> bool:
         """
         Update parent_chunk_id relationships after initial upload
         
+        Only the files present in chunks are linked. Linking runs server-side
+        through link_parent_chunks (one statement per group of files); if the
+        function is not installed yet, falls back to linking row by row.
+        
         Args:
-            chunks: List of chunks that were uploaded
+            chunks: List of chunks that were uploaded (only 'file_name' is used)
             
         Returns:
             True if successful
         """
         
+        file_names = sorted({chunk['file_name'] for chunk in chunks if chunk.get('file_name')})
+        if not file_names:
+            return True
+        
         try:
-            # Get all records grouped by file_name
-            response = self.client.table(self.table_name).select("id, file_name, chunk_index").execute()
+            batch_size = 200
+            linked_count = 0
             
-            if not response.data:
-                return True
+            metrics = current_run()
+            
+            with metrics.stage('link'):
+                for i in range(0, len(file_names), batch_size):
+                    batch = file_names[i:i + batch_size]
+                    response = self.client.rpc('link_parent_chunks', {'file_names': batch}).execute()
+                    linked_count += response.data or 0
+                    metrics.add('link', api_calls=1)
+            metrics.add('link', items=linked_count)
+            
+            print(f"Parent chunk relationships updated successfully ({linked_count} rows in {len(file_names)} files)")
+            return True
+        
+        except Exception as e:
+            print(f"link_parent_chunks unavailable ({e}), linking row by row")
+            return self._update_parent_chunk_ids_per_row(file_names)
+    
+    def _update_parent_chunk_ids_per_row(self, file_names: List[str]) -> bool:
+        """Fallback linking for databases without link_parent_chunks"""
+        
+        metrics = current_run()
+        
+        try:
+            # Get the records of the given files only
+            records = []
+            for i in range(0, len(file_names), 100):
+                response = self.client.table(self.table_name).select("id, file_name, chunk_index") \
+                    .in_('file_name', file_names[i:i + 100]).execute()
+                records.extend(response.data or [])
             
             # Group by file_name
             file_chunks = {}
-            for record in response.data:
-                file_name = record['file_name']
-                if file_name not in file_chunks:
-                    file_chunks[file_name] = []
-                file_chunks[file_name].append(record)
+            for record in records:
+                file_chunks.setdefault(record['file_name'], []).append(record)
             
             # Update parent relationships
             for file_name, file_chunk_list in file_chunks.items():
                 # Sort by chunk_index
-                file_chunk_list.sort(key=lambda x: x['chunk_index'])
+                file_chunk_list.sort(key=lambda x: (x['chunk_index'], x['id']))
                 
                 # Update parent_chunk_id for each chunk (except first)
                 for i in range(1, len(file_chunk_list)):
                     current_chunk = file_chunk_list[i]
                     parent_chunk = file_chunk_list[i-1]
                     
-                    self.client.table(self.table_name).update({
-                        'parent_chunk_id': parent_chunk['id']
-                    }).eq('id', current_chunk['id']).execute()
+                    with metrics.stage('link'):
+                        self.client.table(self.table_name).update({
+                            'parent_chunk_id': parent_chunk['id']
+                        }).eq('id', current_chunk['id']).execute()
+                    metrics.add('link', items=1, api_calls=1)
             
             print("Parent chunk relationships updated successfully")
             return True
@@ -128,6 +412,72 @@ class DatabaseUploader:
             print(f"Error updating parent chunk relationships: {e}")
             return False
     
+    def update_duplicate_sources(self, chunks: List[Dict]) -> bool:
+        """
+        Store the duplicate references of already uploaded chunks
+        
+        Rows are updated server-side through store_duplicate_sources (one
+        statement per batch); if the function is not installed yet, falls
+        back to one update per row.
+        
+        Args:
+            chunks: ChunkDeduplicator.collapsed() records (row key and 'duplicate_sources')
+            
+        Returns:
+            True if successful
+        """
+        
+        if not chunks:
+            return True
+        
+        records = [{
+            'file_name': chunk['file_name'],
+            'chunk_index': chunk['chunk_index'],
+            'content_hash': chunk['content_hash'],
+            'duplicate_sources': chunk['duplicate_sources'],
+        } for chunk in chunks]
+        
+        metrics = current_run()
+        
+        try:
+            batch_size = 500
+            stored_count = 0
+            
+            with metrics.stage('dedup'):
+                for i in range(0, len(records), batch_size):
+                    batch = records[i:i + batch_size]
+                    response = self.client.rpc('store_duplicate_sources', {'collapsed': batch}).execute()
+                    stored_count += response.data or 0
+                    metrics.add('dedup', api_calls=1)
+            
+            print(f"Duplicate references stored on {stored_count} rows")
+            return True
+        
+        except Exception as e:
+            print(f"store_duplicate_sources unavailable ({e}), storing row by row")
+            return self._update_duplicate_sources_per_row(records)
+    
+    def _update_duplicate_sources_per_row(self, records: List[Dict]) -> bool:
+        """Fallback for databases without store_duplicate_sources"""
+        
+        metrics = current_run()
+        
+        try:
+            with metrics.stage('dedup'):
+                for record in records:
+                    self.client.table(self.table_name).update({
+                        'duplicate_sources': record['duplicate_sources']
+                    }).eq('file_name', record['file_name']).eq('chunk_index', record['chunk_index']) \
+                        .eq('content_hash', record['content_hash']).execute()
+                    metrics.add('dedup', api_calls=1)
+            
+            print(f"Duplicate references stored on {len(records)} rows")
+            return True
+        
+        except Exception as e:
+            print(f"Error storing duplicate references (run setup_db.py to add the column): {e}")
+            return False
+    
     def get_chunk_count(self) -> int:
         """Get total number of chunks in database"""
         
@@ -0,0 +1,417 @@
+"""
+Ingest work queue for Swiss Travel RAG
+Lease-based queue of work units (markdown files, community post pages) shared by distributed ingest workers
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from config import QUEUE_BACKEND, QUEUE_PATH, QUEUE_NAME, QUEUE_SHARDS
+
+# Unit states: pending -> leased -> done, or back to pending on failure / lease timeout
+# until max_attempts, then failed (also when the last attempt's lease expires)
+STATUSES = ("pending", "leased", "done", "failed")
+
+INGEST_QUEUE_SQL = """
+create table if not exists ingest_queue (
+  queue text not null default 'ingest',
+  unit_id text not null,
+  kind text not null,
+  payload jsonb not null,
+  shard int not null,
+  status text not null default 'pending',
+  attempts int not null default 0,
+  worker text,
+  lease_expires timestamptz,
+  result jsonb,
+  error text,
+  updated_at timestamptz not null default now(),
+  primary key (queue, unit_id)
+);
+
+create index if not exists idx_ingest_queue_claim on ingest_queue(queue, status, shard);
+
+create table if not exists ingest_workers (
+  queue text not null,
+  worker text not null,
+  heartbeat_at timestamptz not null default now(),
+  primary key (queue, worker)
+);
+
+-- Lease up to p_limit units: pending ones, or leased ones whose worker stopped heartbeating.
+-- A worker's own shards (shard % p_shards = p_shard) come first, then it helps with the rest.
+-- Expired leases that used their last attempt are marked failed (`queue retry` resets them).
+create or replace function ingest_queue_claim (
+  p_queue text,
+  p_worker text,
+  p_limit int,
+  p_lease_seconds int,
+  p_max_attempts int,
+  p_shard int default null,
+  p_shards int default null
+)
+returns setof ingest_queue
+language sql
+as $$
+  update ingest_queue
+  set status = 'failed', error = coalesce(error, 'lease expired'), lease_expires = null, updated_at = now()
+  where queue = p_queue and status = 'leased' and lease_expires < now() and attempts >= p_max_attempts;
+
+  update ingest_queue q
+  set status = 'leased',
+      worker = p_worker,
+      attempts = q.attempts + 1,
+      lease_expires = now() + make_interval(secs => p_lease_seconds),
+      updated_at = now()
+  where (q.queue, q.unit_id) in (
+    select c.queue, c.unit_id
+    from ingest_queue c
+    where c.queue = p_queue
+      and (c.status = 'pending'
+           or (c.status = 'leased' and c.lease_expires < now() and c.attempts < p_max_attempts))
+    order by (p_shards is not null and c.shard % p_shards = p_shard) desc, c.unit_id
+    limit p_limit
+    for update skip locked
+  )
+  returning q.*;
+$$;
+
+-- Renew the worker's leases and report how many workers are alive (they split the API budget)
+create or replace function ingest_queue_heartbeat (
+  p_queue text,
+  p_worker text,
+  p_unit_ids text[],
+  p_lease_seconds int
+)
+returns int
+language plpgsql
+as $$
+declare
+  active int;
+begin
+  insert into ingest_workers (queue, worker, heartbeat_at)
+  values (p_queue, p_worker, now())
+  on conflict (queue, worker) do update set heartbeat_at = now();
+
+  update ingest_queue
+  set lease_expires = now() + make_interval(secs => p_lease_seconds), updated_at = now()
+  where queue = p_queue and worker = p_worker and status = 'leased' and unit_id = any(p_unit_ids);
+
+  select count(*) into active
+  from ingest_workers
+  where queue = p_queue and heartbeat_at > now() - make_interval(secs => p_lease_seconds);
+  return active;
+end;
+$$;
+
+-- Only the current lease holder may finish a unit (a requeued unit belongs to its new worker)
+create or replace function ingest_queue_complete (
+  p_queue text,
+  p_worker text,
+  p_unit_id text,
+  p_result jsonb
+)
+returns boolean
+language sql
+as $$
+  with done as (
+    update ingest_queue
+    set status = 'done', result = p_result, error = null, lease_expires = null, updated_at = now()
+    where queue = p_queue and unit_id = p_unit_id and worker = p_worker and status = 'leased'
+    returning 1
+  )
+  select exists (select 1 from done);
+$$;
+
+create or replace function ingest_queue_fail (
+  p_queue text,
+  p_worker text,
+  p_unit_id text,
+  p_error text,
+  p_max_attempts int
+)
+returns text
+language sql
+as $$
+  update ingest_queue
+  set status = case when attempts >= p_max_attempts then 'failed' else 'pending' end,
+      error = p_error, lease_expires = null, updated_at = now()
+  where queue = p_queue and unit_id = p_unit_id and worker = p_worker and status = 'leased'
+  returning status;
+$$;
+
+create or replace function ingest_queue_status (
+  p_queue text
+)
+returns table (status text, units bigint, expired bigint)
+language sql stable
+as $$
+  select q.status, count(*), count(*) filter (where q.status = 'leased' and q.lease_expires < now())
+  from ingest_queue q
+  where q.queue = p_queue
+  group by q.status;
+$$;
+"""
+
+
+def shard_of(unit_id: str, shards: int = QUEUE_SHARDS) -> int:
+    """Stable across processes and hosts (unlike hash())"""
+    return zlib.crc32(unit_id.encode('utf-8')) % shards
+
+
+def file_unit(file_name: str) -> Dict:
+    return {'unit_id': f"file:{file_name}", 'kind': 'file', 'payload': {'file': file_name}}
+
+
+def post_page_unit(after_id: int, until_id: int, category: Optional[str] = None) -> Dict:
+    """Posts with after_id < id <= until_id (a fixed range, so retries see the same posts)"""
+    return {
+        'unit_id': f"posts:{category or '*'}:{after_id}-{until_id}",
+        'kind': 'post_page',
+        'payload': {'after_id': after_id, 'until_id': until_id, 'category': category},
+    }
+
+
+class SqliteWorkQueue:
+    """Queue in a local SQLite file: workers are processes on one host"""
+
+    def __init__(self, path: str = QUEUE_PATH, name: str = QUEUE_NAME):
+        self.name = name
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # The heartbeat thread shares the connection; every claim is one IMMEDIATE transaction
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("pragma journal_mode = wal")
+        self.conn.executescript("""
+            create table if not exists ingest_queue (
+              queue text not null,
+              unit_id text not null,
+              kind text not null,
+              payload text not null,
+              shard int not null,
+              status text not null default 'pending',
+              attempts int not null default 0,
+              worker text,
+              lease_expires real,
+              result text,
+              error text,
+              updated_at real not null,
+              primary key (queue, unit_id)
+            );
+            create index if not exists idx_ingest_queue_claim on ingest_queue(queue, status, shard);
+            create table if not exists ingest_workers (
+              queue text not null,
+              worker text not null,
+              heartbeat_at real not null,
+              primary key (queue, worker)
+            );
+        """)
+
+    def _transaction(self, statements):
+        with self.lock:
+            self.conn.execute("begin immediate")
+            try:
+                result = statements(self.conn)
+                self.conn.execute("commit")
+                return result
+            except BaseException:
+                self.conn.execute("rollback")
+                raise
+
+    def enqueue(self, units: Iterable[Dict], reset: bool = False) -> int:
+        """Add units (existing ones are kept, or set back to pending with reset)"""
+
+        now = time.time()
+        rows = [(self.name, unit['unit_id'], unit['kind'], json.dumps(unit['payload'], ensure_ascii=False),
+                 shard_of(unit['unit_id']), now) for unit in units]
+
+        def insert(conn):
+            before = conn.total_changes
+            conn.executemany(
+                "insert or ignore into ingest_queue (queue, unit_id, kind, payload, shard, updated_at) "
+                "values (?, ?, ?, ?, ?, ?)", rows)
+            if reset:
+                conn.executemany(
+                    "update ingest_queue set status = 'pending', attempts = 0, worker = null, "
+                    "lease_expires = null, error = null, updated_at = ? where queue = ? and unit_id = ?",
+                    [(now, self.name, row[1]) for row in rows])
+            return conn.total_changes - before
+
+        return self._transaction(insert)
+
+    def claim(self, worker: str, limit: int, lease_seconds: int, max_attempts: int,
+              shard: Optional[int] = None, shards: Optional[int] = None) -> List[Dict]:
+        now = time.time()
+
+        def lease(conn):
+            conn.execute(
+                "update ingest_queue set status = 'failed', error = coalesce(error, 'lease expired'), "
+                "lease_expires = null, updated_at = ? "
+                "where queue = ? and status = 'leased' and lease_expires < ? and attempts >= ?",
+                (now, self.name, now, max_attempts))
+            rows = conn.execute(
+                "select unit_id, kind, payload, attempts from ingest_queue "
+                "where queue = ? and (status = 'pending' "
+                "  or (status = 'leased' and lease_expires < ? and attempts < ?)) "
+                "order by case when ? is not null and shard % ? = ? then 0 else 1 end, unit_id limit ?",
+                (self.name, now, max_attempts, shards, shards, shard, limit)).fetchall()
+            conn.executemany(
+                "update ingest_queue set status = 'leased', worker = ?, attempts = attempts + 1, "
+                "lease_expires = ?, updated_at = ? where queue = ? and unit_id = ?",
+                [(worker, now + lease_seconds, now, self.name, row[0]) for row in rows])
+            return rows
+
+        return [{'unit_id': unit_id, 'kind': kind, 'payload': json.loads(payload), 'attempts': attempts + 1}
+                for unit_id, kind, payload, attempts in self._transaction(lease)]
+
+    def heartbeat(self, worker: str, unit_ids: List[str], lease_seconds: int) -> int:
+        now = time.time()
+
+        def renew(conn):
+            conn.execute("insert or replace into ingest_workers (queue, worker, heartbeat_at) values (?, ?, ?)",
+                         (self.name, worker, now))
+            conn.executemany(
+                "update ingest_queue set lease_expires = ?, updated_at = ? "
+                "where queue = ? and worker = ? and status = 'leased' and unit_id = ?",
+                [(now + lease_seconds, now, self.name, worker, unit_id) for unit_id in unit_ids])
+            return conn.execute("select count(*) from ingest_workers where queue = ? and heartbeat_at > ?",
+                                (self.name, now - lease_seconds)).fetchone()[0]
+
+        return self._transaction(renew)
+
+    def complete(self, worker: str, unit_id: str, result: Dict) -> bool:
+        def finish(conn):
+            return conn.execute(
+                "update ingest_queue set status = 'done', result = ?, error = null, lease_expires = null, "
+                "updated_at = ? where queue = ? and unit_id = ? and worker = ? and status = 'leased'",
+                (json.dumps(result), time.time(), self.name, unit_id, worker)).rowcount == 1
+
+        return self._transaction(finish)
+
+    def fail(self, worker: str, unit_id: str, error: str, max_attempts: int) -> Optional[str]:
+        def release(conn):
+            conn.execute(
+                "update ingest_queue set status = case when attempts >= ? then 'failed' else 'pending' end, "
+                "error = ?, lease_expires = null, updated_at = ? "
+                "where queue = ? and unit_id = ? and worker = ? and status = 'leased'",
+                (max_attempts, error, time.time(), self.name, unit_id, worker))
+            row = conn.execute("select status from ingest_queue where queue = ? and unit_id = ? and worker = ?",
+                               (self.name, unit_id, worker)).fetchone()
+            return row[0] if row else None
+
+        return self._transaction(release)
+
+    def requeue_failed(self) -> int:
+        """Set failed units, and leases whose worker is gone, back to pending with fresh attempts"""
+
+        now = time.time()
+        return self._transaction(lambda conn: conn.execute(
+            "update ingest_queue set status = 'pending', attempts = 0, worker = null, lease_expires = null, "
+            "updated_at = ? where queue = ? and (status = 'failed' or (status = 'leased' and lease_expires < ?))",
+            (now, self.name, now)).rowcount)
+
+    def leave(self, worker: str):
+        self._transaction(lambda conn: conn.execute(
+            "delete from ingest_workers where queue = ? and worker = ?", (self.name, worker)))
+
+    def status(self) -> Dict[str, int]:
+        with self.lock:
+            rows = self.conn.execute(
+                "select status, count(*), sum(status = 'leased' and lease_expires < ?) "
+                "from ingest_queue where queue = ? group by status", (time.time(), self.name)).fetchall()
+        counts = {status: 0 for status in STATUSES}
+        counts['expired'] = 0
+        for status, units, expired in rows:
+            counts[status] = units
+            counts['expired'] += expired or 0
+        return counts
+
+    def close(self):
+        self.conn.close()
+
+
+class PostgresWorkQueue:
+    """Queue in the ingest_queue table next to travel_content: workers on any host (see INGEST_QUEUE_SQL)"""
+
+    def __init__(self, client=None, name: str = QUEUE_NAME):
+        from clients import supabase_client
+        self.client = client or supabase_client()
+        self.name = name
+
+    def enqueue(self, units: Iterable[Dict], reset: bool = False, batch_size: int = 500) -> int:
+        rows = [{'queue': self.name, 'unit_id': unit['unit_id'], 'kind': unit['kind'],
+                 'payload': unit['payload'], 'shard': shard_of(unit['unit_id'])} for unit in units]
+        if reset:
+            # Re-enqueueing resets state: the upsert overwrites status/attempts with the defaults
+            rows = [{**row, 'status': 'pending', 'attempts': 0, 'worker': None, 'error': None} for row in rows]
+
+        added = 0
+        for i in range(0, len(rows), batch_size):
+            response = self.client.table('ingest_queue').upsert(
+                rows[i:i + batch_size], on_conflict='queue,unit_id', ignore_duplicates=not reset).execute()
+            added += len(response.data or [])
+        return added
+
+    def claim(self, worker: str, limit: int, lease_seconds: int, max_attempts: int,
+              shard: Optional[int] = None, shards: Optional[int] = None) -> List[Dict]:
+        rows = self.client.rpc('ingest_queue_claim', {
+            'p_queue': self.name, 'p_worker': worker, 'p_limit': limit, 'p_lease_seconds': lease_seconds,
+            'p_max_attempts': max_attempts, 'p_shard': shard, 'p_shards': shards,
+        }).execute().data or []
+        return [{'unit_id': row['unit_id'], 'kind': row['kind'], 'payload': row['payload'],
+                 'attempts': row['attempts']} for row in rows]
+
+    def heartbeat(self, worker: str, unit_ids: List[str], lease_seconds: int) -> int:
+        return self.client.rpc('ingest_queue_heartbeat', {
+            'p_queue': self.name, 'p_worker': worker, 'p_unit_ids': unit_ids, 'p_lease_seconds': lease_seconds,
+        }).execute().data or 1
+
+    def complete(self, worker: str, unit_id: str, result: Dict) -> bool:
+        return bool(self.client.rpc('ingest_queue_complete', {
+            'p_queue': self.name, 'p_worker': worker, 'p_unit_id': unit_id, 'p_result': result,
+        }).execute().data)
+
+    def fail(self, worker: str, unit_id: str, error: str, max_attempts: int) -> Optional[str]:
+        return self.client.rpc('ingest_queue_fail', {
+            'p_queue': self.name, 'p_worker': worker, 'p_unit_id': unit_id, 'p_error': error,
+            'p_max_attempts': max_attempts,
+        }).execute().data
+
+    def requeue_failed(self) -> int:
+        """Set failed units, and leases whose worker is gone, back to pending with fresh attempts"""
+
+        now = datetime.now(timezone.utc).isoformat()
+        response = self.client.table('ingest_queue') \
+            .update({'status': 'pending', 'attempts': 0, 'worker': None, 'lease_expires': None}) \
+            .eq('queue', self.name) \
+            .or_(f'status.eq.failed,and(status.eq.leased,lease_expires.lt."{now}")') \
+            .execute()
+        return len(response.data or [])
+
+    def leave(self, worker: str):
+        self.client.table('ingest_workers').delete().eq('queue', self.name).eq('worker', worker).execute()
+
+    def status(self) -> Dict[str, int]:
+        rows = self.client.rpc('ingest_queue_status', {'p_queue': self.name}).execute().data or []
+        counts = {status: 0 for status in STATUSES}
+        counts['expired'] = 0
+        for row in rows:
+            counts[row['status']] = row['units']
+            counts['expired'] += row['expired'] or 0
+        return counts
+
+    def close(self):
+        pass
+
+
+def open_queue(backend: str = QUEUE_BACKEND, name: str = QUEUE_NAME):
+    if backend == "sqlite":
+        return SqliteWorkQueue(name=name)
+    if backend == "postgres":
+        return PostgresWorkQueue(name=name)
+    raise ValueError(f"Unknown queue backend: {backend}")